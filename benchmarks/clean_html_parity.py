@@ -0,0 +1,90 @@
+"""
+Regression corpus check for the HTML cleaning engines.
+
+Runs every page in benchmarks/corpus (plus a large synthetic page) through each engine in
+asp.scraper.parser.CLEAN_HTML_ENGINES, verifies that all engines produce identical output
+(cleaned text and structural signals), and reports the time each engine takes.
+
+Usage:
+    python benchmarks/clean_html_parity.py [--repeat N]
+
+Exits with status 1 if any engine's output differs from the BeautifulSoup reference.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from asp.scraper.parser import CLEAN_HTML_ENGINES
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+REFERENCE_ENGINE = "bs4"
+
+
+def load_corpus() -> List[Tuple[str, str]]:
+    """
+    Loads the corpus pages, plus a synthetic multi-megabyte page built from them.
+
+    Returns:
+        List[Tuple[str, str]]: (name, html) pairs.
+    """
+    pages = []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+                pages.append((filename, f.read()))
+
+    # Large pages are where the engines differ most; repeat the article body to ~1 MB
+    blog_post = dict(pages).get("blog_post.html", "")
+    body = blog_post[blog_post.find("<main>"):blog_post.find("</main>")]
+    if body:
+        pages.append(("synthetic_large.html", "<html><body>" + body * (1_000_000 // len(body)) + "</body></html>"))
+    return pages
+
+
+def time_engine(engine: str, html: str, repeat: int) -> float:
+    """Returns the best wall-clock time in seconds over `repeat` runs."""
+    parse = CLEAN_HTML_ENGINES[engine]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per engine and page (best is reported)")
+    args = parser.parse_args()
+
+    engines = [REFERENCE_ENGINE] + [name for name in CLEAN_HTML_ENGINES if name != REFERENCE_ENGINE]
+    mismatches = 0
+    totals: Dict[str, float] = {engine: 0.0 for engine in engines}
+
+    print(f"{'page':<24} {'size':>10} " + " ".join(f"{engine + ' ms':>11}" for engine in engines) + "  parity")
+    for name, html in load_corpus():
+        reference = CLEAN_HTML_ENGINES[REFERENCE_ENGINE](html)
+        parity = True
+        for engine in engines[1:]:
+            if CLEAN_HTML_ENGINES[engine](html) != reference:
+                parity = False
+                mismatches += 1
+                print(f"MISMATCH: {engine} output differs from {REFERENCE_ENGINE} on {name}", file=sys.stderr)
+
+        timings = {engine: time_engine(engine, html, args.repeat) for engine in engines}
+        for engine, seconds in timings.items():
+            totals[engine] += seconds
+        print(f"{name:<24} {len(html):>10} " + " ".join(f"{timings[e] * 1000:>11.2f}" for e in engines)
+              + f"  {'ok' if parity else 'FAIL'}")
+
+    print(f"{'total':<24} {'':>10} " + " ".join(f"{totals[e] * 1000:>11.2f}" for e in engines))
+    for engine in engines[1:]:
+        if totals[engine]:
+            print(f"speedup {engine} vs {REFERENCE_ENGINE}: {totals[REFERENCE_ENGINE] / totals[engine]:.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Local stand-ins for the services the pipeline calls, for offline benchmarks.
+
+One threaded HTTP server on 127.0.0.1 answers:
+- GET  /brave/res/v1/web/search  Brave-shaped search results pointing at /pages/...
+- GET  /pages/<topic>/<n>.html    generated article pages: valid static articles, invalid
+                                  listing pages and JavaScript shells (which escalate to the
+                                  browser tier), in configurable shares
+- POST /llm/chat/completions      an OpenAI-compatible chat completion stub
+
+Each route sleeps for its configured latency before answering (a configurable share of
+chat completions take a much slower tail latency instead), and the server counts
+requests per route. Supabase is replaced by asp.db.memory_topic_queue.InMemoryTopicQueue.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+# Words the generated articles are built from; function words keep the language check happy
+SUBJECTS = ("the method", "this approach", "a good routine", "the result", "our team", "the guide",
+            "each step", "the first option", "a simple change", "the main idea", "every reader", "the data")
+VERBS = ("improves", "changes", "supports", "explains", "reduces", "shapes", "follows", "reveals",
+         "depends on", "builds on", "replaces", "extends")
+OBJECTS = ("the daily practice", "most of the work", "what people expect", "the overall quality",
+           "a number of details", "the long-term plan", "how it feels", "the cost of mistakes",
+           "the way it is used", "all of the options", "the common problems", "the time it takes")
+CLAUSES = ("when it is done with care", "because it is easy to repeat", "if you start early",
+           "as long as the basics are clear", "while the details still matter", "for most of the year",
+           "in a way that is easy to follow", "after a little practice")
+
+PAGE_PATH_PATTERN = re.compile(r"^/pages/(?P<topic>[\w-]+)/(?P<index>\d+)\.html$")
+
+
+def _seeded(text: str) -> random.Random:
+    return random.Random(int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16))
+
+
+def article_html(topic: str, path: str, paragraphs: int = 8) -> str:
+    """Returns a valid, unique article page for a URL path (the same path always gives the same page)."""
+    rng = _seeded(path)
+    body = []
+    for index in range(paragraphs):
+        sentences = [f"{rng.choice(SUBJECTS).capitalize()} {rng.choice(VERBS)} {rng.choice(OBJECTS)} "
+                     f"{rng.choice(CLAUSES)}, and {topic} is {rng.choice(OBJECTS)} {rng.randint(1, 999)}."
+                     for _ in range(rng.randint(4, 7))]
+        if index % 3 == 0:
+            body.append(f"<h2>Part {index // 3 + 1} of {topic}</h2>")
+        body.append(f"<p>{' '.join(sentences)}</p>")
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{topic.title()}: a guide</title>'
+            f'</head><body><header><nav><a href="/">Home</a></nav></header><main><article>'
+            f'<h1>{topic.title()}: a guide</h1>{"".join(body)}</article></main>'
+            f'<footer>&copy; Example</footer></body></html>')
+
+
+def listing_html(topic: str) -> str:
+    """Returns a link listing that fails article validation."""
+    links = "".join(f'<li><a href="/pages/{index}.html">{topic} link {index}</a></li>' for index in range(30))
+    return f'<!DOCTYPE html><html lang="en"><head><title>{topic}</title></head><body><ul>{links}</ul></body></html>'
+
+
+def js_shell_html(topic: str) -> str:
+    """Returns a client-rendered shell page that the static tier escalates to the browser."""
+    return (f'<!DOCTYPE html><html lang="en"><head><title>{topic}</title></head><body><div id="root"></div>'
+            f'<noscript>You need to enable JavaScript to run this app.</noscript>'
+            f'<script src="/static/js/main.js"></script></body></html>')
+
+
+class FakeServices:
+    """
+    Runs the local stand-in server in a background thread.
+    """
+    def __init__(self, search_latency: float = 0.1, page_latency: float = 0.05, llm_latency: float = 0.5,
+                 results_per_query: int = 10, invalid_share: float = 0.2, js_share: float = 0.0,
+                 llm_slow_share: float = 0.0, llm_slow_latency: float = 5.0):
+        """
+        Initializes the server configuration.
+
+        Args:
+            search_latency (float): Seconds before a search response.
+            page_latency (float): Seconds before a page response.
+            llm_latency (float): Seconds before a chat completion.
+            results_per_query (int): Search results per query.
+            invalid_share (float): Share of result pages that fail validation.
+            js_share (float): Share of result pages that need the browser tier.
+            llm_slow_share (float): Share of chat completions that take `llm_slow_latency` instead.
+            llm_slow_latency (float): Seconds before a slow chat completion.
+        """
+        self.search_latency = search_latency
+        self.page_latency = page_latency
+        self.llm_latency = llm_latency
+        self.results_per_query = results_per_query
+        self.invalid_share = invalid_share
+        self.js_share = js_share
+        self.llm_slow_share = llm_slow_share
+        self.llm_slow_latency = llm_slow_latency
+        self.counts: Dict[str, int] = {"search": 0, "page": 0, "llm": 0}
+        self.llm_prompt_chars = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """The server's root URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def brave_url(self) -> str:
+        """The Brave-shaped search endpoint (for BRAVE_SEARCH_API_URL)."""
+        return f"{self.base_url}/brave/res/v1/web/search"
+
+    @property
+    def llm_url(self) -> str:
+        """The OpenAI-compatible base URL (for OPENROUTER_BASE_URL)."""
+        return f"{self.base_url}/llm"
+
+    def count(self, route: str, prompt_chars: int = 0) -> None:
+        """Counts a request to a route."""
+        with self._lock:
+            self.counts[route] += 1
+            self.llm_prompt_chars += prompt_chars
+
+    def page_kind(self, path: str) -> str:
+        """Returns "article", "invalid" or "js" for a page path, stable across runs."""
+        roll = _seeded("kind" + path).random()
+        if roll < self.js_share:
+            return "js"
+        if roll < self.js_share + self.invalid_share:
+            return "invalid"
+        return "article"
+
+    def start(self) -> "FakeServices":
+        """Starts the server on a free port."""
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass # Keep benchmark output clean
+
+            def _send(self, status: int, content_type: str, body: str) -> None:
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == "/brave/res/v1/web/search":
+                    services.count("search")
+                    time.sleep(services.search_latency)
+                    query = parse_qs(url.query).get("q", [""])[0]
+                    topic = re.sub(r"\s+blog article$", "", query)
+                    slug = re.sub(r"[^\w]+", "-", topic.lower()).strip("-") or "topic"
+                    results = [{
+                        "url": f"{services.base_url}/pages/{slug}/{index}.html",
+                        "title": f"{topic} guide {index}",
+                        "description": f"An article about <strong>{topic}</strong>, part {index}.",
+                    } for index in range(services.results_per_query)]
+                    self._send(200, "application/json", json.dumps({"web": {"results": results}}))
+                    return
+                match = PAGE_PATH_PATTERN.match(url.path)
+                if match:
+                    services.count("page")
+                    time.sleep(services.page_latency)
+                    topic = match.group("topic").replace("-", " ")
+                    kind = services.page_kind(url.path)
+                    if kind == "js":
+                        html = js_shell_html(topic)
+                    elif kind == "invalid":
+                        html = listing_html(topic)
+                    else:
+                        html = article_html(topic, url.path)
+                    self._send(200, "text/html; charset=utf-8", html)
+                    return
+                self._send(404, "text/plain", "not found")
+
+            def do_POST(self):
+                if urlsplit(self.path).path != "/llm/chat/completions":
+                    self._send(404, "text/plain", "not found")
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = " ".join(str(message.get("content", "")) for message in request.get("messages", []))
+                services.count("llm", len(prompt))
+                # Drawn per request, so a hedged duplicate of a slow request is usually fast
+                slow = random.random() < services.llm_slow_share
+                time.sleep(services.llm_slow_latency if slow else services.llm_latency)
+                summary = f"A summary of {len(prompt.split())} words of text."
+                self._send(200, "application/json", json.dumps({
+                    "id": f"chatcmpl-{services.counts['llm']}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": summary},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 10,
+                              "total_tokens": len(prompt) // 4 + 10},
+                }))
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
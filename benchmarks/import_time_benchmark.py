@@ -0,0 +1,109 @@
+"""
+Startup cost of the `asp` entry point: importing asp.main, and a whole run on an empty queue.
+
+Each measurement runs in a fresh interpreter, --runs times:
+- import: seconds to `import asp.main`
+- empty run: interpreter start to exit for asp.main.main() on an empty InMemoryTopicQueue,
+  which is what a cron invocation costs when there is nothing to do
+
+Both also check that none of the heavy stage dependencies (crawl4ai, langchain, the openai
+SDK, supabase, bs4) were loaded; they should only load when their stage first runs. Prints
+the median and worst times and the slowest imports, and exits with status 1 if a heavy
+module was loaded or the median import exceeds --budget seconds, so it can guard CI.
+
+Usage:
+    python benchmarks/import_time_benchmark.py [--runs N] [--budget SECONDS]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules that only the crawl, summarize and Supabase stages need
+HEAVY_MODULES = ("crawl4ai", "playwright", "langchain", "langchain_core", "langchain_openai", "openai",
+                 "supabase", "bs4", "tiktoken")
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+import asp.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+EMPTY_RUN_SCRIPT = f"""
+import asyncio, json, sys
+from asp.db.memory_topic_queue import InMemoryTopicQueue
+from asp.main import main
+asyncio.run(main(topic_queue=InMemoryTopicQueue()))
+print(json.dumps({{"heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def child_environment() -> dict:
+    """Returns the environment for the child interpreters: no telemetry export or console output."""
+    env = dict(os.environ)
+    env.update({"LOGFIRE_SEND_TO_LOGFIRE": "false", "LOGFIRE_CONSOLE": "false"})
+    return env
+
+
+def run_child(script: str, *flags: str):
+    """Runs `script` in a fresh interpreter and returns (wall seconds, its JSON output, stderr)."""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, *flags, "-c", script], capture_output=True, text=True,
+                               env=child_environment(), check=True)
+    elapsed = time.perf_counter() - started
+    return elapsed, json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def slowest_imports(importtime_log: str, count: int = 10):
+    """Returns the `count` top-level packages with the largest cumulative import time, in seconds."""
+    totals = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        package = name.split(".")[0]
+        if name == package:
+            totals[package] = max(totals.get(package, 0), int(cumulative) / 1_000_000)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--budget", type=float, default=1.5, help="maximum median import seconds")
+    args = parser.parse_args()
+
+    import_seconds, empty_run_seconds, heavy = [], [], set()
+    for _ in range(args.runs):
+        _, result, _ = run_child(IMPORT_SCRIPT)
+        import_seconds.append(result["seconds"])
+        heavy.update(result["heavy"])
+        wall, result, _ = run_child(EMPTY_RUN_SCRIPT)
+        empty_run_seconds.append(wall)
+        heavy.update(result["heavy"])
+    _, _, importtime_log = run_child(IMPORT_SCRIPT, "-X", "importtime")
+
+    print(f"{'measurement':<12} {'median s':>9} {'max s':>7}")
+    print(f"{'import':<12} {statistics.median(import_seconds):>9.3f} {max(import_seconds):>7.3f}")
+    print(f"{'empty run':<12} {statistics.median(empty_run_seconds):>9.3f} {max(empty_run_seconds):>7.3f}")
+    print("slowest imports:")
+    for package, seconds in slowest_imports(importtime_log):
+        print(f"  {package:<30} {seconds:>7.3f}s")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules loaded at startup: {', '.join(sorted(heavy))}")
+        failed = True
+    if statistics.median(import_seconds) > args.budget:
+        print(f"FAIL: median import {statistics.median(import_seconds):.3f}s is over the {args.budget}s budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Event-loop lag while cleaning large pages: inline parsing vs the process pool.
+
+Builds a large page from benchmarks/corpus/blog_post.html, then analyzes it --pages
+times with --concurrency pages in flight, once inline (ASP_PARSE_WORKERS=0) and once in
+a ParsePool with --workers processes, while a LoopLagMonitor probes the event loop.
+Reports wall time, pages per second and loop lag p50/p95/max for each mode.
+
+Usage:
+    python benchmarks/parse_offload_benchmark.py [--pages N] [--workers N] [--size-mb M]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from asp.scraper.parse_pool import ParsePool
+from asp.utils.loop_lag import LoopLagMonitor
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def large_page(size_bytes: int) -> str:
+    """Returns a valid article page of about `size_bytes`, built by repeating the corpus blog post body."""
+    with open(os.path.join(CORPUS_DIR, "blog_post.html"), encoding="utf-8") as f:
+        blog_post = f.read()
+    body = blog_post[blog_post.find("<main>"):blog_post.find("</main>")]
+    return '<html lang="en"><body>' + body * (size_bytes // len(body) + 1) + "</body></html>"
+
+
+async def run_mode(pool: ParsePool, html: str, pages: int, concurrency: int):
+    """Analyzes `pages` copies of the page through the pool and returns (seconds, loop lag stats)."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def analyze_one() -> None:
+        async with slots:
+            await pool.analyze(html)
+
+    if pool.workers:
+        # Start the worker processes before timing so start-up cost is not counted
+        await pool.analyze(html)
+    async with LoopLagMonitor(interval=0.01) as monitor:
+        started = time.perf_counter()
+        await asyncio.gather(*(analyze_one() for _ in range(pages)))
+        elapsed = time.perf_counter() - started
+    return elapsed, monitor.stats()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=16, help="pages analyzed per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="pages in flight at once")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="pool processes")
+    parser.add_argument("--size-mb", type=float, default=1.0, help="page size in megabytes")
+    args = parser.parse_args()
+
+    html = large_page(int(args.size_mb * 1_000_000))
+    modes = {
+        "inline": ParsePool(workers=0),
+        f"pool x{args.workers}": ParsePool(workers=args.workers, queue_depth=2 * args.workers, inline_bytes=0),
+    }
+    print(f"{len(html) / 1_000_000:.1f} MB page, {args.pages} pages, {args.concurrency} in flight")
+    print(f"{'mode':<12} {'wall s':>8} {'pages/s':>8} {'lag p50 ms':>11} {'lag p95 ms':>11} {'lag max ms':>11}")
+    for name, pool in modes.items():
+        try:
+            elapsed, lag = asyncio.run(run_mode(pool, html, args.pages, args.concurrency))
+        finally:
+            pool.close()
+        print(f"{name:<12} {elapsed:>8.2f} {args.pages / elapsed:>8.2f} {lag['p50_ms']:>11.1f} "
+              f"{lag['p95_ms']:>11.1f} {lag['max_ms']:>11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
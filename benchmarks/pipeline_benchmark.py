@@ -0,0 +1,126 @@
+"""
+End-to-end pipeline benchmark against local stand-in services.
+
+Starts the fake Brave, page and LLM services from benchmarks/fake_services.py, points the
+pipeline at them (BRAVE_SEARCH_API_URL, OPENROUTER_BASE_URL), loads generated topics into
+an InMemoryTopicQueue and runs asp.main.main() once (or twice with --warm, reporting the
+second run against warm caches). Reports topics per minute, p50/p95 seconds per stage,
+LLM calls per topic and the LLM gateway's hedges and fallbacks. Nothing leaves the machine.
+
+--llm-slow-share makes a share of chat completions take --llm-slow-latency seconds, to
+compare tail latency with hedging on and off (ASP_LLM_HEDGE=off).
+
+Rate limits default to off so the numbers measure the pipeline rather than the quotas;
+pass --keep-rate-limits to benchmark with the configured limits.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py [--topics N] [--concurrency N] [--llm-latency S] ...
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from fake_services import FakeServices
+
+TOPIC_WORDS = ("perfume", "coffee", "running", "gardening", "budget travel", "sourdough", "chess", "cycling",
+               "photography", "meditation", "houseplants", "home office", "tea", "hiking", "woodworking")
+
+
+def topic_names(count: int):
+    """Returns `count` distinct topic names."""
+    return [f"{TOPIC_WORDS[index % len(TOPIC_WORDS)]} tips {index // len(TOPIC_WORDS) + 1}" for index in range(count)]
+
+
+def configure_environment(services: FakeServices, work_dir: str, keep_rate_limits: bool) -> None:
+    """Points the pipeline at the stand-in services and a scratch directory."""
+    os.environ.update({
+        "BRAVE_API_KEY": "benchmark",
+        "BRAVE_SEARCH_API_URL": services.brave_url,
+        "OPENROUTER_API_KEY": "benchmark",
+        "OPENROUTER_BASE_URL": services.llm_url,
+        "ASP_CACHE_DIR": os.path.join(work_dir, "cache"),
+        "ASP_OUTPUT_DIR": os.path.join(work_dir, "output"),
+        "ASP_TOPIC_LEASING": "off",
+        "NO_PROXY": "127.0.0.1,localhost",
+        "LOGFIRE_SEND_TO_LOGFIRE": "false",
+        "LOGFIRE_CONSOLE": "false",
+    })
+    if not keep_rate_limits:
+        os.environ.update({"ASP_BRAVE_RATE": "0", "ASP_DOMAIN_RATE": "0", "ASP_LLM_RPM": "0", "ASP_LLM_TPM": "0"})
+
+
+async def run_pipeline(topics, concurrency: int):
+    """Runs one pipeline pass over fresh copies of the topics and returns (seconds, processed count)."""
+    from asp.db.memory_topic_queue import InMemoryTopicQueue
+    from asp.main import main as pipeline_main
+
+    queue = InMemoryTopicQueue(topics)
+    started = time.perf_counter()
+    await pipeline_main(batch_size=len(topics), max_concurrent_topics=concurrency, topic_queue=queue)
+    elapsed = time.perf_counter() - started
+    return elapsed, sum(1 for row in queue.rows.values() if row["Processed"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=20, help="topics in the queue")
+    parser.add_argument("--concurrency", type=int, default=4, help="topics processed at once")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="seconds per search response")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="seconds per page response")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per chat completion")
+    parser.add_argument("--llm-slow-share", type=float, default=0.0, help="share of chat completions that are slow")
+    parser.add_argument("--llm-slow-latency", type=float, default=5.0, help="seconds per slow chat completion")
+    parser.add_argument("--invalid-share", type=float, default=0.2, help="share of pages that fail validation (these escalate to the browser tier too)")
+    parser.add_argument("--js-share", type=float, default=0.0,
+                        help="share of pages that need the browser tier (requires installed Playwright browsers)")
+    parser.add_argument("--warm", action="store_true", help="run twice and report the run against warm caches")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="keep the configured rate limits")
+    args = parser.parse_args()
+
+    services = FakeServices(search_latency=args.search_latency, page_latency=args.page_latency,
+                            llm_latency=args.llm_latency, invalid_share=args.invalid_share,
+                            js_share=args.js_share, llm_slow_share=args.llm_slow_share,
+                            llm_slow_latency=args.llm_slow_latency).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="asp-bench-") as work_dir:
+            configure_environment(services, work_dir, args.keep_rate_limits)
+            # Imported after the environment is set: the pipeline reads it on import and first use
+            from asp.agents.llm_gateway import get_llm_gateway
+            from asp.pipeline.streaming import stage_timing_stats
+            from asp.scraper.browser_pool import get_browser_pool
+
+            topics = topic_names(args.topics)
+            runs = 2 if args.warm else 1
+            for run in range(runs):
+                # Each pass reports only its own stage timings and service calls
+                stage_timing_stats.reset()
+                before = dict(services.counts)
+                elapsed, processed = asyncio.run(run_pipeline(topics, args.concurrency))
+                calls = {route: services.counts[route] - before[route] for route in services.counts}
+    finally:
+        services.stop()
+
+    print(f"run: {'warm' if args.warm else 'cold'} caches, {args.topics} topics, concurrency {args.concurrency}, "
+          f"LLM latency {args.llm_latency}s")
+    print(f"processed: {processed}/{args.topics} topics in {elapsed:.2f}s")
+    print(f"throughput: {processed / elapsed * 60:.1f} topics/min")
+    print(f"service calls: search {calls['search']}, pages {calls['page']}, LLM {calls['llm']}")
+    print(f"LLM calls per topic: {calls['llm'] / args.topics:.2f}")
+    print(f"{'stage':<10} {'p50 s':>8} {'p95 s':>8}")
+    for stage, values in stage_timing_stats.percentiles().items():
+        print(f"{stage:<10} {values['p50']:>8.3f} {values['p95']:>8.3f}")
+    browser_pool = get_browser_pool()
+    print(f"browser pool: {browser_pool.starts} browser starts for {browser_pool.pages_served} pages, "
+          f"peak RSS {browser_pool.peak_rss_mb:.0f} MB")
+    for model, stats in get_llm_gateway().stats().items():
+        print(f"LLM {model}: p50 {stats['p50_s']:.2f}s, p95 {stats['p95_s']:.2f}s, {stats['hedges']} hedges "
+              f"({stats['hedge_wins']} won), {stats['errors']} errors, {stats['fallbacks']} fallbacks")
+    print(f"crawl/summarize overlap: {stage_timing_stats.as_dict()['summarize_overlap_share']:.1%} of summarize time")
+    return 0 if processed == args.topics else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
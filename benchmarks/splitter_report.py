@@ -0,0 +1,108 @@
+"""
+Chunking report for the text splitter modes.
+
+Runs every page in benchmarks/corpus (plus any text or HTML files given on the command
+line, and a long synthetic article) through asp.scraper.parser.parse_html, splits the
+cleaned text with both asp.nlp.splitter modes, and reports per article the chunks
+produced and the prompt tokens the map step would send to the LLM (chunk tokens plus
+the summarization prompt for every chunk). The totals show the tokens the token-budget
+splitter saves over the 1000-character splitter.
+
+Usage:
+    python benchmarks/splitter_report.py [--chunk-tokens N] [--overlap-tokens N] [FILE ...]
+"""
+import argparse
+import os
+import sys
+from typing import List, Tuple
+
+from asp.agents.summarizer import SUMMARIZE_PROMPT_KEY
+from asp.nlp.splitter import (
+    DEFAULT_CHUNK_OVERLAP_TOKENS,
+    DEFAULT_CHUNK_TOKENS,
+    SPLITTER_MODE_CHARS,
+    SPLITTER_MODE_TOKENS,
+    split_text,
+)
+from asp.nlp.tokens import count_tokens, get_encoding
+from asp.scraper.parser import parse_html
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def load_articles(extra_paths: List[str]) -> List[Tuple[str, str]]:
+    """
+    Loads the corpus pages and extra files as cleaned article text, plus a long synthetic article.
+
+    Args:
+        extra_paths (List[str]): Additional .html or plain-text files.
+
+    Returns:
+        List[Tuple[str, str]]: (name, text) pairs; pages without text are skipped.
+    """
+    paths = [os.path.join(CORPUS_DIR, name) for name in sorted(os.listdir(CORPUS_DIR)) if name.endswith(".html")]
+    articles = []
+    for path in paths + extra_paths:
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        text = parse_html(content).text if path.endswith((".html", ".htm")) else content
+        if text.strip():
+            articles.append((os.path.basename(path), text))
+
+    # Real articles are often much longer than the corpus pages; repeat the blog post to ~60k characters
+    blog_post = dict(articles).get("blog_post.html", "")
+    if blog_post:
+        articles.append(("synthetic_long.txt", "\n\n".join([blog_post] * (60_000 // len(blog_post) + 1))))
+    return articles
+
+
+def prompt_tokens(chunks: List[str], overhead: int) -> int:
+    """Returns the prompt tokens the map step sends for these chunks."""
+    return sum(count_tokens(chunk) + overhead for chunk in chunks)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS, help="token budget per chunk")
+    parser.add_argument("--overlap-tokens", type=int, default=DEFAULT_CHUNK_OVERLAP_TOKENS,
+                        help="maximum overlap between chunks in tokens")
+    parser.add_argument("files", nargs="*", help="extra .html or text files to include")
+    args = parser.parse_args()
+
+    if get_encoding() is None:
+        print("tiktoken encoding unavailable; token counts are estimated from text length", file=sys.stderr)
+    overhead = count_tokens(SUMMARIZE_PROMPT_KEY)
+
+    totals = {"articles": 0, "chars_chunks": 0, "tokens_chunks": 0, "chars_prompt": 0, "tokens_prompt": 0}
+    print(f"{'article':<24} {'text tok':>9} {'chars chunks':>13} {'token chunks':>13} "
+          f"{'chars prompt':>13} {'token prompt':>13} {'saved':>8}")
+    for name, text in load_articles(args.files):
+        char_chunks = split_text(text, mode=SPLITTER_MODE_CHARS)
+        token_chunks = split_text(text, mode=SPLITTER_MODE_TOKENS, chunk_tokens=args.chunk_tokens,
+                                  overlap_tokens=args.overlap_tokens)
+        chars_prompt = prompt_tokens(char_chunks, overhead)
+        tokens_prompt = prompt_tokens(token_chunks, overhead)
+
+        totals["articles"] += 1
+        totals["chars_chunks"] += len(char_chunks)
+        totals["tokens_chunks"] += len(token_chunks)
+        totals["chars_prompt"] += chars_prompt
+        totals["tokens_prompt"] += tokens_prompt
+        print(f"{name:<24} {count_tokens(text):>9} {len(char_chunks):>13} {len(token_chunks):>13} "
+              f"{chars_prompt:>13} {tokens_prompt:>13} {chars_prompt - tokens_prompt:>8}")
+
+    if not totals["articles"]:
+        print("No articles with text found.", file=sys.stderr)
+        return 1
+    saved = totals["chars_prompt"] - totals["tokens_prompt"]
+    print(f"{'total':<24} {'':>9} {totals['chars_chunks']:>13} {totals['tokens_chunks']:>13} "
+          f"{totals['chars_prompt']:>13} {totals['tokens_prompt']:>13} {saved:>8}")
+    print(f"chunks per article: chars {totals['chars_chunks'] / totals['articles']:.2f}, "
+          f"tokens {totals['tokens_chunks'] / totals['articles']:.2f}")
+    print(f"prompt tokens saved: {saved} ({saved / totals['chars_prompt']:.1%}), "
+          f"LLM calls saved: {totals['chars_chunks'] - totals['tokens_chunks']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+import asyncio
+import contextlib
+import os
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+import logfire
+
+from asp.utils.env import get_bool_env, get_float_env, get_int_env
+from asp.utils.metrics import metrics
+from asp.utils.rate_limit import get_rate_limiter
+from asp.utils.retry import RetryPolicy, get_retry_after, get_status_code, retry_async
+from asp.utils.stats import percentile
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_openai import ChatOpenAI
+
+# Environment variable name for the OpenRouter API key
+OPENROUTER_API_KEY_ENV_VAR = "OPENROUTER_API_KEY"
+# Overrides the OpenAI-compatible endpoint, e.g. to point the pipeline at a local stand-in for benchmarks
+OPENROUTER_BASE_URL_ENV_VAR = "OPENROUTER_BASE_URL"
+DEFAULT_OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Environment variable names for the gateway configuration
+LLM_MODEL_ENV_VAR = "ASP_LLM_MODEL"
+LLM_FALLBACK_MODELS_ENV_VAR = "ASP_LLM_FALLBACK_MODELS" # Comma-separated, tried in order
+LLM_TIMEOUT_ENV_VAR = "ASP_LLM_TIMEOUT"
+LLM_HEDGE_ENV_VAR = "ASP_LLM_HEDGE"
+LLM_HEDGE_MIN_DELAY_ENV_VAR = "ASP_LLM_HEDGE_MIN_DELAY"
+LLM_MAX_CONNECTIONS_ENV_VAR = "ASP_LLM_MAX_CONNECTIONS"
+
+DEFAULT_LLM_MODEL = "gpt-3.5-turbo"
+DEFAULT_LLM_TIMEOUT = 60.0 # Seconds per request before it counts as failed
+DEFAULT_HEDGE_MIN_DELAY = 2.0 # Never hedge sooner than this, however fast the model usually is
+DEFAULT_LLM_MAX_CONNECTIONS = 20
+
+# Latency samples per model kept for the p95, and successes needed before the p95 is trusted
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+# At most this share of requests may send a hedge, so a slow provider isn't hit with double load
+HEDGE_BUDGET = 0.1
+# Recent outcomes per model; a model failing at least this share of them is tried after the healthy ones
+ERROR_WINDOW = 20
+ERROR_WINDOW_MIN_SAMPLES = 5
+UNHEALTHY_ERROR_RATE = 0.5
+# Seconds after its last error before an unhealthy model is tried first again
+UNHEALTHY_COOLDOWN = 60.0
+
+# Retries for rate-limited (429) and transient LLM errors on the last model to try; the client's own retries are disabled
+LLM_RETRY_POLICY = RetryPolicy(max_attempts=4, base_delay=2.0, max_delay=30.0, deadline=180.0)
+# Models with a fallback behind them get one quick retry before the gateway moves on
+FALLBACK_RETRY_POLICY = RetryPolicy(max_attempts=2, base_delay=1.0, max_delay=5.0, deadline=90.0)
+
+LLM_REQUESTS = metrics.counter("asp_llm_requests_total", "LLM requests by model and outcome (ok, error, timeout, cancelled)")
+LLM_REQUEST_SECONDS = metrics.histogram("asp_llm_request_seconds", "Latency of successful LLM requests by model")
+LLM_REQUESTS_IN_FLIGHT = metrics.gauge("asp_llm_requests_in_flight", "LLM requests currently waiting on the provider")
+LLM_TOKENS = metrics.counter("asp_llm_tokens_total", "Tokens reported by the provider, by model and kind (input, output)")
+LLM_HEDGES = metrics.counter("asp_llm_hedges_total", "Hedged duplicate LLM requests sent, by model")
+LLM_FALLBACKS = metrics.counter("asp_llm_fallbacks_total", "LLM calls that gave up on a model and fell back, by model")
+
+_llm_gateway: Optional["LLMGateway"] = None
+
+
+class ModelStats:
+    """
+    Rolling latency and error statistics for one model, used to time hedges and order fallbacks.
+    """
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes: Deque[bool] = deque(maxlen=ERROR_WINDOW) # True for a success
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0 # Calls that gave up on this model and moved to the next
+        self.last_error_at = 0.0
+
+    def record_success(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self.outcomes.append(True)
+
+    def record_error(self, error: BaseException) -> None:
+        self.errors += 1
+        if isinstance(error, TimeoutError):
+            self.timeouts += 1
+        self.outcomes.append(False)
+        self.last_error_at = time.monotonic()
+
+    def p95(self) -> Optional[float]:
+        """Returns the p95 latency in seconds, or None until enough requests have succeeded."""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(list(self.latencies), 0.95)
+
+    def error_rate(self) -> float:
+        """Returns the share of recent requests that failed."""
+        if len(self.outcomes) < ERROR_WINDOW_MIN_SAMPLES:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def is_unhealthy(self) -> bool:
+        """Returns True while the model fails often and has failed within the cooldown."""
+        return (self.error_rate() >= UNHEALTHY_ERROR_RATE
+                and time.monotonic() - self.last_error_at < UNHEALTHY_COOLDOWN)
+
+    def as_dict(self) -> Dict[str, Any]:
+        latencies = list(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "p50_s": round(percentile(latencies, 0.5), 3),
+            "p95_s": round(percentile(latencies, 0.95), 3),
+            "recent_error_rate": round(self.error_rate(), 3),
+        }
+
+
+class LLMGateway:
+    """
+    Process-wide entry point for chat completions, owning one pooled HTTP client and one
+    chat model client per model.
+
+    A request still running after the model's p95 latency (but no sooner than
+    `hedge_min_delay`) gets a hedged duplicate; the first answer wins and the other is
+    cancelled. Hedges are capped at HEDGE_BUDGET of requests. When a model keeps failing
+    or timing out the call falls back to the next model in `models`, and models with a
+    high recent error rate are tried after the healthy ones until UNHEALTHY_COOLDOWN
+    passes without a new error. Every request goes through the shared LLM rate limits,
+    and a 429 pauses them for all callers.
+    """
+    def __init__(self, models: Sequence[str], api_key: Optional[str] = None,
+                 base_url: str = DEFAULT_OPENROUTER_BASE_URL, timeout: Optional[float] = DEFAULT_LLM_TIMEOUT,
+                 hedge: bool = True, hedge_min_delay: float = DEFAULT_HEDGE_MIN_DELAY,
+                 max_connections: int = DEFAULT_LLM_MAX_CONNECTIONS):
+        """
+        Initializes the gateway; clients are created on the first request.
+
+        Args:
+            models (Sequence[str]): The primary model followed by its fallbacks, in order.
+            api_key (Optional[str]): The OpenRouter API key.
+            base_url (str): The OpenAI-compatible endpoint.
+            timeout (Optional[float]): Seconds per request, or None for no limit.
+            hedge (bool): Whether to send hedged duplicates of slow requests.
+            hedge_min_delay (float): The shortest wait before a hedge, in seconds.
+            max_connections (int): Connections in the shared HTTP pool.
+        """
+        self.models = list(dict.fromkeys(model for model in models if model)) or [DEFAULT_LLM_MODEL]
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.max_connections = max_connections
+        self.model_stats: Dict[str, ModelStats] = {model: ModelStats() for model in self.models}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._clients: Dict[str, "ChatOpenAI"] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> "LLMGateway":
+        """
+        Builds the gateway from OPENROUTER_API_KEY, OPENROUTER_BASE_URL and the ASP_LLM_* variables.
+        """
+        fallbacks = os.environ.get(LLM_FALLBACK_MODELS_ENV_VAR, "")
+        return cls(
+            models=[os.environ.get(LLM_MODEL_ENV_VAR) or DEFAULT_LLM_MODEL]
+                   + [model.strip() for model in fallbacks.split(",")],
+            api_key=os.environ.get(OPENROUTER_API_KEY_ENV_VAR),
+            base_url=os.environ.get(OPENROUTER_BASE_URL_ENV_VAR) or DEFAULT_OPENROUTER_BASE_URL,
+            timeout=get_float_env(LLM_TIMEOUT_ENV_VAR, DEFAULT_LLM_TIMEOUT),
+            hedge=get_bool_env(LLM_HEDGE_ENV_VAR, True),
+            hedge_min_delay=get_float_env(LLM_HEDGE_MIN_DELAY_ENV_VAR, DEFAULT_HEDGE_MIN_DELAY) or 0.0,
+            max_connections=get_int_env(LLM_MAX_CONNECTIONS_ENV_VAR, DEFAULT_LLM_MAX_CONNECTIONS),
+        )
+
+    def _client(self, model: str) -> "ChatOpenAI":
+        if not self.api_key:
+            logfire.error("OpenRouter API key not found in environment variables.")
+            raise ValueError(f"{OPENROUTER_API_KEY_ENV_VAR} environment variable not set.")
+        # Pooled connections belong to one event loop; a new loop gets fresh clients
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections))
+            self._clients = {}
+            self._loop = loop
+        if model not in self._clients:
+            # langchain_openai (and the openai SDK) load with the first LLM call, not at startup
+            from langchain_openai import ChatOpenAI
+            self._clients[model] = ChatOpenAI(
+                model=model,
+                base_url=self.base_url,
+                api_key=self.api_key,
+                http_async_client=self._http_client,
+                max_retries=0 # Retries, timeouts and fallbacks are handled by the gateway
+            )
+        return self._clients[model]
+
+    def _model_order(self) -> List[str]:
+        # Healthy models first, each group in the configured order
+        return sorted(self.models, key=lambda model: self.model_stats[model].is_unhealthy())
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """Returns how long to wait before hedging a request to `model`, or None not to hedge it."""
+        stats = self.model_stats[model]
+        p95 = stats.p95()
+        if not self.hedge or p95 is None or stats.hedges >= HEDGE_BUDGET * stats.requests:
+            return None
+        return max(self.hedge_min_delay, p95)
+
+    async def _request(self, model: str, messages: List["BaseMessage"], prompt: str,
+                       semaphore: Optional[asyncio.Semaphore], hedge: bool = False) -> str:
+        """Sends one chat completion, recording its latency or error."""
+        client = self._client(model)
+        rate_limiter = get_rate_limiter().llm
+        stats = self.model_stats[model]
+        await rate_limiter.acquire(prompt)
+        async with semaphore or contextlib.nullcontext():
+            stats.requests += 1
+            started = time.perf_counter()
+            with logfire.span("LLM request to {model}", model=model, hedge=hedge), \
+                    LLM_REQUESTS_IN_FLIGHT.track(model=model):
+                try:
+                    response = await asyncio.wait_for(client.ainvoke(messages), self.timeout)
+                except asyncio.CancelledError:
+                    LLM_REQUESTS.inc(model=model, outcome="cancelled") # Usually the losing side of a hedge
+                    raise
+                except Exception as e:
+                    stats.record_error(e)
+                    LLM_REQUESTS.inc(model=model, outcome="timeout" if isinstance(e, TimeoutError) else "error")
+                    if get_status_code(e) == 429:
+                        rate_limiter.pause(get_retry_after(e) or 1.0)
+                    raise
+            elapsed = time.perf_counter() - started
+            stats.record_success(elapsed)
+            LLM_REQUESTS.inc(model=model, outcome="ok")
+            LLM_REQUEST_SECONDS.observe(elapsed, model=model)
+            usage = getattr(response, "usage_metadata", None) or {}
+            for kind in ("input", "output"):
+                if usage.get(f"{kind}_tokens"):
+                    LLM_TOKENS.inc(usage[f"{kind}_tokens"], model=model, kind=kind)
+        return response.content
+
+    async def _hedged_request(self, model: str, messages: List["BaseMessage"], prompt: str,
+                              semaphore: Optional[asyncio.Semaphore]) -> str:
+        """Sends a request and, if it outlives the hedge delay, a duplicate; returns the first answer."""
+        first = asyncio.ensure_future(self._request(model, messages, prompt, semaphore))
+        delay = self._hedge_delay(model)
+        if delay is None:
+            return await first
+
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done and self._hedge_delay(model) is not None:
+                self.model_stats[model].hedges += 1
+                LLM_HEDGES.inc(model=model)
+                logfire.debug("LLM request to {model} still running after {delay:.2f}s; sending a hedge.",
+                              model=model, delay=delay)
+                pending.add(asyncio.ensure_future(self._request(model, messages, prompt, semaphore, hedge=True)))
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    # Retrieve every finished task's error so none is reported as unhandled
+                    if task.exception() is None:
+                        if task is not first:
+                            self.model_stats[model].hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete(self, messages: List["BaseMessage"],
+                       semaphore: Optional[asyncio.Semaphore] = None) -> Tuple[str, str]:
+        """
+        Returns a chat completion, hedging slow requests and falling back to other models on failure.
+
+        Args:
+            messages (List[BaseMessage]): The chat messages.
+            semaphore (Optional[asyncio.Semaphore]): Caps LLM requests in flight, held only during a request.
+
+        Returns:
+            Tuple[str, str]: The generated text and the model that produced it.
+        """
+        prompt = "\n".join(str(message.content) for message in messages)
+        order = self._model_order()
+        last_error: Optional[BaseException] = None
+        for position, model in enumerate(order):
+            is_last = position == len(order) - 1
+            try:
+                text = await retry_async(self._hedged_request, model, messages, prompt, semaphore,
+                                         policy=LLM_RETRY_POLICY if is_last else FALLBACK_RETRY_POLICY)
+            except asyncio.CancelledError:
+                raise
+            except ValueError:
+                raise # Configuration errors fail the same way for every model
+            except Exception as e:
+                last_error = e
+                if not is_last:
+                    self.model_stats[model].fallbacks += 1
+                    LLM_FALLBACKS.inc(model=model)
+                    logfire.warn("LLM call to {model} failed: {error}. Falling back to {fallback}.",
+                                 model=model, error=e, fallback=order[position + 1])
+                continue
+            return text, model
+        raise last_error
+
+    async def close(self) -> None:
+        """Closes the pooled HTTP client; the next request opens a new one."""
+        if self._http_client is not None and self._loop is asyncio.get_running_loop():
+            await self._http_client.aclose()
+        self._http_client = None
+        self._clients = {}
+        self._loop = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns each model's request, error, hedge and fallback counts and latency percentiles, for logging."""
+        return {model: stats.as_dict() for model, stats in self.model_stats.items()}
+
+
+def get_llm_gateway() -> LLMGateway:
+    """
+    Returns the process-wide LLM gateway, creating it from the environment on first use.
+    """
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway.from_env()
+    return _llm_gateway
+
+
+async def close_llm_gateway() -> None:
+    """
+    Closes the LLM gateway's HTTP connections if it was created. Safe to call more than once.
+    """
+    if _llm_gateway is not None:
+        await _llm_gateway.close()
@@ -1,76 +1,178 @@
-import os
+import asyncio
 import logfire
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import Any, List, Optional
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import LLMChain # Import LLMChain for manual summarization
+from asp.agents.llm_gateway import LLMGateway, get_llm_gateway
+from asp.agents.summary_cache import SummaryCache, get_summary_cache
 
-# Environment variable name for the OpenRouter API key
-OPENROUTER_API_KEY_ENV_VAR = "OPENROUTER_API_KEY"
+# Default number of chunk summaries requested from the LLM at the same time
+DEFAULT_MAX_CONCURRENCY = 4
 
-async def summarize_chunks_langchain(text_chunks: List[str]) -> str:
+# Define the summarization prompt template for individual chunks
+SUMMARIZE_SYSTEM_PROMPT = "You are a helpful assistant that summarizes text chunks."
+SUMMARIZE_PROMPT_TEMPLATE = """
+    Summarize the following text chunk concisely, focusing on the main points.
+
+    Text chunk:
+    {text_chunk}
     """
-    Summarizes a list of text chunks using a manual Langchain approach.
 
-    Args:
-        text_chunks (List[str]): A list of text chunks to summarize.
+# Define the prompt template that merges chunk summaries into one article summary
+REDUCE_SYSTEM_PROMPT = "You are a helpful assistant that merges partial summaries into one summary."
+REDUCE_PROMPT_TEMPLATE = """
+    The following are summaries of consecutive chunks of the same article.
+    Merge them into a single concise summary of the whole article, removing repetition
+    and keeping the main points in order.
 
-    Returns:
-        str: The combined summary of all chunks.
+    Chunk summaries:
+    {chunk_summaries}
     """
-    logfire.info("Summarizing multiple text chunks using manual Langchain approach.", num_chunks=len(text_chunks))
-
-    openrouter_api_key = os.environ.get(OPENROUTER_API_KEY_ENV_VAR)
-    if not openrouter_api_key:
-        logfire.error("OpenRouter API key not found in environment variables.")
-        raise ValueError(f"{OPENROUTER_API_KEY_ENV_VAR} environment variable not set.")
-
-    # Configure the LLM to use OpenRouter
-    llm = ChatOpenAI(
-        model="gpt-3.5-turbo", # Using a standard model name
-        base_url="https://openrouter.ai/api/v1",
-        api_key=openrouter_api_key
-    )
-
-    # Define the summarization prompt template for individual chunks
-    summarize_prompt_template = """
-    Summarize the following text chunk concisely, focusing on the main points.
 
-    Text chunk:
-    {text_chunk}
+# Cache key components for each prompt: the system prompt and the human template together
+SUMMARIZE_PROMPT_KEY = f"{SUMMARIZE_SYSTEM_PROMPT}\n{SUMMARIZE_PROMPT_TEMPLATE}"
+REDUCE_PROMPT_KEY = f"{REDUCE_SYSTEM_PROMPT}\n{REDUCE_PROMPT_TEMPLATE}"
+
+@lru_cache(maxsize=None)
+def _chat_prompt(system_prompt: str, human_template: str) -> Any:
+    """
+    Returns the ChatPromptTemplate for a system prompt and human template, built on first use
+    so langchain is only imported once the pipeline actually summarizes something.
     """
-    summarize_prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful assistant that summarizes text chunks."),
-        ("human", summarize_prompt_template)
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", human_template)
     ])
 
-    # Create an LLMChain for summarizing individual chunks
-    summarize_chain = LLMChain(llm=llm, prompt=summarize_prompt)
+async def _cached_summary(cache: Optional[SummaryCache], text: str, gateway: LLMGateway, prompt_key: str) -> Optional[str]:
+    """
+    Returns a cached summary of `text` from any of the gateway's models, preferring the primary one.
+    """
+    if not cache:
+        return None
+    for model in gateway.models:
+        cached_summary = await cache.get(text, model, prompt_key)
+        if cached_summary:
+            return cached_summary
+    return None
+
+async def _summarize_chunk(gateway: LLMGateway, chunk: str, index: int, total: int,
+                           semaphore: asyncio.Semaphore, cache: Optional[SummaryCache]) -> Optional[str]:
+    """
+    Summarizes a single chunk through the LLM gateway, holding a slot of the shared semaphore
+    for each request. Cached summaries are returned without calling the LLM.
 
-    chunk_summaries = []
-    for i, chunk in enumerate(text_chunks):
-        logfire.debug("Summarizing chunk {index}/{total}", index=i+1, total=len(text_chunks))
-        try:
-            # Invoke the LLMChain for the current chunk
-            # The result from LLMChain.ainvoke is a dictionary, the summary is in the 'text' key
-            result = await summarize_chain.ainvoke({"text_chunk": chunk})
-            chunk_summary = result.get('text', '') # Get the summary text
+    Args:
+        gateway (LLMGateway): The gateway used to call the LLM.
+        chunk (str): The text chunk to summarize.
+        index (int): The zero-based position of the chunk, used for logging.
+        total (int): The total number of chunks, used for logging.
+        semaphore (asyncio.Semaphore): Caps the number of LLM calls in flight.
+        cache (Optional[SummaryCache]): The summary cache, or None to bypass it.
 
-            if chunk_summary:
-                chunk_summaries.append(chunk_summary)
-            else:
-                 logfire.warn("Summarization returned empty for chunk {index}.", index=i+1)
+    Returns:
+        Optional[str]: The chunk summary, or None if summarization failed or returned nothing.
+    """
+    cached_summary = await _cached_summary(cache, chunk, gateway, SUMMARIZE_PROMPT_KEY)
+    if cached_summary:
+        logfire.debug("Summary cache hit for chunk {index}/{total}", index=index+1, total=total)
+        return cached_summary
+
+    try:
+        with logfire.span("Summarizing chunk {index}/{total}", index=index+1, total=total, chars=len(chunk)):
+            chunk_summary, model = await gateway.complete(
+                _chat_prompt(SUMMARIZE_SYSTEM_PROMPT, SUMMARIZE_PROMPT_TEMPLATE).format_messages(text_chunk=chunk),
+                semaphore)
+
+        if chunk_summary:
+            if cache:
+                # Cached under the model that wrote it, so a fallback answer is not passed off as the primary's
+                await cache.set(chunk, model, SUMMARIZE_PROMPT_KEY, chunk_summary)
+            return chunk_summary
+        logfire.warn("Summarization returned empty for chunk {index}.", index=index+1)
+
+    except ValueError:
+        raise # Missing configuration (e.g. the API key) fails every chunk the same way
+    except Exception as e:
+        logfire.error("Error summarizing chunk {index}: {error}", index=index+1, error=e, exc_info=True)
+        # Other chunks are unaffected if one fails
+
+    return None
+
+async def summarize_chunks_langchain(text_chunks: List[str], max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                                     reduce: bool = False,
+                                     semaphore: Optional[asyncio.Semaphore] = None,
+                                     use_cache: bool = True) -> str:
+    """
+    Summarizes a list of text chunks using a manual Langchain approach.
 
-        except Exception as e:
-            logfire.error("Error summarizing chunk {index}: {error}", index=i+1, error=e, exc_info=True)
-            # Continue to the next chunk even if one fails
+    Chunks are summarized concurrently (map phase) with at most `max_concurrency` LLM calls
+    in flight; pass a shared `semaphore` instead to cap calls across several articles or topics.
+    Chunk summaries keep their original order. When `reduce` is True and more than one chunk
+    succeeded, a final LLM call merges them into a single article summary. Both chunk and
+    reduce summaries are served from the on-disk summary cache when available. LLM calls go
+    through the shared gateway (see asp.agents.llm_gateway), which adds hedging and model fallback.
+
+    Args:
+        text_chunks (List[str]): A list of text chunks to summarize.
+        max_concurrency (int): The maximum number of chunk summaries in flight when no semaphore is given.
+        reduce (bool): Whether to merge the chunk summaries with an extra LLM call.
+        semaphore (Optional[asyncio.Semaphore]): A shared limiter for LLM calls, overriding `max_concurrency`.
+        use_cache (bool): Set to False to bypass the summary cache for this call.
+
+    Returns:
+        str: The combined (or reduced) summary of all chunks.
+    """
+    logfire.info("Summarizing multiple text chunks using manual Langchain approach.",
+                 num_chunks=len(text_chunks), max_concurrency=max_concurrency, reduce=reduce)
+
+    gateway = get_llm_gateway()
+    cache = get_summary_cache() if use_cache else None
+
+    # Map phase: summarize all chunks concurrently, preserving chunk order. A chunk that
+    # raises (missing configuration) cancels its siblings so they stop spending LLM calls.
+    semaphore = semaphore or asyncio.Semaphore(max(1, max_concurrency))
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(_summarize_chunk(gateway, chunk, i, len(text_chunks), semaphore, cache))
+                     for i, chunk in enumerate(text_chunks)]
+    except ExceptionGroup as errors:
+        raise errors.exceptions[0] from None
+    results = [task.result() for task in tasks]
+    chunk_summaries = [summary for summary in results if summary]
+    failed_chunks = [i + 1 for i, summary in enumerate(results) if not summary]
+    if failed_chunks:
+        logfire.warn("{num_failed} of {total} chunks could not be summarized: {failed_chunks}",
+                     num_failed=len(failed_chunks), total=len(text_chunks), failed_chunks=failed_chunks)
 
     # Manually combine the individual chunk summaries
     combined_summary = "\n\n".join(chunk_summaries)
 
-    logfire.info("Manual Langchain summarization completed. Combined summaries from {num_successful_chunks} chunks.", num_successful_chunks=len(chunk_summaries))
+    # Optional reduce phase: merge the chunk summaries into one article summary
+    cached_reduce = None
+    if reduce and len(chunk_summaries) > 1:
+        cached_reduce = await _cached_summary(cache, combined_summary, gateway, REDUCE_PROMPT_KEY)
+    if cached_reduce:
+        combined_summary = cached_reduce
+    elif reduce and len(chunk_summaries) > 1:
+        try:
+            reduced_summary, model = await gateway.complete(
+                _chat_prompt(REDUCE_SYSTEM_PROMPT, REDUCE_PROMPT_TEMPLATE).format_messages(
+                    chunk_summaries=combined_summary), semaphore)
+            if reduced_summary:
+                if cache:
+                    await cache.set(combined_summary, model, REDUCE_PROMPT_KEY, reduced_summary)
+                combined_summary = reduced_summary
+            else:
+                logfire.warn("Reduce step returned empty. Keeping the combined chunk summaries.")
+        except Exception as e:
+            logfire.error("Error in reduce step: {error}. Keeping the combined chunk summaries.", error=e, exc_info=True)
+
+    logfire.info("Manual Langchain summarization completed. Combined summaries from {num_successful_chunks} chunks.",
+                 num_successful_chunks=len(chunk_summaries),
+                 cache_stats=cache.stats.as_dict() if cache and cache.stats else None)
 
     return combined_summary
 
-# The old SummarizationAgent class and document chain logic are replaced
\ No newline at end of file
+# The old SummarizationAgent class and document chain logic are replaced
@@ -0,0 +1,95 @@
+import hashlib
+import os
+from typing import Optional
+
+import logfire
+
+from asp.utils.cache import DiskCache, get_cache_dir
+from asp.utils.env import get_bool_env, get_int_env
+
+# Environment variable names for the summary cache
+SUMMARY_CACHE_ENABLED_ENV_VAR = "ASP_SUMMARY_CACHE"
+SUMMARY_CACHE_MAX_MB_ENV_VAR = "ASP_SUMMARY_CACHE_MAX_MB"
+DEFAULT_SUMMARY_CACHE_MAX_MB = 256
+
+_summary_cache: Optional["SummaryCache"] = None
+
+
+def summary_cache_key(text: str, model: str, prompt_template: str) -> str:
+    """
+    Builds the content-addressed key for a summary.
+
+    Args:
+        text (str): The text being summarized (a chunk, or the joined chunk summaries for a reduce).
+        model (str): The LLM model name.
+        prompt_template (str): The full prompt (system and human templates) used for the call.
+
+    Returns:
+        str: A hex SHA-256 digest identifying the (text, model, prompt) combination.
+    """
+    digest = hashlib.sha256()
+    for part in (model, prompt_template, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """
+    On-disk cache of LLM summaries keyed by a hash of text, model and prompt template.
+
+    Changing the model or the prompt produces new keys, so stale summaries are never served;
+    they simply age out through LRU eviction.
+    """
+    def __init__(self, path: str, max_bytes: int, enabled: bool = True):
+        """
+        Initializes the summary cache.
+
+        Args:
+            path (str): The SQLite file path.
+            max_bytes (int): The maximum total size of cached summaries.
+            enabled (bool): When False the cache is bypassed: every lookup misses and nothing is stored.
+        """
+        self.enabled = enabled
+        self._cache = DiskCache(path, max_bytes) if enabled else None
+
+    @property
+    def stats(self):
+        """Hit/miss counters of the underlying disk cache (None when bypassed)."""
+        return self._cache.stats if self._cache else None
+
+    async def get(self, text: str, model: str, prompt_template: str) -> Optional[str]:
+        """
+        Returns the cached summary for the given text, model and prompt, if any.
+        """
+        if not self._cache:
+            return None
+        return await self._cache.aget(summary_cache_key(text, model, prompt_template))
+
+    async def set(self, text: str, model: str, prompt_template: str, summary: str) -> None:
+        """
+        Stores a summary for the given text, model and prompt.
+        """
+        if not self._cache:
+            return
+        await self._cache.aset(summary_cache_key(text, model, prompt_template), summary)
+
+
+def get_summary_cache() -> SummaryCache:
+    """
+    Returns the process-wide summary cache, creating it on first use.
+
+    The cache lives in <ASP_CACHE_DIR>/summaries.sqlite. Set ASP_SUMMARY_CACHE=off to bypass it
+    and ASP_SUMMARY_CACHE_MAX_MB to change its size cap.
+
+    Returns:
+        SummaryCache: The shared summary cache.
+    """
+    global _summary_cache
+    if _summary_cache is None:
+        enabled = get_bool_env(SUMMARY_CACHE_ENABLED_ENV_VAR, True)
+        max_mb = get_int_env(SUMMARY_CACHE_MAX_MB_ENV_VAR, DEFAULT_SUMMARY_CACHE_MAX_MB)
+        path = os.path.join(get_cache_dir(), "summaries.sqlite") if enabled else ""
+        _summary_cache = SummaryCache(path, max_mb * 1024 * 1024, enabled=enabled)
+        logfire.info("Summary cache initialized.", enabled=enabled, path=path, max_mb=max_mb)
+    return _summary_cache
@@ -0,0 +1,282 @@
+import asyncio
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+import logfire
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+from asp.utils.decorators import retry
+
+# The topic queue table
+TOPICS_TABLE = 'Test-Article to Social'
+
+# Defaults for batched result writes
+DEFAULT_WRITE_BATCH_SIZE = 10
+DEFAULT_WRITE_FLUSH_INTERVAL = 2.0 # Seconds a pending write waits for more writes to batch with
+
+
+class AsyncSupabaseClient:
+    """
+    Async client for interacting with the Supabase database.
+
+    Wraps a single supabase AsyncClient whose HTTP connections are pooled and reused for
+    every call, so database I/O never blocks the event loop. Create it once per run with
+    `await AsyncSupabaseClient.create()` and close it with `await client.close()`.
+    """
+    def __init__(self, client: "AsyncClient"):
+        """
+        Initializes the AsyncSupabaseClient around an existing supabase AsyncClient.
+
+        Args:
+            client (AsyncClient): The connected supabase client.
+        """
+        self.client = client
+
+    @classmethod
+    async def create(cls) -> "AsyncSupabaseClient":
+        """
+        Connects using SUPABASE_URL and SUPABASE_API_KEY from the environment.
+
+        Returns:
+            AsyncSupabaseClient: The connected client.
+        """
+        supabase_url = os.environ.get("SUPABASE_URL")
+        supabase_key = os.environ.get("SUPABASE_API_KEY")
+        if not supabase_url or not supabase_key:
+            raise ValueError("SUPABASE_URL and SUPABASE_API_KEY must be set in environment variables.")
+        # Imported on first connect so runs on another queue (or none) never load the supabase SDK
+        from supabase import acreate_client
+        return cls(await acreate_client(supabase_url, supabase_key))
+
+    async def close(self) -> None:
+        """
+        Closes the pooled HTTP connections held by the client.
+        """
+        postgrest = getattr(self.client, 'postgrest', None)
+        if postgrest is not None and hasattr(postgrest, 'aclose'):
+            await postgrest.aclose()
+
+    @retry()
+    async def fetch_unprocessed_topics(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Fetches unprocessed article topics from the database.
+
+        Args:
+            limit (int): The maximum number of topics to fetch.
+
+        Returns:
+            List[Dict]: A list of dictionaries, each containing the 'id' and 'Topics' of an unprocessed topic.
+        """
+        logfire.info("Fetching unprocessed topics with limit {limit}", limit=limit)
+        response = await self.client.from_(TOPICS_TABLE).select('id, "Topics"').eq('Processed', False).order('id').limit(limit).execute()
+        logfire.debug("Fetched {count} unprocessed topics.", count=len(response.data) if response.data else 0)
+        return response.data or []
+
+    @retry()
+    async def claim_topics(self, worker_id: str, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """
+        Atomically claims unprocessed topics for this worker.
+
+        Only topics that are unleased or whose lease has expired are claimed, so concurrent
+        workers never receive the same topic. Topics this worker already holds are returned
+        first, so a retry after a lost response gets the same topics back instead of a second
+        set. Requires the topic lease migrations in supabase/migrations.
+
+        Args:
+            worker_id (str): The id recorded as the lease owner.
+            limit (int): The maximum number of topics to claim.
+            lease_seconds (int): How long the lease lasts unless renewed.
+
+        Returns:
+            List[Dict]: The claimed topics, each containing 'id' and 'Topics'.
+        """
+        logfire.info("Claiming up to {limit} topics for worker {worker_id}", limit=limit, worker_id=worker_id)
+        response = await self.client.rpc('claim_topics', {
+            'worker_id': worker_id, 'lease_seconds': lease_seconds, 'max_topics': limit,
+        }).execute()
+        logfire.debug("Claimed {count} topics.", count=len(response.data) if response.data else 0)
+        return response.data or []
+
+    @retry()
+    async def renew_topic_leases(self, worker_id: str, topic_ids: List[Any], lease_seconds: int) -> Set[Any]:
+        """
+        Extends the leases this worker holds on the given topics.
+
+        Args:
+            worker_id (str): The lease owner.
+            topic_ids (List[Any]): The topics to renew.
+            lease_seconds (int): The new lease length, counted from now.
+
+        Returns:
+            Set[Any]: The ids whose lease was renewed. Missing ids were lost to another worker or already processed.
+        """
+        response = await self.client.rpc('renew_topic_leases', {
+            'worker_id': worker_id, 'topic_ids': list(topic_ids), 'lease_seconds': lease_seconds,
+        }).execute()
+        return {row.get('id') for row in (response.data or [])}
+
+    @retry()
+    async def release_topic_leases(self, worker_id: str, topic_ids: List[Any]) -> Set[Any]:
+        """
+        Releases this worker's leases so other workers can claim the topics immediately.
+
+        Args:
+            worker_id (str): The lease owner.
+            topic_ids (List[Any]): The topics to release.
+
+        Returns:
+            Set[Any]: The ids that were released.
+        """
+        response = await self.client.rpc('release_topic_leases', {
+            'worker_id': worker_id, 'topic_ids': list(topic_ids),
+        }).execute()
+        return {row.get('id') for row in (response.data or [])}
+
+    @retry()
+    async def mark_as_processed(self, id: str, summary: str) -> bool:
+        """
+        Marks a single topic as processed and saves the summary.
+
+        Args:
+            id (str): The ID of the topic to mark as processed.
+            summary (str): The generated summary for the topic.
+
+        Returns:
+            bool: True if the update was successful, False otherwise.
+        """
+        logfire.info("Marking topic {id} as processed.", id=id)
+        response = await self.client.from_(TOPICS_TABLE).update({'Processed': True, 'Summary': summary}).eq('id', id).execute()
+        if response is not None and response.data:
+            return True
+        logfire.warn("Supabase update for id {id} returned no data or a None response. Response: {response}", id=id, response=response)
+        return False
+
+    @retry()
+    async def mark_many_as_processed(self, rows: List[Dict[str, Any]]) -> Set[Any]:
+        """
+        Marks many topics as processed in a single request.
+
+        Calls the mark_topics_processed function from supabase/migrations, which updates the
+        existing rows only (it never inserts, so it needs no INSERT privilege under RLS).
+
+        Args:
+            rows (List[Dict[str, Any]]): One {'id', 'Summary'} dictionary per topic; other keys are ignored.
+
+        Returns:
+            Set[Any]: The ids that were updated. Ids with no matching row are left out.
+        """
+        if not rows:
+            return set()
+        logfire.info("Marking {count} topics as processed in one request.", count=len(rows))
+        response = await self.client.rpc('mark_topics_processed', {
+            'topics': [{'id': row['id'], 'Summary': row['Summary']} for row in rows],
+        }).execute()
+        return {row.get('id') for row in (response.data or [])}
+
+
+class ProcessedTopicWriter:
+    """
+    Buffers 'mark as processed' writes from concurrent topics and flushes them in bulk.
+
+    A write is flushed once `batch_size` writes are pending or `flush_interval` seconds after
+    the first pending write, whichever comes first. Each caller awaits the outcome of its
+    own row. If a bulk request fails, its rows are retried one by one so a single bad row
+    cannot fail the whole batch.
+    """
+    def __init__(self, client: AsyncSupabaseClient, batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_WRITE_FLUSH_INTERVAL,
+                 semaphore: Optional[asyncio.Semaphore] = None):
+        """
+        Initializes the writer.
+
+        Args:
+            client (AsyncSupabaseClient): The client used for the writes.
+            batch_size (int): The number of pending writes that triggers an immediate flush.
+            flush_interval (float): The maximum seconds a write waits before being flushed.
+            semaphore (Optional[asyncio.Semaphore]): Caps the number of flush requests in flight.
+        """
+        self.client = client
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.semaphore = semaphore or asyncio.Semaphore(1)
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    def enqueue(self, topic_id: Any, topic_name: str, summary: str) -> "asyncio.Future[bool]":
+        """
+        Queues a topic's result without waiting for it to be written.
+
+        Args:
+            topic_id (Any): The topic's id.
+            topic_name (str): The topic's 'Topics' value.
+            summary (str): The generated summary.
+
+        Returns:
+            asyncio.Future[bool]: Resolves to True once the update is confirmed, False if it failed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(({'id': topic_id, 'Topics': topic_name, 'Summary': summary}, future))
+        if len(self._pending) >= self.batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_interval())
+        return future
+
+    def flush(self) -> None:
+        """
+        Starts writing the pending results now instead of waiting for the batch to fill,
+        e.g. once no other topic is left to batch with.
+        """
+        if self._pending:
+            self._start_flush()
+
+    async def close(self) -> None:
+        """
+        Flushes any pending writes and waits for in-flight flushes to finish.
+        """
+        self.flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def _flush_after_interval(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        if self._pending:
+            self._start_flush()
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._flush(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        async with self.semaphore:
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            updated_ids = await self.client.mark_many_as_processed([row for row, _ in batch])
+        except Exception as e:
+            logfire.error("Bulk update of {count} topics failed: {error}. Falling back to single updates.",
+                          count=len(batch), error=e, exc_info=True)
+            updated_ids = None
+
+        for row, future in batch:
+            if future.done():
+                continue
+            if updated_ids is not None:
+                success = row['id'] in updated_ids
+            else:
+                try:
+                    success = await self.client.mark_as_processed(row['id'], row['Summary'])
+                except Exception as e:
+                    logfire.error("Error marking topic as processed: {error}", error=e, id=row['id'], exc_info=True)
+                    success = False
+            future.set_result(success)
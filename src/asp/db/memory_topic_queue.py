@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterable, List, Set
+
+import logfire
+
+
+class InMemoryTopicQueue:
+    """
+    In-process stand-in for the Supabase topic queue.
+
+    Implements the same async interface as AsyncSupabaseClient (fetching, leasing and
+    result writes) over a list of rows held in memory, with the same claim semantics as
+    the claim_topics SQL function. Useful for running the pipeline, tests and benchmarks
+    without a database; several pipeline instances sharing one queue behave like
+    several workers sharing the table.
+    """
+    def __init__(self, topics: Iterable[str] = (), clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes the queue.
+
+        Args:
+            topics (Iterable[str]): Topic strings to enqueue, given ids 1..n.
+            clock (Callable[[], float]): Time source for lease expiry, in seconds.
+        """
+        self.clock = clock
+        self.rows: Dict[int, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        for topic in topics:
+            self.add_topic(topic)
+
+    def add_topic(self, topic: str) -> int:
+        """
+        Enqueues an unprocessed topic.
+
+        Args:
+            topic (str): The topic string.
+
+        Returns:
+            int: The new topic's id.
+        """
+        topic_id = len(self.rows) + 1
+        self.rows[topic_id] = {
+            'id': topic_id, 'Topics': topic, 'Processed': False, 'Summary': None,
+            'LeaseOwner': None, 'LeaseExpiresAt': None,
+        }
+        return topic_id
+
+    async def close(self) -> None:
+        """Nothing to release; present for interface parity with AsyncSupabaseClient."""
+
+    async def fetch_unprocessed_topics(self, limit: int) -> List[Dict[str, Any]]:
+        """Returns up to `limit` unprocessed topics in id order, ignoring leases."""
+        unprocessed = [row for row in self._ordered_rows() if not row['Processed']]
+        return [{'id': row['id'], 'Topics': row['Topics']} for row in unprocessed[:limit]]
+
+    async def claim_topics(self, worker_id: str, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """
+        Claims up to `limit` unprocessed topics that are unleased or whose lease has expired.
+        Topics this worker already holds come first, so a repeated claim returns them again.
+        """
+        async with self._lock:
+            now = self.clock()
+            claimed = []
+            held_first = sorted(self._ordered_rows(), key=lambda row: row['LeaseOwner'] != worker_id)
+            for row in held_first:
+                if len(claimed) >= limit:
+                    break
+                leased_to_other = (row['LeaseExpiresAt'] is not None and row['LeaseExpiresAt'] >= now
+                                   and row['LeaseOwner'] != worker_id)
+                if row['Processed'] or leased_to_other:
+                    continue
+                if row['LeaseOwner'] not in (None, worker_id):
+                    logfire.debug("Reclaiming topic {id} from expired lease of {owner}.", id=row['id'], owner=row['LeaseOwner'])
+                row['LeaseOwner'] = worker_id
+                row['LeaseExpiresAt'] = now + lease_seconds
+                claimed.append({'id': row['id'], 'Topics': row['Topics']})
+            return claimed
+
+    async def renew_topic_leases(self, worker_id: str, topic_ids: List[Any], lease_seconds: int) -> Set[Any]:
+        """Extends this worker's leases; returns the ids that were renewed."""
+        async with self._lock:
+            now = self.clock()
+            renewed = set()
+            for row in self._owned_rows(worker_id, topic_ids):
+                if not row['Processed']:
+                    row['LeaseExpiresAt'] = now + lease_seconds
+                    renewed.add(row['id'])
+            return renewed
+
+    async def release_topic_leases(self, worker_id: str, topic_ids: List[Any]) -> Set[Any]:
+        """Clears this worker's leases; returns the ids that were released."""
+        async with self._lock:
+            released = set()
+            for row in self._owned_rows(worker_id, topic_ids):
+                row['LeaseOwner'] = None
+                row['LeaseExpiresAt'] = None
+                released.add(row['id'])
+            return released
+
+    async def mark_as_processed(self, id: Any, summary: str) -> bool:
+        """Marks a single topic as processed and saves the summary."""
+        row = self.rows.get(id)
+        if row is None:
+            return False
+        row['Processed'] = True
+        row['Summary'] = summary
+        return True
+
+    async def mark_many_as_processed(self, rows: List[Dict[str, Any]]) -> Set[Any]:
+        """Marks many topics as processed; returns the ids that were updated."""
+        updated = set()
+        for row in rows:
+            if await self.mark_as_processed(row['id'], row['Summary']):
+                updated.add(row['id'])
+        return updated
+
+    def _ordered_rows(self) -> List[Dict[str, Any]]:
+        return [self.rows[topic_id] for topic_id in sorted(self.rows)]
+
+    def _owned_rows(self, worker_id: str, topic_ids: List[Any]) -> List[Dict[str, Any]]:
+        rows = (self.rows.get(topic_id) for topic_id in topic_ids)
+        return [row for row in rows if row is not None and row['LeaseOwner'] == worker_id]
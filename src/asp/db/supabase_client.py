@@ -14,7 +14,7 @@ class SupabaseClient:
         supabase_url = os.environ.get("SUPABASE_URL")
         supabase_key = os.environ.get("SUPABASE_API_KEY")
         if not supabase_url or not supabase_key:
-            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables.")
+            raise ValueError("SUPABASE_URL and SUPABASE_API_KEY must be set in environment variables.")
         self.client: Client = create_client(supabase_url, supabase_key)
 
     @retry()
@@ -1,98 +1,339 @@
 import asyncio
+from contextlib import aclosing
 import logfire
 from dotenv import load_dotenv
 import os
+from typing import Any, Callable, Optional
 
 # Import modules
-from asp.db.supabase_client import SupabaseClient
+from asp.db.async_supabase_client import AsyncSupabaseClient, ProcessedTopicWriter, DEFAULT_WRITE_BATCH_SIZE, DEFAULT_WRITE_FLUSH_INTERVAL
 from asp.search.google_search import perform_brave_search, score_and_rank_urls # Updated import for Brave Search
-from asp.scraper.retrieve_articles import fetch_valid_articles
-from asp.nlp.splitter import split_text
+from asp.scraper.retrieve_articles import iter_valid_articles, fetch_tier_stats
+from asp.scraper.dedup import DEFAULT_SIMILARITY_THRESHOLD
+from asp.nlp.splitter import load_tokenizer, split_text, splitter_stats
 from asp.agents.summarizer import summarize_chunks_langchain # Import the new langchain summarization function
-from asp.pipeline.exporter import export_article_to_txt, export_summary_to_txt
+from asp.agents.llm_gateway import close_llm_gateway, get_llm_gateway
+from asp.agents.summary_cache import get_summary_cache
+from asp.search.search_cache import get_search_cache
+from asp.pipeline.streaming import StageTimings, stage_timing_stats, stream_stage
+from asp.pipeline.exporter import get_exporter
+from asp.utils.env import get_int_env, get_float_env, get_bool_env
+from asp.utils.http_client import close_http_client
+from asp.utils.loop_lag import LoopLagMonitor
+from asp.scraper.parse_pool import close_parse_pool, get_parse_pool
+from asp.scraper.browser_pool import close_browser_pool, get_browser_pool
+from asp.utils.rate_limit import get_rate_limiter
+from asp.utils.metrics import metrics, start_metrics_server, write_metrics_file
+from asp.utils.logfire_config import configure_logfire
+from asp.pipeline.concurrency import (
+    StageLimits,
+    BATCH_SIZE_ENV_VAR,
+    MAX_CONCURRENT_TOPICS_ENV_VAR,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_CONCURRENT_TOPICS,
+    FETCH_CONCURRENCY_ENV_VAR,
+    FETCH_URL_TIMEOUT_ENV_VAR,
+    FETCH_TOTAL_TIMEOUT_ENV_VAR,
+    DEFAULT_FETCH_CONCURRENCY,
+    DEFAULT_FETCH_URL_TIMEOUT,
+    DEFAULT_FETCH_TOTAL_TIMEOUT,
+    SUMMARY_REDUCE_ENV_VAR,
+    NEAR_DUPLICATE_THRESHOLD_ENV_VAR,
+    PERSIST_BATCH_SIZE_ENV_VAR,
+    PERSIST_FLUSH_INTERVAL_ENV_VAR,
+    ARTICLE_WORKERS_ENV_VAR,
+    ARTICLE_BUFFER_ENV_VAR,
+    DEFAULT_ARTICLE_WORKERS,
+    DEFAULT_ARTICLE_BUFFER,
+)
+from asp.pipeline.leasing import (
+    TopicLeaseKeeper,
+    default_worker_id,
+    TOPIC_LEASING_ENV_VAR,
+    TOPIC_LEASE_SECONDS_ENV_VAR,
+    TOPIC_HEARTBEAT_INTERVAL_ENV_VAR,
+    DEFAULT_TOPIC_LEASE_SECONDS,
+    DEFAULT_TOPIC_HEARTBEAT_INTERVAL,
+)
 
 load_dotenv()
 
-# Configure Logfire - more advanced configuration can be moved to logfire_config.py
-logfire.configure()
+TOPICS_IN_FLIGHT = metrics.gauge("asp_topics_in_flight", "Topics currently being processed")
+TOPICS_PROCESSED = metrics.counter("asp_topics_processed_total", "Topics finished, by result")
 
-async def main():
+async def process_topic(topic_data: dict, topic_writer: ProcessedTopicWriter, stage_limits: StageLimits,
+                        on_handoff: Optional[Callable[[], None]] = None) -> bool:
     """
-    Main function to run the article extraction and summarization pipeline.
+    Runs a single topic through search, fetch, summarize and persist.
+
+    This is the per-topic failure boundary: any exception raised while processing
+    the topic is logged and swallowed so the other topics in the batch keep running.
+
+    Args:
+        topic_data (dict): The topic row fetched from Supabase ('id' and 'Topics').
+        topic_writer (ProcessedTopicWriter): The shared batched writer for processed topics.
+        stage_limits (StageLimits): Per-stage semaphores shared across the batch.
+        on_handoff (Optional[Callable[[], None]]): Called as soon as the result is queued with the
+            writer, before the write can commit, so the caller can stop renewing the topic's lease
+            and start its next topic while this write waits to be batched.
+
+    Returns:
+        bool: True if the topic was summarized and persisted, False otherwise.
     """
-    logfire.info("Starting the article extraction and summarization pipeline.", ignore_no_config=True)
+    topic_id = topic_data.get('id')
+    topic_name = topic_data.get('Topics') # Use the correct key 'Topics'
 
-    # 1. Fetch unprocessed topics from Supabase
-    supabase_client = SupabaseClient()
-    topics = supabase_client.fetch_unprocessed_topics(limit=1) # Fetch one topic for now
+    if not topic_id or not topic_name:
+        logfire.error("Skipping invalid topic data (missing id or Topics): {data}", data=topic_data)
+        return False
 
-    if not topics:
-        logfire.info("No unprocessed topics found. Exiting.")
-        return
+    logfire.info("Processing topic: {topic_name}", topic_name=topic_name, topic_id=topic_id) # Use the correct variable name
 
-    for topic_data in topics:
-        topic_id = topic_data.get('id')
-        topic_name = topic_data.get('Topics') # Use the correct key 'Topics'
+    timings = StageTimings()
+    exporter = get_exporter()
+    try:
+        # 2. Search the web for relevant articles using Brave Search API
+        with timings.measure("search"):
+            async with stage_limits.stage("search"):
+                search_results_data = await perform_brave_search(topic_name)
 
-        if not topic_id or not topic_name:
-            logfire.error("Skipping invalid topic data (missing id or Topics): {data}", data=topic_data)
-            continue
+        # 3. Score and rank URLs from the extracted data
+        article_urls = await score_and_rank_urls(search_results_data, topic=topic_name)
 
-        logfire.info("Processing topic: {topic_name}", topic_name=topic_name, topic_id=topic_id) # Use the correct variable name
+        # 4-6. Stream the top 3 valid articles into splitting and summarization.
+        # Each article is summarized as soon as it is validated, while lower-ranked URLs are
+        # still crawling; the shared "summarize" semaphore caps the number of LLM calls in
+        # flight across every topic in the batch.
+        reduce_summaries = get_bool_env(SUMMARY_REDUCE_ENV_VAR, False)
 
-        try:
-            # 2. Search the web for relevant articles and extract structured data
-            # 2. Search the web for relevant articles using Brave Search API
-            search_results_data = await perform_brave_search(topic_name)
+        async def crawl_articles():
+            with timings.measure("crawl"):
+                async with aclosing(iter_valid_articles(
+                    article_urls,
+                    max_count=3,
+                    concurrency=get_int_env(FETCH_CONCURRENCY_ENV_VAR, DEFAULT_FETCH_CONCURRENCY),
+                    url_timeout=get_float_env(FETCH_URL_TIMEOUT_ENV_VAR, DEFAULT_FETCH_URL_TIMEOUT),
+                    total_timeout=get_float_env(FETCH_TOTAL_TIMEOUT_ENV_VAR, DEFAULT_FETCH_TOTAL_TIMEOUT),
+                    near_duplicate_threshold=get_float_env(NEAR_DUPLICATE_THRESHOLD_ENV_VAR, DEFAULT_SIMILARITY_THRESHOLD),
+                    # Held per URL fetch, so a topic waiting on its summarizers frees its crawl slots
+                    semaphore=stage_limits.semaphore("crawl"),
+                )) as articles:
+                    # aclosing cancels the open crawls as soon as the stream is abandoned
+                    async for article in articles:
+                        yield article
+
+        async def summarize_article(article):
+            # The article span nests its split and summarize steps and their chunk spans
+            with logfire.span("Summarizing article: {article_url} using Langchain", article_url=article.url):
+                with timings.measure("split"):
+                    # Loads (or downloads) the tokenizer on a worker thread the first time
+                    await load_tokenizer()
+                    chunks = split_text(article.content)
+                with timings.measure("summarize"):
+                    summary = await summarize_chunks_langchain(chunks, reduce=reduce_summaries,
+                                                               semaphore=stage_limits.semaphore("summarize"))
+            return article, summary
+
+        article_summaries = await stream_stage(
+            crawl_articles(),
+            summarize_article,
+            workers=get_int_env(ARTICLE_WORKERS_ENV_VAR, DEFAULT_ARTICLE_WORKERS),
+            buffer=get_int_env(ARTICLE_BUFFER_ENV_VAR, DEFAULT_ARTICLE_BUFFER),
+        )
 
-            # 3. Score and rank URLs from the extracted data
-            article_urls = score_and_rank_urls(search_results_data)
+        if not article_summaries:
+            logfire.warn("No valid articles found for topic: {topic_name}. Skipping summarization.", topic_name=topic_name)
+            # Optionally mark as processed with a note about no articles found
+            # supabase_client.mark_as_processed(topic_id, "No valid articles found.")
+            return False
 
-            # 4. Retrieve and clean the top 3 articles
-            valid_articles = await fetch_valid_articles(article_urls, max_count=3)
+        full_summary = ""
+        topic_export = exporter.topic(topic_id, topic_name)
+        for article, article_summary in article_summaries:
+            full_summary += f"Summary for {article.title} ({article.url}):\n{article_summary}\n\n"
+            topic_export.add_article(article)
+        topic_export.summary = full_summary
 
-            if not valid_articles:
-                logfire.warn("No valid articles found for topic: {topic_name}. Skipping summarization.", topic_name=topic_name)
-                # Optionally mark as processed with a note about no articles found
-                # supabase_client.mark_as_processed(topic_id, "No valid articles found.")
-                continue
+        # 7. Export the raw articles (for review) and the summary in one write
+        with timings.measure("export"):
+            await exporter.write(topic_export)
 
-            # 5. Export raw articles for review
-            for article in valid_articles:
-                export_article_to_txt(article, topic_name)
+        # 8. Save the results back to Supabase and mark as processed
+        # The writer batches this update with other finished topics into one bulk request;
+        # the topic's slot is handed back while the write waits for its batch
+        with timings.measure("persist"):
+            write = topic_writer.enqueue(topic_id, topic_name, full_summary)
+            # Nothing awaits between queueing and the hand-off, so the write cannot have committed yet
+            if on_handoff:
+                on_handoff()
+            update_success = await write
 
-            # 6. Summarize them via an LLM using Langchain
-            full_summary = ""
-            for article in valid_articles:
-                logfire.info("Summarizing article: {article_url} using Langchain", article_url=article.url)
-                chunks = split_text(article.content)
-                article_summary = await summarize_chunks_langchain(chunks) # Call the new langchain summarization function
-                full_summary += f"Summary for {article.title} ({article.url}):\n{article_summary}\n\n"
+        if update_success:
+            logfire.info("Successfully processed and updated topic: {topic_name}", topic_name=topic_name, topic_id=topic_id)
+        else:
+            logfire.error("Failed to update topic in Supabase: {topic_name}", topic_name=topic_name, topic_id=topic_id)
+        return update_success
 
-            # 7. Export summaries
-            summary_filepath = export_summary_to_txt(full_summary, topic_name)
+    except Exception as e:
+        logfire.error("An error occurred while processing topic {topic_name}: {error}",
+                      topic_name=topic_name, error=e, exc_info=True)
+        # Consider marking the topic as errored in Supabase if needed
+        return False
+    finally:
+        stage_timing_stats.add(timings)
+        logfire.info("Stage timings for topic {topic_name}: {timings}", topic_name=topic_name,
+                     timings=timings.as_dict(), topic_id=topic_id)
 
-            # 8. Save the results back to Supabase and mark as processed
-            update_success = supabase_client.mark_as_processed(topic_id, full_summary)
 
-            if update_success:
-                logfire.info("Successfully processed and updated topic: {topic_name}", topic_name=topic_name, topic_id=topic_id)
-            else:
-                logfire.error("Failed to update topic in Supabase: {topic_name}", topic_name=topic_name, topic_id=topic_id)
+async def main(batch_size: int = DEFAULT_BATCH_SIZE,
+               max_concurrent_topics: int = DEFAULT_MAX_CONCURRENT_TOPICS,
+               stage_limits: Optional[StageLimits] = None,
+               topic_queue: Optional[Any] = None):
+    """
+    Main function to run the article extraction and summarization pipeline.
 
-        except Exception as e:
-            logfire.error("An error occurred while processing topic {topic_name}: {error}",
-                          topic_name=topic_name, error=e, exc_info=True)
-            # Consider marking the topic as errored in Supabase if needed
+    Claims up to `batch_size` unprocessed topics and processes them concurrently,
+    with at most `max_concurrent_topics` topics in flight at once. With ASP_TOPIC_LEASING
+    enabled, topics are leased to this worker so several workers can share the queue.
 
-    logfire.info("Article extraction and summarization pipeline finished.")
+    Args:
+        batch_size (int): The number of unprocessed topics to fetch in this run.
+        max_concurrent_topics (int): The maximum number of topics processed at the same time.
+        stage_limits (Optional[StageLimits]): Per-stage semaphores. Defaults to the environment configuration.
+        topic_queue (Optional[Any]): The topic queue to use (e.g. an InMemoryTopicQueue).
+                                     Defaults to a Supabase connection.
+    """
+    configure_logfire()
+    logfire.info("Starting the article extraction and summarization pipeline.")
 
-if __name__ == "__main__":
-    asyncio.run(main())
+    # 1. Fetch (or lease) unprocessed topics from Supabase
+    queue = topic_queue or await AsyncSupabaseClient.create()
+    lease_keeper = None
+    if get_bool_env(TOPIC_LEASING_ENV_VAR, False):
+        lease_keeper = TopicLeaseKeeper(
+            queue,
+            default_worker_id(),
+            lease_seconds=get_int_env(TOPIC_LEASE_SECONDS_ENV_VAR, DEFAULT_TOPIC_LEASE_SECONDS),
+            heartbeat_interval=get_float_env(TOPIC_HEARTBEAT_INTERVAL_ENV_VAR, DEFAULT_TOPIC_HEARTBEAT_INTERVAL)
+                               or DEFAULT_TOPIC_HEARTBEAT_INTERVAL,
+        )
+    try:
+        if lease_keeper:
+            topics = await lease_keeper.claim(batch_size)
+        else:
+            topics = await queue.fetch_unprocessed_topics(limit=batch_size)
+
+        if not topics:
+            logfire.info("No unprocessed topics found. Exiting.")
+            return
+
+        start_metrics_server()
+        stage_limits = stage_limits or StageLimits.from_env()
+        topic_slots = asyncio.Semaphore(max_concurrent_topics)
+        topic_writer = ProcessedTopicWriter(
+            queue,
+            # Flush about once per round of concurrent topics instead of holding results for the interval
+            batch_size=min(get_int_env(PERSIST_BATCH_SIZE_ENV_VAR, DEFAULT_WRITE_BATCH_SIZE), max_concurrent_topics),
+            flush_interval=get_float_env(PERSIST_FLUSH_INTERVAL_ENV_VAR, DEFAULT_WRITE_FLUSH_INTERVAL) or 0.0,
+            semaphore=stage_limits.semaphore("persist"),
+        )
+
+        topics_running = len(topics)
+
+        async def run_with_slot(topic_data: dict) -> bool:
+            persisted = False
+            slot_held = False
+
+            def release_slot() -> None:
+                nonlocal slot_held, topics_running
+                if not slot_held:
+                    return
+                slot_held = False
+                topic_slots.release()
+                topics_running -= 1
+                if topics_running == 0:
+                    # Every other topic is done or waiting on its write, so nothing is left to batch with
+                    topic_writer.flush()
+
+            def hand_off() -> None:
+                if lease_keeper:
+                    # Renewals skip processed rows, so a committed write would otherwise look like a lost lease
+                    lease_keeper.persisting(topic_data.get('id'))
+                release_slot()
+
+            try:
+                await topic_slots.acquire()
+                slot_held = True
+                try:
+                    # One trace per topic; every stage, article and chunk span nests under it
+                    with logfire.span("Topic {topic_name}", topic_name=topic_data.get('Topics'),
+                                      topic_id=topic_data.get('id')), TOPICS_IN_FLIGHT.track():
+                        persisted = await process_topic(topic_data, topic_writer, stage_limits, hand_off)
+                finally:
+                    release_slot()
+                TOPICS_PROCESSED.inc(result="persisted" if persisted else "failed")
+                return persisted
+            finally:
+                if lease_keeper:
+                    await lease_keeper.finish(topic_data.get('id'), persisted)
+
+        logfire.info("Processing {count} topics with up to {concurrency} in flight.",
+                     count=len(topics), concurrency=max_concurrent_topics, stage_limits=stage_limits.limits)
+        loop_lag = LoopLagMonitor()
+        loop_lag.start()
+        tasks = [asyncio.create_task(run_with_slot(topic_data)) for topic_data in topics]
+        if lease_keeper:
+            for topic_data, task in zip(topics, tasks):
+                lease_keeper.attach(topic_data.get('id'), task)
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await loop_lag.stop()
+            await topic_writer.close()
+            await close_http_client()
+            await close_llm_gateway()
+            close_parse_pool()
+            # Sampled before closing so the peak browser memory includes the running browsers
+            browser_stats = get_browser_pool().stats()
+            await close_browser_pool()
+    finally:
+        if lease_keeper:
+            await lease_keeper.close()
+        if topic_queue is None:
+            await queue.close()
+
+    logfire.info("Fetch tier stats for this run: {stats}", stats=fetch_tier_stats.as_dict())
+    logfire.info("Rate limit wait seconds for this run: {stats}", stats=get_rate_limiter().stats())
+    logfire.info("Splitter stats for this run: {stats}", stats=splitter_stats.as_dict())
+    logfire.info("Stage timings for this run: {stats}", stats=stage_timing_stats.as_dict())
+    logfire.info("Browser pool stats for this run: {stats}", stats=browser_stats)
+    logfire.info("LLM gateway stats for this run: {stats}", stats=get_llm_gateway().stats())
+    logfire.info("Event loop lag for this run: {stats}", stats=loop_lag.stats(), parse_pool=get_parse_pool().stats())
+
+    search_cache = get_search_cache()
+    if search_cache:
+        logfire.info("Search cache stats for this run: {stats}", stats=search_cache.stats.as_dict())
+
+    summary_cache = get_summary_cache()
+    if summary_cache.stats:
+        logfire.info("Summary cache stats for this run: {stats}", stats=summary_cache.stats.as_dict())
+
+    write_metrics_file()
+
+    succeeded = sum(1 for result in results if result is True)
+    logfire.info("Article extraction and summarization pipeline finished. {succeeded}/{total} topics processed successfully.",
+                 succeeded=succeeded, total=len(topics))
 
 def run():
     """
     Synchronous entry point for the pipeline.
-    Runs the main asynchronous function using asyncio.run().
+    Runs the main asynchronous function using asyncio.run(), reading the batch size
+    and topic concurrency from ASP_BATCH_SIZE and ASP_MAX_CONCURRENT_TOPICS.
     """
-    asyncio.run(main())
+    asyncio.run(main(
+        batch_size=get_int_env(BATCH_SIZE_ENV_VAR, DEFAULT_BATCH_SIZE),
+        max_concurrent_topics=get_int_env(MAX_CONCURRENT_TOPICS_ENV_VAR, DEFAULT_MAX_CONCURRENT_TOPICS),
+    ))
+
+if __name__ == "__main__":
+    run()
@@ -1,25 +1,237 @@
+import asyncio
+import os
+import re
 import logfire
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import Dict, List, Optional, Set, Tuple
 
-def split_text(text: str) -> List[str]:
+from asp.nlp.tokens import DEFAULT_TOKENIZER_MODEL, count_tokens, estimate_tokens, get_encoding, truncate_to_tokens
+from asp.utils.env import get_int_env
+
+# Environment variable names for the splitter configuration
+SPLITTER_MODE_ENV_VAR = "ASP_SPLITTER_MODE" # "tokens" or "chars"
+CHUNK_TOKENS_ENV_VAR = "ASP_CHUNK_TOKENS"
+CHUNK_OVERLAP_TOKENS_ENV_VAR = "ASP_CHUNK_OVERLAP_TOKENS"
+
+SPLITTER_MODE_TOKENS = "tokens"
+SPLITTER_MODE_CHARS = "chars"
+DEFAULT_SPLITTER_MODE = SPLITTER_MODE_TOKENS
+
+# Character splitter settings (the original behaviour)
+CHAR_CHUNK_SIZE = 1000
+CHAR_CHUNK_OVERLAP = 200
+
+# Token splitter settings: gpt-3.5-turbo has a 16k context, but summaries of very long chunks
+# lose detail, so chunks are packed to a few thousand tokens with at most a sentence of overlap
+DEFAULT_CHUNK_TOKENS = 2000
+DEFAULT_CHUNK_OVERLAP_TOKENS = 40
+
+# Paragraphs are separated by blank lines; single newlines (e.g. around inline links in the
+# cleaned HTML) are only line wraps inside a paragraph and become spaces
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+LINE_BREAK_PATTERN = re.compile(r"\s*\n\s*")
+# A sentence ends with . ! or ? (optionally followed by a closing quote or bracket) before whitespace
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+
+
+class SplitterStats:
+    """
+    Counts chunks and tokens produced by split_text across a run.
+    """
+    def __init__(self):
+        self.articles = 0
+        self.chunks = 0
+        self.chunk_tokens = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Returns the counters and chunks per article as a plain dictionary for logging."""
+        return {
+            "articles": self.articles,
+            "chunks": self.chunks,
+            "chunk_tokens": self.chunk_tokens,
+            "chunks_per_article": round(self.chunks / self.articles, 2) if self.articles else 0.0,
+        }
+
+# Process-wide splitter counters, logged at the end of every run
+splitter_stats = SplitterStats()
+
+# Models whose tokenizer load_tokenizer has already loaded in this process
+_loaded_tokenizers: Set[str] = set()
+
+
+def get_splitter_mode() -> str:
+    """Returns the configured splitter mode (ASP_SPLITTER_MODE, "tokens" by default)."""
+    return os.environ.get(SPLITTER_MODE_ENV_VAR, DEFAULT_SPLITTER_MODE).strip().lower()
+
+
+async def load_tokenizer(model: str = DEFAULT_TOKENIZER_MODEL) -> None:
+    """
+    Loads the tokenizer used by split_text on a worker thread.
+
+    tiktoken reads, and on first use downloads, its encoding files the first time an
+    encoding is requested. Awaiting this before split_text keeps that off the event loop.
+    Does nothing in "chars" mode or once the tokenizer is loaded.
+
+    Args:
+        model (str): The model whose tokenizer will measure the chunks.
+    """
+    if model in _loaded_tokenizers or get_splitter_mode() == SPLITTER_MODE_CHARS:
+        return
+    await asyncio.to_thread(get_encoding, model)
+    _loaded_tokenizers.add(model)
+
+
+def split_text(text: str, mode: Optional[str] = None, chunk_tokens: Optional[int] = None,
+               overlap_tokens: Optional[int] = None, model: str = DEFAULT_TOKENIZER_MODEL) -> List[str]:
     """
-    Splits text content into chunks using recursive character splitting.
+    Splits text content into chunks for summarization.
+
+    In "tokens" mode (the default) chunks are measured in model tokens and packed up to
+    `chunk_tokens`, breaking only at paragraph or sentence boundaries, with at most
+    `overlap_tokens` of trailing whole sentences repeated at the start of the next chunk.
+    In "chars" mode the original 1000-character recursive splitter with 200 characters of
+    overlap is used.
 
     Args:
         text (str): The text content to split.
+        mode (Optional[str]): "tokens" or "chars". Defaults to ASP_SPLITTER_MODE.
+        chunk_tokens (Optional[int]): Token budget per chunk. Defaults to ASP_CHUNK_TOKENS.
+        overlap_tokens (Optional[int]): Maximum overlap in tokens. Defaults to ASP_CHUNK_OVERLAP_TOKENS.
+        model (str): The model whose tokenizer measures the chunks.
 
     Returns:
         List[str]: A list of text chunks.
     """
     logfire.info("Splitting text content into chunks.")
-    # Configure the text splitter (example values, can be made configurable)
+    mode = mode.strip().lower() if mode else get_splitter_mode()
+    if mode == SPLITTER_MODE_CHARS:
+        chunks = split_text_by_chars(text)
+        # Estimated: re-encoding every chunk only to count it would double the tokenizer work
+        total_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+    else:
+        chunks, total_tokens = _pack_tokens(
+            text,
+            chunk_tokens=chunk_tokens or get_int_env(CHUNK_TOKENS_ENV_VAR, DEFAULT_CHUNK_TOKENS),
+            overlap_tokens=overlap_tokens if overlap_tokens is not None
+                           else get_int_env(CHUNK_OVERLAP_TOKENS_ENV_VAR, DEFAULT_CHUNK_OVERLAP_TOKENS, minimum=0),
+            model=model,
+        )
+
+    splitter_stats.articles += 1
+    splitter_stats.chunks += len(chunks)
+    splitter_stats.chunk_tokens += total_tokens
+    logfire.info("Text splitting completed. Created {count} chunks.", count=len(chunks), mode=mode)
+    return chunks
+
+
+def split_text_by_chars(text: str) -> List[str]:
+    """
+    Splits text with the original recursive character splitter (1000 characters, 200 overlap).
+
+    Args:
+        text (str): The text content to split.
+
+    Returns:
+        List[str]: A list of text chunks.
+    """
+    # Imported on first use: only the legacy "chars" mode needs langchain here
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
+        chunk_size=CHAR_CHUNK_SIZE,
+        chunk_overlap=CHAR_CHUNK_OVERLAP,
         length_function=len,
     )
+    return text_splitter.split_text(text)
+
+
+def split_sentences(paragraph: str) -> List[str]:
+    """Splits a paragraph into sentences on terminal punctuation followed by a capitalized word."""
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.split(paragraph) if sentence.strip()]
+
+
+def split_text_by_tokens(text: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                         overlap_tokens: int = DEFAULT_CHUNK_OVERLAP_TOKENS,
+                         model: str = DEFAULT_TOKENIZER_MODEL) -> List[str]:
+    """
+    Packs paragraphs and sentences into chunks of at most `chunk_tokens` model tokens.
+
+    Whole paragraphs are kept together when they fit; otherwise the paragraph is split into
+    sentences, and a single sentence longer than the budget is cut on token boundaries.
+    Each new chunk starts with the previous chunk's trailing sentences that fit within
+    `overlap_tokens` (none if the last sentence alone is longer).
+
+    Args:
+        text (str): The text content to split.
+        chunk_tokens (int): The token budget per chunk.
+        overlap_tokens (int): The maximum overlap in tokens.
+        model (str): The model whose tokenizer measures the chunks.
+
+    Returns:
+        List[str]: A list of text chunks.
+    """
+    return _pack_tokens(text, chunk_tokens, overlap_tokens, model)[0]
+
+
+def _pack_tokens(text: str, chunk_tokens: int, overlap_tokens: int, model: str) -> Tuple[List[str], int]:
+    """Implements split_text_by_tokens; also returns the chunks' total tokens as counted while packing."""
+    chunk_tokens = max(1, chunk_tokens)
+    overlap_tokens = min(max(0, overlap_tokens), chunk_tokens // 2)
+
+    # Units are (text, tokens, separator before it); paragraphs that don't fit become sentences
+    units = []
+    for paragraph in PARAGRAPH_PATTERN.split(text):
+        paragraph = LINE_BREAK_PATTERN.sub(" ", paragraph).strip()
+        if not paragraph:
+            continue
+        paragraph_tokens = count_tokens(paragraph, model)
+        if paragraph_tokens <= chunk_tokens:
+            units.append((paragraph, paragraph_tokens, "\n\n"))
+            continue
+        for position, sentence in enumerate(split_sentences(paragraph)):
+            separator = "\n\n" if position == 0 else " "
+            sentence_tokens = count_tokens(sentence, model)
+            if sentence_tokens <= chunk_tokens:
+                units.append((sentence, sentence_tokens, separator))
+            else:
+                for piece in truncate_to_tokens(sentence, chunk_tokens, model):
+                    units.append((piece, count_tokens(piece, model), separator))
+                    separator = " "
+
+    chunks: List[str] = []
+    total_tokens = 0
+    current: List[tuple] = []
+    current_tokens = 0
+    for unit in units:
+        # Separators are counted as one token each, which keeps chunks safely under budget
+        if current and current_tokens + unit[1] + 1 > chunk_tokens:
+            chunks.append(_join_units(current))
+            total_tokens += current_tokens
+            current = _overlap_units(current, overlap_tokens, chunk_tokens - unit[1] - 1)
+            current_tokens = sum(tokens + 1 for _, tokens, _ in current)
+        current.append(unit)
+        current_tokens += unit[1] + 1
+    if current:
+        chunks.append(_join_units(current))
+        total_tokens += current_tokens
+    return chunks, total_tokens
+
+
+def _join_units(units: List[tuple]) -> str:
+    parts = []
+    for index, (unit_text, _, separator) in enumerate(units):
+        if index:
+            parts.append(separator)
+        parts.append(unit_text)
+    return "".join(parts)
+
 
-    chunks = text_splitter.split_text(text)
-    logfire.info("Text splitting completed. Created {count} chunks.", count=len(chunks))
-    return chunks
\ No newline at end of file
+def _overlap_units(units: List[tuple], overlap_tokens: int, room: int) -> List[tuple]:
+    """Returns the trailing units that fit within the overlap budget and the room left for the next unit."""
+    budget = min(overlap_tokens, room)
+    overlap: List[tuple] = []
+    used = 0
+    for unit in reversed(units):
+        if used + unit[1] + 1 > budget:
+            break
+        overlap.insert(0, unit)
+        used += unit[1] + 1
+    return overlap
@@ -0,0 +1,95 @@
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import logfire
+
+# Default model whose tokenizer measures chunks (matches the summarization model)
+DEFAULT_TOKENIZER_MODEL = "gpt-3.5-turbo"
+# Fallback ratio when no tokenizer is available; about four characters per token for English
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Returns a rough token count for `text` (about four characters per token for English)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str = DEFAULT_TOKENIZER_MODEL) -> Optional[Any]:
+    """
+    Returns the tiktoken encoding for a model, or None if tiktoken or its data is unavailable.
+
+    tiktoken ships with langchain-openai but downloads its encoding files on first use, so
+    offline machines fall back to estimate_tokens.
+
+    Args:
+        model (str): The model name.
+
+    Returns:
+        Optional[Any]: The tiktoken Encoding, or None.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        logfire.info("tiktoken is not installed; estimating token counts from text length.")
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Unknown (e.g. OpenRouter-prefixed) model names use the common chat encoding
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logfire.warn("Could not load the tokenizer for {model}: {error}. Estimating token counts from text length.",
+                     model=model, error=e)
+        return None
+
+
+def count_tokens(text: str, model: str = DEFAULT_TOKENIZER_MODEL) -> int:
+    """
+    Counts the model tokens in `text`, falling back to an estimate without a tokenizer.
+
+    Args:
+        text (str): The text to measure.
+        model (str): The model whose tokenizer is used.
+
+    Returns:
+        int: The token count.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_TOKENIZER_MODEL) -> List[str]:
+    """
+    Cuts `text` into consecutive pieces of at most `max_tokens` tokens each.
+
+    Used for single sentences that exceed a chunk budget on their own. Pieces are cut on
+    token boundaries (or on word boundaries without a tokenizer).
+
+    Args:
+        text (str): The text to cut.
+        max_tokens (int): The maximum tokens per piece.
+        model (str): The model whose tokenizer is used.
+
+    Returns:
+        List[str]: The pieces, in order.
+    """
+    encoding = get_encoding(model)
+    if encoding is not None:
+        token_ids = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(token_ids[start:start + max_tokens]) for start in range(0, len(token_ids), max_tokens)]
+
+    pieces, current, current_tokens = [], [], 0
+    for word in text.split():
+        word_tokens = estimate_tokens(word + " ")
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
@@ -0,0 +1,102 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from asp.utils.env import get_int_env
+
+# Environment variable names for batch and per-stage concurrency settings
+BATCH_SIZE_ENV_VAR = "ASP_BATCH_SIZE"
+MAX_CONCURRENT_TOPICS_ENV_VAR = "ASP_MAX_CONCURRENT_TOPICS"
+STAGE_CONCURRENCY_ENV_VARS = {
+    "search": "ASP_SEARCH_CONCURRENCY",
+    "crawl": "ASP_CRAWL_CONCURRENCY",
+    "summarize": "ASP_SUMMARIZE_CONCURRENCY",
+    "persist": "ASP_PERSIST_CONCURRENCY",
+}
+FETCH_CONCURRENCY_ENV_VAR = "ASP_FETCH_CONCURRENCY"
+FETCH_URL_TIMEOUT_ENV_VAR = "ASP_FETCH_URL_TIMEOUT"
+FETCH_TOTAL_TIMEOUT_ENV_VAR = "ASP_FETCH_TOTAL_TIMEOUT"
+SUMMARY_REDUCE_ENV_VAR = "ASP_SUMMARY_REDUCE"
+NEAR_DUPLICATE_THRESHOLD_ENV_VAR = "ASP_NEAR_DUPLICATE_THRESHOLD"
+PERSIST_BATCH_SIZE_ENV_VAR = "ASP_PERSIST_BATCH_SIZE"
+PERSIST_FLUSH_INTERVAL_ENV_VAR = "ASP_PERSIST_FLUSH_INTERVAL"
+ARTICLE_WORKERS_ENV_VAR = "ASP_ARTICLE_WORKERS"
+ARTICLE_BUFFER_ENV_VAR = "ASP_ARTICLE_BUFFER"
+
+# Defaults keep the historical behaviour (one topic per run) unless configured otherwise
+DEFAULT_BATCH_SIZE = 1
+DEFAULT_MAX_CONCURRENT_TOPICS = 4
+DEFAULT_STAGE_CONCURRENCY = {
+    "search": 2,
+    "crawl": 9, # URL fetches in flight across all topics
+    "summarize": 8, # LLM calls in flight across all topics
+    "persist": 2, # Bulk write requests in flight
+}
+DEFAULT_FETCH_CONCURRENCY = 3 # In-flight crawls per topic
+DEFAULT_FETCH_URL_TIMEOUT = 60.0 # Seconds per URL
+DEFAULT_FETCH_TOTAL_TIMEOUT = 180.0 # Seconds per topic
+DEFAULT_ARTICLE_WORKERS = 3 # Articles per topic split and summarized at once
+DEFAULT_ARTICLE_BUFFER = 1 # Validated articles allowed to wait for a summarizer before crawling pauses
+
+
+class StageLimits:
+    """
+    Per-stage semaphores shared by all topics in a batch.
+
+    Each pipeline stage talks to a different external service (Brave, the crawl targets,
+    OpenRouter, Supabase), so each gets its own in-flight cap independent of how many
+    topics are being processed at the same time.
+    """
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        """
+        Initializes the stage semaphores.
+
+        Args:
+            limits (Optional[Dict[str, int]]): Maximum in-flight operations per stage name.
+                                               Missing stages fall back to the defaults.
+        """
+        self.limits: Dict[str, int] = dict(DEFAULT_STAGE_CONCURRENCY)
+        self.limits.update(limits or {})
+        self._semaphores: Dict[str, asyncio.Semaphore] = {
+            stage: asyncio.Semaphore(limit) for stage, limit in self.limits.items()
+        }
+
+    @classmethod
+    def from_env(cls) -> "StageLimits":
+        """
+        Builds stage limits from the ASP_*_CONCURRENCY environment variables.
+
+        Returns:
+            StageLimits: The configured stage limits.
+        """
+        limits = {
+            stage: get_int_env(env_var, DEFAULT_STAGE_CONCURRENCY[stage])
+            for stage, env_var in STAGE_CONCURRENCY_ENV_VARS.items()
+        }
+        return cls(limits)
+
+    def semaphore(self, name: str) -> asyncio.Semaphore:
+        """
+        Returns the named stage's semaphore so it can be shared with lower-level calls.
+
+        Args:
+            name (str): The stage name (search, crawl, summarize or persist).
+
+        Returns:
+            asyncio.Semaphore: The stage semaphore.
+        """
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            raise KeyError(f"Unknown pipeline stage: {name}")
+        return semaphore
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """
+        Holds a slot of the named stage's semaphore for the duration of the block.
+
+        Args:
+            name (str): The stage name (search, crawl, summarize or persist).
+        """
+        async with self.semaphore(name):
+            yield
@@ -1,66 +1,219 @@
-import logfire
+import asyncio
+import gzip
+import json
 import os
 import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import logfire
+
 from asp.scraper.retrieve_articles import Article
 
-def export_article_to_txt(article: Article, topic: str) -> str:
+# Environment variable names for the export configuration
+OUTPUT_DIR_ENV_VAR = "ASP_OUTPUT_DIR"
+EXPORT_FORMAT_ENV_VAR = "ASP_EXPORT_FORMAT" # "txt", "jsonl" or "off"
+
+DEFAULT_OUTPUT_DIR = "output"
+EXPORT_FORMAT_TXT = "txt" # A directory per topic with articles.txt and summary.txt
+EXPORT_FORMAT_JSONL = "jsonl" # One gzip-compressed JSONL bundle per run, one line per topic
+EXPORT_FORMAT_OFF = "off"
+DEFAULT_EXPORT_FORMAT = EXPORT_FORMAT_TXT
+
+ARTICLES_FILENAME = "articles.txt"
+SUMMARY_FILENAME = "summary.txt"
+ARTICLE_SEPARATOR = "\n---\n"
+MAX_SLUG_LENGTH = 80
+
+SLUG_STRIP_PATTERN = re.compile(r"[^\w\s-]")
+SLUG_DASH_PATTERN = re.compile(r"[-\s]+")
+
+_exporter: Optional["Exporter"] = None
+
+
+def slugify(topic: str) -> str:
     """
-    Exports a validated article to a text file.
+    Turns a topic name into a safe lowercase file name component.
 
     Args:
-        article (Article): The Article object to export.
-        topic (str): The topic name to use for the filename.
+        topic (str): The topic name.
 
     Returns:
-        str: The path to the exported file.
+        str: The slug ("topic" if nothing usable is left).
     """
-    logfire.info("Exporting article to text file.", article_url=article.url, topic=topic)
-
-    # Create a safe filename from the topic
-    safe_topic = re.sub(r'[^\w\s-]', '', topic).strip().lower()
-    safe_topic = re.sub(r'[-\s]+', '-', safe_topic)
-    filename = f"{safe_topic}.txt"
-    filepath = os.path.join(os.getcwd(), filename) # Export to current working directory
-
-    content = f"Title: {article.title}\n"
-    content += f"Link: {article.url}\n"
-    content += "Content:\n"
-    content += article.content
-    content += "\n---\n" # Separator as specified
-
-    try:
-        with open(filepath, "a", encoding="utf-8") as f: # Use "a" for append mode
-            f.write(content)
-        logfire.info("Successfully exported article to {filepath}", filepath=filepath)
-        return filepath
-    except IOError as e:
-        logfire.error("Error exporting article to file {filepath}: {error}", filepath=filepath, error=e, exc_info=True)
-        raise # Re-raise the exception to be handled by the caller
-
-def export_summary_to_txt(summary: str, topic: str) -> str:
+    slug = SLUG_DASH_PATTERN.sub("-", SLUG_STRIP_PATTERN.sub("", topic).strip().lower())
+    return slug[:MAX_SLUG_LENGTH].strip("-") or "topic"
+
+
+def format_article(article: Article) -> str:
+    """Renders an article in the review text format (title, link, content and separator)."""
+    return f"Title: {article.title}\nLink: {article.url}\nContent:\n{article.content}{ARTICLE_SEPARATOR}"
+
+
+class TopicExport:
+    """
+    Buffers everything exported for one topic until it is written in one go.
     """
-    Exports the article summary to a text file.
+    def __init__(self, topic_id: Optional[int], topic: str):
+        """
+        Initializes an empty export for a topic.
 
-    Args:
-        summary (str): The summary content.
-        topic (str): The topic name to use for the filename.
+        Args:
+            topic_id (Optional[int]): The topic's row id, used to keep output paths unique.
+            topic (str): The topic name.
+        """
+        self.topic_id = topic_id
+        self.topic = topic
+        self.articles: List[Article] = []
+        self.summary: Optional[str] = None
 
-    Returns:
-        str: The path to the exported summary file.
+    @property
+    def name(self) -> str:
+        """The topic's output name: its slug plus its id, so topics with similar names never collide."""
+        slug = slugify(self.topic)
+        return f"{slug}-{self.topic_id}" if self.topic_id is not None else slug
+
+    def add_article(self, article: Article) -> None:
+        """Adds a validated article to the export."""
+        self.articles.append(article)
+
+    def as_record(self, run_id: str) -> dict:
+        """Returns the export as a JSON-serializable record for the JSONL bundle."""
+        return {
+            "run_id": run_id,
+            "topic_id": self.topic_id,
+            "topic": self.topic,
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "summary": self.summary,
+            "articles": [article.model_dump() for article in self.articles],
+        }
+
+
+class Exporter:
+    """
+    Writes each topic's articles and summary under a per-run output directory.
+
+    Writes run in a worker thread so they never block the event loop, and each topic's
+    output appears atomically: in "txt" format the topic directory is assembled under a
+    temporary name and renamed into place; in "jsonl" format the topic's record is
+    appended to the run's bundle as one self-contained gzip member (readable with
+    gzip.open), under a lock so concurrent topics never interleave.
+    """
+    def __init__(self, output_dir: str, export_format: str = DEFAULT_EXPORT_FORMAT, run_id: Optional[str] = None):
+        """
+        Initializes the exporter.
+
+        Args:
+            output_dir (str): The root of the output tree.
+            export_format (str): "txt", "jsonl" or "off".
+            run_id (Optional[str]): The run's directory name. Defaults to the UTC start time and process id.
+        """
+        self.output_dir = output_dir
+        self.export_format = export_format
+        self.run_id = run_id or f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{os.getpid()}"
+        self._bundle_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Exporter":
+        """
+        Builds the exporter from ASP_OUTPUT_DIR and ASP_EXPORT_FORMAT.
+        """
+        export_format = os.environ.get(EXPORT_FORMAT_ENV_VAR, DEFAULT_EXPORT_FORMAT).strip().lower()
+        if export_format not in (EXPORT_FORMAT_TXT, EXPORT_FORMAT_JSONL, EXPORT_FORMAT_OFF):
+            logfire.warn("Unknown export format {export_format}. Using {default}.",
+                         export_format=export_format, default=DEFAULT_EXPORT_FORMAT)
+            export_format = DEFAULT_EXPORT_FORMAT
+        output_dir = os.environ.get(OUTPUT_DIR_ENV_VAR) or os.path.join(os.getcwd(), DEFAULT_OUTPUT_DIR)
+        return cls(output_dir, export_format)
+
+    @property
+    def run_dir(self) -> str:
+        """The directory this run's topic directories are written to."""
+        return os.path.join(self.output_dir, self.run_id)
+
+    @property
+    def bundle_path(self) -> str:
+        """The path of this run's JSONL bundle."""
+        return os.path.join(self.output_dir, f"{self.run_id}.jsonl.gz")
+
+    def topic(self, topic_id: Optional[int], topic: str) -> TopicExport:
+        """
+        Starts buffering the export for a topic.
+
+        Args:
+            topic_id (Optional[int]): The topic's row id.
+            topic (str): The topic name.
+
+        Returns:
+            TopicExport: The buffer to add articles and the summary to.
+        """
+        return TopicExport(topic_id, topic)
+
+    async def write(self, export: TopicExport) -> Optional[str]:
+        """
+        Writes a topic's buffered export.
+
+        Args:
+            export (TopicExport): The topic's articles and summary.
+
+        Returns:
+            Optional[str]: The topic directory or bundle written to, or None if exporting is off.
+        """
+        if self.export_format == EXPORT_FORMAT_OFF:
+            return None
+        logfire.info("Exporting {count} articles and the summary for topic {topic}.",
+                     count=len(export.articles), topic=export.topic, export_format=self.export_format)
+        try:
+            if self.export_format == EXPORT_FORMAT_JSONL:
+                line = json.dumps(export.as_record(self.run_id), ensure_ascii=False) + "\n"
+                await asyncio.to_thread(self._append_bundle, line)
+                path = self.bundle_path
+            else:
+                files = {ARTICLES_FILENAME: "".join(format_article(article) for article in export.articles)}
+                if export.summary is not None:
+                    files[SUMMARY_FILENAME] = export.summary
+                path = await asyncio.to_thread(self._write_topic_dir, export.name, files)
+        except OSError as e:
+            logfire.error("Error exporting topic {topic}: {error}", topic=export.topic, error=e, exc_info=True)
+            raise # Re-raise the exception to be handled by the caller
+        logfire.info("Successfully exported topic {topic} to {path}", topic=export.topic, path=path)
+        return path
+
+    def _write_topic_dir(self, name: str, files: dict) -> str:
+        os.makedirs(self.run_dir, exist_ok=True)
+        topic_dir = os.path.join(self.run_dir, name)
+        staging_dir = tempfile.mkdtemp(prefix=f".{name}.", dir=self.run_dir)
+        try:
+            for filename, content in files.items():
+                with open(os.path.join(staging_dir, filename), "w", encoding="utf-8") as f:
+                    f.write(content)
+            if os.path.isdir(topic_dir):
+                # The same topic exported twice in one run (e.g. a retried lease): the latest wins
+                shutil.rmtree(topic_dir)
+            os.replace(staging_dir, topic_dir)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        return topic_dir
+
+    def _append_bundle(self, line: str) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Each record is its own gzip member, so a crash mid-run leaves every earlier line readable
+        member = gzip.compress(line.encode("utf-8"))
+        with self._bundle_lock, open(self.bundle_path, "ab") as f:
+            f.write(member)
+
+
+def get_exporter() -> Exporter:
+    """
+    Returns the process-wide exporter, creating it from the environment on first use.
     """
-    logfire.info("Exporting summary to text file.", topic=topic)
-
-    # Create a safe filename for the summary
-    safe_topic = re.sub(r'[^\w\s-]', '', topic).strip().lower()
-    safe_topic = re.sub(r'[-\s]+', '-', safe_topic)
-    filename = f"{safe_topic}_summed.txt"
-    filepath = os.path.join(os.getcwd(), filename) # Export to current working directory
-
-    try:
-        with open(filepath, "w", encoding="utf-8") as f: # Use "w" for write mode (overwrite if exists)
-            f.write(summary)
-        logfire.info("Successfully exported summary to {filepath}", filepath=filepath)
-        return filepath
-    except IOError as e:
-        logfire.error("Error exporting summary to file {filepath}: {error}", filepath=filepath, error=e, exc_info=True)
-        raise # Re-raise the exception to be handled by the caller
\ No newline at end of file
+    global _exporter
+    if _exporter is None:
+        _exporter = Exporter.from_env()
+        logfire.debug("Created exporter.", output_dir=_exporter.output_dir,
+                      export_format=_exporter.export_format, run_id=_exporter.run_id)
+    return _exporter
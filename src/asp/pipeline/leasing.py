@@ -0,0 +1,149 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Any, Dict, List, Optional
+
+import logfire
+
+# Environment variable names for topic leasing
+TOPIC_LEASING_ENV_VAR = "ASP_TOPIC_LEASING"
+WORKER_ID_ENV_VAR = "ASP_WORKER_ID"
+TOPIC_LEASE_SECONDS_ENV_VAR = "ASP_TOPIC_LEASE_SECONDS"
+TOPIC_HEARTBEAT_INTERVAL_ENV_VAR = "ASP_TOPIC_HEARTBEAT_INTERVAL"
+
+DEFAULT_TOPIC_LEASE_SECONDS = 600 # Comfortably longer than one topic's fetch total timeout plus summarization
+DEFAULT_TOPIC_HEARTBEAT_INTERVAL = 60.0 # Seconds between lease renewals
+
+
+def default_worker_id() -> str:
+    """
+    Returns this process's worker id: ASP_WORKER_ID if set, otherwise host, pid and a random suffix.
+    """
+    configured = os.environ.get(WORKER_ID_ENV_VAR, "").strip()
+    if configured:
+        return configured
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class TopicLeaseKeeper:
+    """
+    Keeps this worker's topic leases alive while the topics are being processed.
+
+    A background task renews every tracked lease each `heartbeat_interval` seconds. If a
+    renewal comes back without a topic (the lease expired and another worker reclaimed
+    it), the topic's processing task is cancelled so the work is not done twice. Topics
+    that finish without being persisted are released so another worker can pick them up
+    straight away instead of waiting for the lease to expire.
+    """
+    def __init__(self, queue: Any, worker_id: str, lease_seconds: int = DEFAULT_TOPIC_LEASE_SECONDS,
+                 heartbeat_interval: float = DEFAULT_TOPIC_HEARTBEAT_INTERVAL):
+        """
+        Initializes the lease keeper.
+
+        Args:
+            queue (Any): The topic queue (AsyncSupabaseClient or InMemoryTopicQueue).
+            worker_id (str): This worker's lease owner id.
+            lease_seconds (int): Lease length requested on claim and on every renewal.
+            heartbeat_interval (float): Seconds between renewals; must be well below lease_seconds.
+        """
+        self.queue = queue
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = min(heartbeat_interval, lease_seconds / 2)
+        self._tasks: Dict[Any, Optional[asyncio.Task]] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Claims up to `limit` topics and starts tracking their leases.
+
+        Args:
+            limit (int): The maximum number of topics to claim.
+
+        Returns:
+            List[Dict]: The claimed topics.
+        """
+        topics = await self.queue.claim_topics(self.worker_id, limit, self.lease_seconds)
+        for topic in topics:
+            self._tasks.setdefault(topic['id'], None)
+        if topics and self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._renew_forever())
+        logfire.info("Worker {worker_id} claimed {count} topics.", worker_id=self.worker_id, count=len(topics))
+        return topics
+
+    def attach(self, topic_id: Any, task: asyncio.Task) -> None:
+        """
+        Associates a claimed topic with the task processing it, so a lost lease can cancel it.
+
+        Args:
+            topic_id (Any): The claimed topic's id.
+            task (asyncio.Task): The task processing the topic.
+        """
+        self._tasks[topic_id] = task
+
+    def persisting(self, topic_id: Any) -> None:
+        """
+        Stops renewing a topic whose result is about to be written.
+
+        Renewals only match unprocessed rows, so once the write commits the topic would
+        look lost and its task would be cancelled even though the work succeeded. The lease
+        itself is kept until finish().
+
+        Args:
+            topic_id (Any): The topic's id.
+        """
+        self._tasks.pop(topic_id, None)
+
+    async def finish(self, topic_id: Any, persisted: bool) -> None:
+        """
+        Stops tracking a topic, releasing its lease unless the result was persisted.
+
+        Args:
+            topic_id (Any): The topic's id.
+            persisted (bool): Whether the topic was marked as processed.
+        """
+        self._tasks.pop(topic_id, None)
+        if not persisted:
+            await self._release([topic_id])
+
+    async def close(self) -> None:
+        """
+        Stops the heartbeat and releases every lease still held.
+        """
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        remaining = list(self._tasks)
+        self._tasks.clear()
+        if remaining:
+            await self._release(remaining)
+
+    async def _renew_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            topic_ids = list(self._tasks)
+            if not topic_ids:
+                continue
+            try:
+                renewed = await self.queue.renew_topic_leases(self.worker_id, topic_ids, self.lease_seconds)
+            except Exception as e:
+                # Keep working: the lease is still valid until it expires, and the next beat may succeed
+                logfire.warn("Failed to renew leases for {count} topics: {error}", count=len(topic_ids), error=e)
+                continue
+            for topic_id in topic_ids:
+                if topic_id in renewed or topic_id not in self._tasks:
+                    continue
+                task = self._tasks.pop(topic_id)
+                logfire.warn("Lease on topic {topic_id} was lost; cancelling its processing.",
+                             topic_id=topic_id, worker_id=self.worker_id)
+                if task is not None:
+                    task.cancel()
+
+    async def _release(self, topic_ids: List[Any]) -> None:
+        try:
+            await self.queue.release_topic_leases(self.worker_id, topic_ids)
+        except Exception as e:
+            # The leases will simply expire
+            logfire.warn("Failed to release leases for {count} topics: {error}", count=len(topic_ids), error=e)
@@ -0,0 +1,196 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import logfire
+
+from asp.utils.logfire_config import trace_step
+from asp.utils.metrics import metrics
+from asp.utils.stats import percentile
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Marks the end of the stream in a stage queue
+_END = object()
+
+TOPIC_STAGE_SECONDS = metrics.histogram("asp_topic_stage_seconds",
+                                        "Busy seconds per topic in each pipeline stage ('topic' is the whole topic)")
+
+
+class StageTimings:
+    """
+    Records when each pipeline stage was busy for one topic, to show how much the stages overlap.
+
+    A stage may run several times (e.g. summarize once per article, concurrently); its busy
+    time is the union of those intervals, and the overlap of two stages is the time both
+    were busy at once.
+    """
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        """
+        Initializes empty timings starting now.
+
+        Args:
+            clock (Callable[[], float]): Time source in seconds.
+        """
+        self.clock = clock
+        self.started_at = clock()
+        self.intervals: Dict[str, List[Tuple[float, float]]] = {}
+
+    @contextmanager
+    def measure(self, stage: str):
+        """
+        Records the duration of the block as one busy interval of `stage`, and traces it as a step.
+
+        Args:
+            stage (str): The stage name.
+        """
+        start = self.clock()
+        try:
+            with trace_step(stage):
+                yield
+        finally:
+            self.intervals.setdefault(stage, []).append((start, self.clock()))
+
+    def merged(self, stage: str) -> List[Tuple[float, float]]:
+        """Returns the stage's busy intervals, sorted and merged where they overlap."""
+        merged: List[Tuple[float, float]] = []
+        for start, end in sorted(self.intervals.get(stage, [])):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def busy(self, stage: str) -> float:
+        """Returns the seconds during which the stage was running at least once."""
+        return sum(end - start for start, end in self.merged(stage))
+
+    def overlap(self, first: str, second: str) -> float:
+        """Returns the seconds during which both stages were running."""
+        total = 0.0
+        for start_a, end_a in self.merged(first):
+            for start_b, end_b in self.merged(second):
+                total += max(0.0, min(end_a, end_b) - max(start_a, start_b))
+        return total
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns, per stage, its busy seconds and its first start and last end relative to
+        the topic start, plus the crawl/summarize overlap, for logging.
+        """
+        stages = {}
+        for stage, intervals in self.intervals.items():
+            stages[stage] = {
+                "busy": round(self.busy(stage), 3),
+                "first_start": round(min(start for start, _ in intervals) - self.started_at, 3),
+                "last_end": round(max(end for _, end in intervals) - self.started_at, 3),
+            }
+        stages["overlap"] = {"crawl_summarize": round(self.overlap("crawl", "summarize"), 3)}
+        return stages
+
+
+class StageTimingStats:
+    """
+    Collects per-topic stage timings across a run: summed busy time, p50/p95 per stage
+    (with "topic" as the whole topic's wall time) and the crawl/summarize overlap.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Clears the collected timings (e.g. between benchmark runs in one process)."""
+        self.topics = 0
+        self.samples: Dict[str, List[float]] = {}
+        self.crawl_summarize_overlap = 0.0
+
+    def add(self, timings: StageTimings) -> None:
+        """Adds one finished topic's timings."""
+        self.topics += 1
+        topic_seconds = timings.clock() - timings.started_at
+        self.samples.setdefault("topic", []).append(topic_seconds)
+        TOPIC_STAGE_SECONDS.observe(topic_seconds, stage="topic")
+        for stage in timings.intervals:
+            self.samples.setdefault(stage, []).append(timings.busy(stage))
+            TOPIC_STAGE_SECONDS.observe(timings.busy(stage), stage=stage)
+        self.crawl_summarize_overlap += timings.overlap("crawl", "summarize")
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """Returns the p50 and p95 seconds per stage."""
+        return {
+            stage: {"p50": round(percentile(values, 0.5), 3), "p95": round(percentile(values, 0.95), 3)}
+            for stage, values in self.samples.items()
+        }
+
+    def as_dict(self) -> Dict[str, float]:
+        """Returns the summed seconds, the per-stage percentiles and the share of summarize time spent while still crawling."""
+        summarize = sum(self.samples.get("summarize", []))
+        return {
+            "topics": self.topics,
+            **{f"{stage}_busy": round(sum(values), 2) for stage, values in self.samples.items()},
+            "percentiles": self.percentiles(),
+            "crawl_summarize_overlap": round(self.crawl_summarize_overlap, 2),
+            "summarize_overlap_share": round(self.crawl_summarize_overlap / summarize, 3) if summarize else 0.0,
+        }
+
+# Process-wide stage timings, logged at the end of every run
+stage_timing_stats = StageTimingStats()
+
+
+async def stream_stage(source: AsyncIterator[T], worker: Callable[[T], Awaitable[R]],
+                       workers: int = 1, buffer: int = 1) -> List[R]:
+    """
+    Runs `worker` on every item of `source` while the source is still producing.
+
+    A producer task moves items from the source into a queue of at most `buffer` items
+    and `workers` consumers take them from there. When every consumer is busy and the
+    queue is full the producer stops pulling from the source, so a slow stage holds back
+    the stage feeding it. If a worker fails, the source and the other workers are
+    cancelled and the error is raised.
+
+    Args:
+        source (AsyncIterator[T]): The upstream stage (e.g. an async generator).
+        worker (Callable[[T], Awaitable[R]]): The downstream stage, called once per item.
+        workers (int): The number of items processed at once.
+        buffer (int): The number of items allowed to wait between the stages.
+
+    Returns:
+        List[R]: The worker results, in source order.
+    """
+    workers = max(1, workers)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, buffer))
+    results: Dict[int, R] = {}
+
+    async def produce() -> None:
+        try:
+            index = 0
+            async for item in source:
+                await queue.put((index, item))
+                index += 1
+        finally:
+            # Closes the source (and cancels its own work) when the stage is cancelled
+            aclose: Optional[Callable[[], Awaitable[None]]] = getattr(source, "aclose", None)
+            if aclose:
+                await aclose()
+        for _ in range(workers):
+            await queue.put(_END)
+
+    async def consume() -> None:
+        while True:
+            entry = await queue.get()
+            if entry is _END:
+                return
+            index, item = entry
+            results[index] = await worker(item)
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(consume()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    logfire.debug("Stream stage finished. Processed {count} items.", count=len(results))
+    return [results[index] for index in sorted(results)]
@@ -0,0 +1,298 @@
+import asyncio
+import re
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import logfire
+
+from asp.utils.env import get_int_env
+
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler
+
+try:
+    import psutil # Installed with crawl4ai; only needed for the memory threshold
+except ImportError:
+    psutil = None
+
+# Environment variable names for the browser pool configuration
+BROWSER_POOL_SIZE_ENV_VAR = "ASP_BROWSER_POOL_SIZE"
+BROWSER_PAGE_CONCURRENCY_ENV_VAR = "ASP_BROWSER_PAGE_CONCURRENCY"
+BROWSER_RECYCLE_PAGES_ENV_VAR = "ASP_BROWSER_RECYCLE_PAGES"
+BROWSER_MAX_RSS_MB_ENV_VAR = "ASP_BROWSER_MAX_RSS_MB"
+
+DEFAULT_BROWSER_POOL_SIZE = 1
+DEFAULT_BROWSER_PAGE_CONCURRENCY = 4 # Open pages (tabs) per browser
+DEFAULT_BROWSER_RECYCLE_PAGES = 200 # Pages served before a browser is restarted
+DEFAULT_BROWSER_MAX_RSS_MB = 1500 # Total browser memory before the busiest browser is restarted (0 disables)
+
+# Pages between browser memory checks (the check walks the process tree)
+RSS_CHECK_INTERVAL = 10
+# Seconds a browser that failed to launch is not retried; crawls fail fast in the meantime
+BROWSER_START_BACKOFF = 30.0
+BROWSER_PROCESS_PATTERN = re.compile(r"chrom|headless_shell", re.IGNORECASE)
+# Errors that mean the browser itself is gone rather than the page failing
+BROWSER_CRASH_PATTERN = re.compile(
+    r"browser has been closed|target (?:page, context or browser )?(?:has been )?closed|"
+    r"browser (?:has )?disconnected|connection closed|crashed", re.IGNORECASE)
+
+_browser_pool: Optional["BrowserPool"] = None
+
+
+def browser_rss_mb() -> Optional[float]:
+    """
+    Returns the resident memory of this process's browser child processes in MB, or None without psutil.
+    """
+    if psutil is None:
+        return None
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            if BROWSER_PROCESS_PATTERN.search(child.name()):
+                total += child.memory_info().rss
+        except psutil.Error:
+            continue # The process exited while we looked at it
+    return total / 1_000_000
+
+
+class _BrowserSlot:
+    """One browser in the pool, started on first use."""
+    def __init__(self, index: int, page_concurrency: int):
+        self.index = index
+        self.crawler: Optional["AsyncWebCrawler"] = None
+        self.pages = asyncio.Semaphore(page_concurrency)
+        self.start_lock = asyncio.Lock()
+        self.in_flight = 0 # Pages holding one of this browser's tabs
+        self.waiting = 0 # Pages queued for a tab
+        self.pages_served = 0
+        self.retiring = False
+        self.start_error: Optional[BaseException] = None
+        self.start_failed_at = 0.0
+
+
+class BrowserPool:
+    """
+    Process-wide pool of warm crawl4ai browsers shared by every topic.
+
+    Each browser is started on its first crawl and then kept running, so topics no longer
+    pay for launching Chromium. Crawls go to the browser with the fewest open pages, and
+    each browser has at most `page_concurrency` pages open at once. A browser is restarted
+    after `recycle_pages` pages, or when the browsers together exceed `max_rss_mb`; it
+    stops taking new pages and restarts once its open pages finish. A browser that
+    crashes is discarded and a fresh one starts on the next crawl.
+    """
+    def __init__(self, size: int = DEFAULT_BROWSER_POOL_SIZE,
+                 page_concurrency: int = DEFAULT_BROWSER_PAGE_CONCURRENCY,
+                 recycle_pages: int = DEFAULT_BROWSER_RECYCLE_PAGES,
+                 max_rss_mb: int = DEFAULT_BROWSER_MAX_RSS_MB):
+        """
+        Initializes the pool; no browser starts until the first crawl.
+
+        Args:
+            size (int): The number of browsers.
+            page_concurrency (int): Maximum open pages per browser.
+            recycle_pages (int): Pages served before a browser is restarted (0 disables).
+            max_rss_mb (int): Total browser memory in MB that triggers a restart (0 disables).
+        """
+        self.size = max(1, size)
+        self.page_concurrency = max(1, page_concurrency)
+        self.recycle_pages = recycle_pages
+        self.max_rss_mb = max_rss_mb
+        self._slots: List[_BrowserSlot] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slot_available: Optional[asyncio.Condition] = None
+        self._pages_since_rss_check = 0
+        self.starts = 0
+        self.recycles = 0
+        self.crashes = 0
+        self.pages_served = 0
+        self.peak_rss_mb = 0.0
+
+    @classmethod
+    def from_env(cls) -> "BrowserPool":
+        """
+        Builds the pool from the ASP_BROWSER_* environment variables.
+        """
+        return cls(
+            size=get_int_env(BROWSER_POOL_SIZE_ENV_VAR, DEFAULT_BROWSER_POOL_SIZE),
+            page_concurrency=get_int_env(BROWSER_PAGE_CONCURRENCY_ENV_VAR, DEFAULT_BROWSER_PAGE_CONCURRENCY),
+            recycle_pages=get_int_env(BROWSER_RECYCLE_PAGES_ENV_VAR, DEFAULT_BROWSER_RECYCLE_PAGES, minimum=0),
+            max_rss_mb=get_int_env(BROWSER_MAX_RSS_MB_ENV_VAR, DEFAULT_BROWSER_MAX_RSS_MB, minimum=0),
+        )
+
+    def _get_slots(self) -> List[_BrowserSlot]:
+        # Browsers, semaphores and locks belong to one event loop; a new loop gets a fresh pool
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots = [_BrowserSlot(index, self.page_concurrency) for index in range(self.size)]
+            self._slot_available = asyncio.Condition()
+            self._loop = loop
+        return self._slots
+
+    async def _ensure_started(self, slot: _BrowserSlot) -> "AsyncWebCrawler":
+        async with slot.start_lock:
+            if slot.crawler is None:
+                if slot.start_error and time.monotonic() - slot.start_failed_at < BROWSER_START_BACKOFF:
+                    raise RuntimeError(f"Browser {slot.index} failed to start recently: {slot.start_error}")
+                # crawl4ai (and Playwright) load with the first browser, not when the pipeline starts
+                from crawl4ai import AsyncWebCrawler
+                crawler = AsyncWebCrawler()
+                try:
+                    await crawler.start()
+                except Exception as e:
+                    slot.start_error, slot.start_failed_at = e, time.monotonic()
+                    logfire.error("Browser {index} failed to start: {error}", index=slot.index, error=e)
+                    raise
+                slot.start_error = None
+                slot.crawler = crawler
+                slot.pages_served = 0
+                slot.retiring = False
+                self.starts += 1
+                logfire.info("Started browser {index} of the crawler pool.", index=slot.index, starts=self.starts)
+            return slot.crawler
+
+    async def _discard(self, slot: _BrowserSlot, crawler: "AsyncWebCrawler") -> None:
+        """Closes a browser and clears its slot, unless the slot already moved on to a new browser."""
+        if slot.crawler is crawler:
+            slot.crawler = None
+            # The empty slot starts a fresh browser on its next page, so pages waiting on a retirement can go
+            slot.retiring = False
+            if self._slot_available is not None:
+                async with self._slot_available:
+                    self._slot_available.notify_all()
+        try:
+            await crawler.close()
+        except Exception as e:
+            logfire.debug("Error closing browser {index}: {error}", index=slot.index, error=e)
+
+    async def arun(self, url: str, **kwargs: Any):
+        """
+        Crawls a URL on the least busy browser, starting or restarting browsers as needed.
+
+        Args:
+            url (str): The URL to crawl.
+            **kwargs: Passed to AsyncWebCrawler.arun.
+
+        Returns:
+            The crawl4ai result.
+        """
+        slot = await self._acquire_page(self._get_slots())
+        slot.in_flight += 1
+        crawler = None
+        try:
+            crawler = await self._ensure_started(slot)
+            try:
+                result = await crawler.arun(url=url, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if BROWSER_CRASH_PATTERN.search(str(e)):
+                    await self._on_crash(slot, crawler, e)
+                raise
+            if not getattr(result, "success", True) and BROWSER_CRASH_PATTERN.search(
+                    str(getattr(result, "error_message", "") or "")):
+                await self._on_crash(slot, crawler, result.error_message)
+            slot.pages_served += 1
+            self.pages_served += 1
+            return result
+        finally:
+            slot.in_flight -= 1
+            slot.pages.release()
+            if crawler is not None:
+                await self._maybe_recycle(slot, crawler)
+
+    async def _acquire_page(self, slots: List[_BrowserSlot]) -> _BrowserSlot:
+        """
+        Waits for a tab on the least busy browser that is not retiring and returns its slot.
+
+        A retiring browser takes no new pages, even when every browser is retiring (always
+        the case with a pool of one); new pages wait until one has drained and restarted.
+        """
+        while True:
+            async with self._slot_available:
+                await self._slot_available.wait_for(lambda: any(not s.retiring for s in slots))
+            slot = min((s for s in slots if not s.retiring), key=lambda s: s.in_flight + s.waiting)
+            slot.waiting += 1
+            try:
+                await slot.pages.acquire()
+            finally:
+                slot.waiting -= 1
+            if not slot.retiring:
+                return slot
+            # The browser started retiring while this page waited for a tab; pick again
+            slot.pages.release()
+
+    async def _on_crash(self, slot: _BrowserSlot, crawler: "AsyncWebCrawler", error: Any) -> None:
+        if slot.crawler is not crawler:
+            return # Another page on the same browser already reported it
+        self.crashes += 1
+        logfire.warn("Browser {index} crashed: {error}. It will be restarted on the next crawl.",
+                     index=slot.index, error=error, crashes=self.crashes)
+        await self._discard(slot, crawler)
+
+    async def _maybe_recycle(self, slot: _BrowserSlot, crawler: "AsyncWebCrawler") -> None:
+        if slot.crawler is not crawler:
+            return
+        if not slot.retiring and self.recycle_pages and slot.pages_served >= self.recycle_pages:
+            slot.retiring = True
+            logfire.info("Recycling browser {index} after {pages} pages.", index=slot.index, pages=slot.pages_served)
+        if not slot.retiring and self.max_rss_mb:
+            self._pages_since_rss_check += 1
+            if self._pages_since_rss_check >= RSS_CHECK_INTERVAL:
+                self._pages_since_rss_check = 0
+                rss_mb = await asyncio.to_thread(browser_rss_mb)
+                if rss_mb is not None:
+                    self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+                    busiest = max((s for s in self._slots if s.crawler), key=lambda s: s.pages_served, default=None)
+                    if rss_mb > self.max_rss_mb and busiest is not None:
+                        busiest.retiring = True
+                        logfire.info("Browsers use {rss_mb:.0f} MB (limit {limit} MB); recycling browser {index}.",
+                                     rss_mb=rss_mb, limit=self.max_rss_mb, index=busiest.index)
+                        # An idle browser has no page left to finish it, so close it now
+                        if busiest is not slot and busiest.in_flight == 0:
+                            self.recycles += 1
+                            await self._discard(busiest, busiest.crawler)
+        # A retiring browser takes no new pages and closes once its open pages are done
+        if slot.retiring and slot.in_flight == 0:
+            self.recycles += 1
+            await self._discard(slot, crawler)
+
+    async def close(self) -> None:
+        """Closes every running browser."""
+        for slot in self._slots:
+            if slot.crawler is not None:
+                await self._discard(slot, slot.crawler)
+        self._slots = []
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns browser starts, recycles, crashes and peak memory, for logging."""
+        rss_mb = browser_rss_mb() if self._slots else None
+        if rss_mb is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        return {
+            "size": self.size,
+            "starts": self.starts,
+            "recycles": self.recycles,
+            "crashes": self.crashes,
+            "pages_served": self.pages_served,
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+        }
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Returns the process-wide browser pool, creating it from the environment on first use.
+    """
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool.from_env()
+    return _browser_pool
+
+
+async def close_browser_pool() -> None:
+    """
+    Closes the browser pool's browsers if any were started. Safe to call more than once.
+    """
+    if _browser_pool is not None:
+        await _browser_pool.close()
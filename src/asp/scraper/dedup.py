@@ -0,0 +1,97 @@
+import heapq
+import re
+import zlib
+from typing import FrozenSet, List, Optional, Tuple
+
+import logfire
+
+# Defaults for near-duplicate detection
+DEFAULT_SHINGLE_SIZE = 5 # Words per shingle
+DEFAULT_SKETCH_SIZE = 128 # Hashes kept per document (bottom-k MinHash)
+DEFAULT_SIMILARITY_THRESHOLD = 0.8 # Estimated Jaccard similarity above which two texts are duplicates
+MAX_FINGERPRINT_WORDS = 20_000 # Longer texts are fingerprinted on their first N words
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def fingerprint(text: str, shingle_size: int = DEFAULT_SHINGLE_SIZE,
+                sketch_size: int = DEFAULT_SKETCH_SIZE) -> FrozenSet[int]:
+    """
+    Builds a bottom-k MinHash sketch of a text's word shingles.
+
+    Each overlapping run of `shingle_size` words is hashed once and only the `sketch_size`
+    smallest hashes are kept, so the cost is linear in the text length and the sketch has a
+    fixed size however long the article is.
+
+    Args:
+        text (str): The cleaned article text.
+        shingle_size (int): Number of words per shingle.
+        sketch_size (int): Number of hashes kept.
+
+    Returns:
+        FrozenSet[int]: The sketch.
+    """
+    # Words are mapped to CRC32 ids so shingle hashes don't depend on the per-process str hash seed
+    word_ids = [zlib.crc32(word.encode("utf-8")) for word in WORD_PATTERN.findall(text.lower())[:MAX_FINGERPRINT_WORDS]]
+    if len(word_ids) < shingle_size:
+        shingles = {hash(tuple(word_ids))} if word_ids else set()
+    else:
+        shingles = {hash(tuple(word_ids[i:i + shingle_size])) for i in range(len(word_ids) - shingle_size + 1)}
+    return frozenset(heapq.nsmallest(sketch_size, shingles))
+
+
+def estimate_similarity(sketch_a: FrozenSet[int], sketch_b: FrozenSet[int],
+                        sketch_size: int = DEFAULT_SKETCH_SIZE) -> float:
+    """
+    Estimates the Jaccard similarity of two texts from their bottom-k sketches.
+
+    Args:
+        sketch_a (FrozenSet[int]): The first sketch.
+        sketch_b (FrozenSet[int]): The second sketch.
+        sketch_size (int): The k used to build the sketches.
+
+    Returns:
+        float: Estimated similarity between 0.0 and 1.0.
+    """
+    if not sketch_a or not sketch_b:
+        return 0.0
+    union_sketch = heapq.nsmallest(sketch_size, sketch_a | sketch_b)
+    shared = sum(1 for value in union_sketch if value in sketch_a and value in sketch_b)
+    return shared / len(union_sketch)
+
+
+class NearDuplicateFilter:
+    """
+    Remembers the sketches of accepted texts and flags new texts that are near-copies of them.
+    """
+    def __init__(self, threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        """
+        Initializes the filter.
+
+        Args:
+            threshold (float): Estimated similarity at or above which a text is a duplicate.
+        """
+        self.threshold = threshold
+        self._accepted: List[Tuple[str, FrozenSet[int]]] = []
+
+    def check_and_add(self, key: str, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Checks a text against the accepted texts and accepts it if it is not a near-duplicate.
+
+        Args:
+            key (str): An identifier for the text (e.g. its URL), reported on matches.
+            text (str): The text to check.
+
+        Returns:
+            Optional[Tuple[str, float]]: (key of the matching accepted text, similarity) if the text
+                                         is a near-duplicate, otherwise None.
+        """
+        sketch = fingerprint(text)
+        for accepted_key, accepted_sketch in self._accepted:
+            similarity = estimate_similarity(sketch, accepted_sketch)
+            if similarity >= self.threshold:
+                logfire.debug("Near-duplicate of {accepted_key} detected (similarity {similarity:.2f}).",
+                              accepted_key=accepted_key, similarity=similarity)
+                return accepted_key, similarity
+        self._accepted.append((key, sketch))
+        return None
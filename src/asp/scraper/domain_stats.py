@@ -0,0 +1,162 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import logfire
+from pydantic import BaseModel
+
+from asp.utils.cache import DiskCache, get_cache_dir
+from asp.utils.env import get_bool_env
+from asp.utils.rate_limit import domain_of
+
+# Environment variable name to turn the domain quality memory on or off
+DOMAIN_STATS_ENABLED_ENV_VAR = "ASP_DOMAIN_STATS"
+DOMAIN_STATS_MAX_BYTES = 16 * 1024 * 1024
+
+# Fetch outcomes recorded per domain
+OUTCOME_VALID = "valid" # Fetched and passed validation
+OUTCOME_INVALID = "invalid" # Fetched but failed validation
+OUTCOME_PAYWALLED = "paywalled" # Failed validation behind a paywall
+OUTCOME_FAILED = "failed" # Crawl error or timeout
+
+# Beta(1, 1) prior on the pass rate, so an unseen domain scores 0.5
+PRIOR_VALID = 1.0
+PRIOR_ATTEMPTS = 2.0
+# Counts are halved once a domain reaches this many attempts, so recent outcomes dominate
+DECAY_AFTER_ATTEMPTS = 100
+# Fetch latency above which a domain starts losing quality, and the latency at which it loses the most
+FAST_FETCH_SECONDS = 5.0
+SLOW_FETCH_SECONDS = 30.0
+MAX_LATENCY_PENALTY = 0.2
+# Extra penalty for a domain whose every fetch hit a paywall; paywalls rarely come and go
+MAX_PAYWALL_PENALTY = 0.2
+
+_domain_stats: Optional["DomainStatsStore"] = None
+
+
+class DomainStats(BaseModel):
+    """
+    Fetch outcome counters for one domain.
+    """
+    attempts: float = 0.0
+    valid: float = 0.0
+    paywalled: float = 0.0
+    failed: float = 0.0
+    total_latency: float = 0.0
+
+    @property
+    def pass_rate(self) -> float:
+        """Smoothed fraction of fetches that produced a valid article."""
+        return (self.valid + PRIOR_VALID) / (self.attempts + PRIOR_ATTEMPTS)
+
+    @property
+    def mean_latency(self) -> float:
+        """Average seconds per fetch (0.0 when unseen)."""
+        return self.total_latency / self.attempts if self.attempts else 0.0
+
+    @property
+    def quality(self) -> float:
+        """
+        The domain prior between 0.0 and 1.0: the smoothed pass rate, reduced for slow and
+        paywalled domains. Failed fetches lower the pass rate like any other non-valid outcome.
+        """
+        excess = min(1.0, max(0.0, self.mean_latency - FAST_FETCH_SECONDS) / (SLOW_FETCH_SECONDS - FAST_FETCH_SECONDS))
+        paywall_rate = self.paywalled / (self.attempts + PRIOR_ATTEMPTS)
+        return max(0.0, self.pass_rate - MAX_LATENCY_PENALTY * excess - MAX_PAYWALL_PENALTY * paywall_rate)
+
+
+class DomainStatsStore:
+    """
+    Persisted per-domain fetch outcomes, used as a prior when ranking search results.
+    """
+    def __init__(self, path: str, max_bytes: int = DOMAIN_STATS_MAX_BYTES):
+        """
+        Initializes the store.
+
+        Args:
+            path (str): The SQLite file path.
+            max_bytes (int): The maximum total size of the stored stats.
+        """
+        self._cache = DiskCache(path, max_bytes)
+
+    def get(self, domain: str) -> DomainStats:
+        """
+        Returns the stats for a domain (empty stats if it was never fetched).
+
+        Args:
+            domain (str): The domain, as returned by domain_of.
+        """
+        entry = self._cache.get_entry(domain)
+        if entry is None:
+            return DomainStats()
+        try:
+            return DomainStats(**json.loads(entry["value"]))
+        except Exception as e:
+            logfire.warn("Discarding unreadable domain stats for {domain}: {error}", domain=domain, error=e)
+            self._cache.delete(domain)
+            return DomainStats()
+
+    def quality(self, url: str) -> float:
+        """Returns the quality prior of a URL's domain."""
+        return self.get(domain_of(url)).quality
+
+    async def qualities(self, urls: List[str]) -> Dict[str, float]:
+        """
+        Returns the quality prior of each URL's domain, read on the cache's worker thread.
+
+        Args:
+            urls (List[str]): The URLs to score.
+
+        Returns:
+            Dict[str, float]: The prior per URL.
+        """
+        return await self._cache.run(lambda: {url: self.quality(url) for url in urls})
+
+    async def record(self, url: str, outcome: str, latency: float) -> None:
+        """
+        Records the outcome of one fetch on the cache's worker thread. Updates run one at a
+        time there, so concurrent fetches of one domain do not overwrite each other's counts.
+
+        Args:
+            url (str): The fetched URL.
+            outcome (str): One of the OUTCOME_* constants.
+            latency (float): Seconds the fetch took.
+        """
+        await self._cache.run(self._record, url, outcome, latency)
+
+    def _record(self, url: str, outcome: str, latency: float) -> None:
+        domain = domain_of(url)
+        if not domain:
+            return
+        stats = self.get(domain)
+        if stats.attempts >= DECAY_AFTER_ATTEMPTS:
+            stats = DomainStats(**{field: value / 2 for field, value in stats.model_dump().items()})
+        stats.attempts += 1
+        stats.total_latency += latency
+        if outcome == OUTCOME_VALID:
+            stats.valid += 1
+        elif outcome == OUTCOME_PAYWALLED:
+            stats.paywalled += 1
+        elif outcome == OUTCOME_FAILED:
+            stats.failed += 1
+        self._cache.set(domain, stats.model_dump_json())
+
+
+def get_domain_stats() -> Optional[DomainStatsStore]:
+    """
+    Returns the process-wide domain stats store, creating it on first use.
+
+    The store lives in <ASP_CACHE_DIR>/domains.sqlite. Set ASP_DOMAIN_STATS=off to disable it.
+
+    Returns:
+        Optional[DomainStatsStore]: The shared store, or None when disabled.
+    """
+    global _domain_stats
+    if not get_bool_env(DOMAIN_STATS_ENABLED_ENV_VAR, True):
+        return None
+    if _domain_stats is None:
+        path = os.path.join(get_cache_dir(), "domains.sqlite")
+        _domain_stats = DomainStatsStore(path)
+        logfire.info("Domain stats store initialized.", path=path)
+    return _domain_stats
+
@@ -0,0 +1,123 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import logfire
+
+# JSON-LD types that describe the article itself
+ARTICLE_LD_TYPES = frozenset([
+    "article", "newsarticle", "blogposting", "reportagenewsarticle", "analysisnewsarticle",
+    "opinionnewsarticle", "techarticle", "scholarlyarticle", "report", "webpage",
+])
+
+# Meta tags consulted for each field, in order of preference
+TITLE_META_KEYS = ("og:title", "twitter:title")
+CANONICAL_META_KEYS = ("og:url",)
+PUBLISHED_META_KEYS = ("article:published_time", "og:published_time", "datepublished", "pubdate",
+                       "publish-date", "date")
+AUTHOR_META_KEYS = ("author", "article:author", "twitter:creator")
+
+
+class PageMetadataCollector:
+    """
+    Collects title, canonical URL, publish date and author while a page is being parsed.
+
+    Both cleaning engines feed it the same events (meta/link attributes, <title> text and
+    JSON-LD script bodies, in document order) so they produce identical metadata. The first
+    value seen for each source wins.
+    """
+    def __init__(self):
+        self._meta: Dict[str, str] = {}
+        self._canonical_link: Optional[str] = None
+        self._title_text: Optional[str] = None
+        self._json_ld: List[Dict[str, Any]] = []
+
+    def add_tag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        """
+        Records a <meta> or <link> element.
+
+        Args:
+            tag (str): The lowercase tag name.
+            attrs (List[Tuple[str, Optional[str]]]): The element's attributes.
+        """
+        attributes = {key.lower(): (value or "") for key, value in attrs}
+        if tag == "meta":
+            key = (attributes.get("property") or attributes.get("name") or attributes.get("itemprop") or "").lower()
+            content = attributes.get("content", "").strip()
+            if key and content and key not in self._meta:
+                self._meta[key] = content
+        elif tag == "link" and self._canonical_link is None:
+            rel_values = attributes.get("rel", "").lower().split()
+            href = attributes.get("href", "").strip()
+            if "canonical" in rel_values and href:
+                self._canonical_link = href
+
+    def add_title(self, text: str) -> None:
+        """Records the text of the first <title> element."""
+        if self._title_text is None:
+            self._title_text = " ".join(text.split())
+
+    def add_json_ld(self, text: str) -> None:
+        """Records the body of an application/ld+json script, ignoring malformed JSON."""
+        try:
+            data = json.loads(text)
+        except (ValueError, TypeError):
+            logfire.debug("Ignoring malformed JSON-LD block.")
+            return
+        self._json_ld.extend(_flatten_json_ld(data))
+
+    def result(self) -> Dict[str, Optional[str]]:
+        """
+        Resolves the collected sources into final metadata values.
+
+        Returns:
+            Dict[str, Optional[str]]: 'title', 'canonical_url', 'published_at' and 'author'.
+        """
+        article_ld = next((item for item in self._json_ld if _ld_type_matches(item)), {})
+        title = (self._first_meta(TITLE_META_KEYS)
+                 or _ld_text(article_ld.get("headline"))
+                 or self._title_text)
+        return {
+            "title": title or None,
+            "canonical_url": self._canonical_link or self._first_meta(CANONICAL_META_KEYS),
+            "published_at": _ld_text(article_ld.get("datePublished")) or self._first_meta(PUBLISHED_META_KEYS),
+            "author": _ld_author(article_ld.get("author")) or self._first_meta(AUTHOR_META_KEYS),
+        }
+
+    def _first_meta(self, keys: Tuple[str, ...]) -> Optional[str]:
+        for key in keys:
+            if self._meta.get(key):
+                return self._meta[key]
+        return None
+
+
+def _flatten_json_ld(data: Any) -> List[Dict[str, Any]]:
+    """Flattens top-level lists and @graph containers into a list of JSON-LD objects."""
+    if isinstance(data, list):
+        return [item for element in data for item in _flatten_json_ld(element)]
+    if isinstance(data, dict):
+        if isinstance(data.get("@graph"), list):
+            return _flatten_json_ld(data["@graph"])
+        return [data]
+    return []
+
+
+def _ld_type_matches(item: Dict[str, Any]) -> bool:
+    types = item.get("@type")
+    types = types if isinstance(types, list) else [types]
+    return any(isinstance(value, str) and value.lower() in ARTICLE_LD_TYPES for value in types)
+
+
+def _ld_text(value: Any) -> Optional[str]:
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+
+def _ld_author(value: Any) -> Optional[str]:
+    """Resolves a JSON-LD author (string, Person object, or list of either) to display names."""
+    if isinstance(value, list):
+        names = [name for name in (_ld_author(item) for item in value) if name]
+        return ", ".join(names) or None
+    if isinstance(value, dict):
+        return _ld_text(value.get("name"))
+    return _ld_text(value)
@@ -0,0 +1,237 @@
+import json
+import os
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+import logfire
+from pydantic import BaseModel
+
+from asp.utils.cache import DiskCache, get_cache_dir
+from asp.utils.env import get_bool_env, get_float_env, get_int_env
+
+# Environment variable names for the page cache
+PAGE_CACHE_ENABLED_ENV_VAR = "ASP_PAGE_CACHE"
+PAGE_CACHE_TTL_ENV_VAR = "ASP_PAGE_CACHE_TTL"
+PAGE_CACHE_MAX_MB_ENV_VAR = "ASP_PAGE_CACHE_MAX_MB"
+DEFAULT_PAGE_CACHE_TTL = 24 * 60 * 60 # Seconds a cached page is served without revalidation
+DEFAULT_PAGE_CACHE_MAX_MB = 512
+
+# Query parameters that never change page content and only fragment the cache
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+_page_cache: Optional["PageCache"] = None
+
+
+class CachedPage(BaseModel):
+    """
+    A crawled page stored in the page cache.
+    """
+    url: str
+    final_url: str
+    html: str
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    rendered: bool = False # Fetched by the headless browser rather than a plain GET
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL for use as a cache key.
+
+    Lowercases the scheme and host, drops default ports, fragments and tracking parameters,
+    and sorts the remaining query parameters.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ]
+    query.sort()
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def _header(headers: Optional[Dict[str, str]], name: str) -> Optional[str]:
+    """Case-insensitive header lookup on a plain dictionary."""
+    if not headers:
+        return None
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _build_page(url: str, final_url: str, html: str, headers: Optional[Dict[str, str]] = None,
+                rendered: bool = False) -> CachedPage:
+    """Builds a cache entry fetched now, taking its validators from the response headers."""
+    return CachedPage(
+        url=normalize_url(url),
+        final_url=final_url,
+        html=html,
+        fetched_at=time.time(),
+        etag=_header(headers, "etag"),
+        last_modified=_header(headers, "last-modified"),
+        rendered=rendered,
+    )
+
+
+class PageCache:
+    """
+    On-disk cache of crawled pages keyed by normalized URL.
+
+    Entries younger than `ttl` seconds are served directly. Older entries that carry an
+    ETag or Last-Modified validator are revalidated with a conditional GET; a 304 refreshes
+    the entry and a 200 returns the changed page, anything else means the page must be
+    crawled again. Total size is capped
+    with LRU eviction.
+    """
+    def __init__(self, path: str, max_bytes: int, ttl: float = DEFAULT_PAGE_CACHE_TTL):
+        """
+        Initializes the page cache.
+
+        Args:
+            path (str): The SQLite file path.
+            max_bytes (int): The maximum total size of cached pages.
+            ttl (float): Seconds a cached page is considered fresh.
+        """
+        self.ttl = ttl
+        self._cache = DiskCache(path, max_bytes)
+
+    @property
+    def stats(self):
+        """Hit/miss counters of the underlying disk cache."""
+        return self._cache.stats
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        """
+        Returns the cached page for a URL regardless of freshness.
+
+        Args:
+            url (str): The requested URL.
+
+        Returns:
+            Optional[CachedPage]: The cached page, or None if not cached.
+        """
+        raw_value = await self._cache.aget(normalize_url(url))
+        if raw_value is None:
+            return None
+        try:
+            return CachedPage(**json.loads(raw_value))
+        except Exception as e:
+            logfire.warn("Discarding unreadable page cache entry for {url}: {error}", url=url, error=e)
+            await self._cache.adelete(normalize_url(url))
+            return None
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        """Returns True if the page was fetched less than `ttl` seconds ago."""
+        return time.time() - page.fetched_at < self.ttl
+
+    async def put(self, url: str, final_url: str, html: str, headers: Optional[Dict[str, str]] = None,
+                  rendered: bool = False) -> CachedPage:
+        """
+        Stores a freshly crawled page.
+
+        Args:
+            url (str): The requested URL (the cache key before normalization).
+            final_url (str): The URL after redirects.
+            html (str): The raw HTML.
+            headers (Optional[Dict[str, str]]): Response headers, used for ETag/Last-Modified.
+            rendered (bool): Whether the HTML came from the headless browser.
+
+        Returns:
+            CachedPage: The stored entry.
+        """
+        page = _build_page(url, final_url, html, headers, rendered)
+        await self.store(page)
+        return page
+
+    async def revalidate(self, page: CachedPage, client: Optional[httpx.AsyncClient] = None,
+                         timeout: float = 10.0) -> Optional[CachedPage]:
+        """
+        Revalidates a stale page with a conditional GET.
+
+        A 304 refreshes the stored entry. A 200 carries the changed page in full, so it is
+        returned as a new entry instead of being fetched again; it is not stored, so the
+        caller can validate it first and then keep it with `store`.
+
+        Args:
+            page (CachedPage): The stale cached page.
+            client (Optional[httpx.AsyncClient]): An HTTP client to reuse; a temporary one is used if None.
+            timeout (float): Request timeout in seconds.
+
+        Returns:
+            Optional[CachedPage]: The refreshed entry (304), the changed page as a plain GET
+                                  fetched it (200 with HTML), or None if the page must be fetched again.
+        """
+        if not page.etag and not page.last_modified:
+            return None
+        headers = {}
+        if page.etag:
+            headers["If-None-Match"] = page.etag
+        if page.last_modified:
+            headers["If-Modified-Since"] = page.last_modified
+        try:
+            if client is None:
+                async with httpx.AsyncClient(follow_redirects=True) as temporary_client:
+                    response = await temporary_client.get(page.final_url, headers=headers, timeout=timeout)
+            else:
+                response = await client.get(page.final_url, headers=headers, timeout=timeout)
+        except httpx.HTTPError as e:
+            logfire.debug("Revalidation request failed for {url}: {error}", url=page.final_url, error=e)
+            return None
+
+        if response.status_code == 200 and "html" in response.headers.get("content-type", "html"):
+            logfire.debug("Cached page for {url} changed; using the new body.", url=page.final_url)
+            return _build_page(page.url, str(response.url), response.text, dict(response.headers))
+        if response.status_code != 304:
+            logfire.debug("Cached page for {url} changed (status {status}).", url=page.final_url, status=response.status_code)
+            return None
+
+        page.fetched_at = time.time()
+        page.etag = response.headers.get("etag", page.etag)
+        page.last_modified = response.headers.get("last-modified", page.last_modified)
+        await self.store(page)
+        logfire.debug("Revalidated cached page for {url}.", url=page.final_url)
+        return page
+
+    async def store(self, page: CachedPage) -> None:
+        """Stores a page entry, replacing any entry for the same URL."""
+        await self._cache.aset(page.url, page.model_dump_json())
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """
+    Returns the process-wide page cache, creating it on first use.
+
+    The cache lives in <ASP_CACHE_DIR>/pages.sqlite. Set ASP_PAGE_CACHE=off to disable it,
+    ASP_PAGE_CACHE_TTL to change freshness (seconds) and ASP_PAGE_CACHE_MAX_MB to change its size cap.
+
+    Returns:
+        Optional[PageCache]: The shared page cache, or None when disabled.
+    """
+    global _page_cache
+    if not get_bool_env(PAGE_CACHE_ENABLED_ENV_VAR, True):
+        return None
+    if _page_cache is None:
+        # A TTL of 0 revalidates every cached page before use
+        ttl = get_float_env(PAGE_CACHE_TTL_ENV_VAR, DEFAULT_PAGE_CACHE_TTL) or 0.0
+        max_mb = get_int_env(PAGE_CACHE_MAX_MB_ENV_VAR, DEFAULT_PAGE_CACHE_MAX_MB)
+        path = os.path.join(get_cache_dir(), "pages.sqlite")
+        _page_cache = PageCache(path, max_mb * 1024 * 1024, ttl=ttl)
+        logfire.info("Page cache initialized.", path=path, ttl=ttl, max_mb=max_mb)
+    return _page_cache
@@ -0,0 +1,195 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+import logfire
+from pydantic import BaseModel
+
+from asp.scraper.parser import (
+    CLEAN_HTML_ENGINE_ENV_VAR,
+    DEFAULT_CLEAN_HTML_ENGINE,
+    ParsedPage,
+    looks_js_rendered,
+    looks_paywalled,
+    parse_html,
+    validate_text,
+)
+from asp.utils.env import get_int_env
+from asp.utils.metrics import metrics
+
+# Environment variable names for the parse pool configuration
+PARSE_WORKERS_ENV_VAR = "ASP_PARSE_WORKERS" # 0 parses on the event loop (the original behaviour)
+PARSE_QUEUE_DEPTH_ENV_VAR = "ASP_PARSE_QUEUE_DEPTH"
+PARSE_INLINE_BYTES_ENV_VAR = "ASP_PARSE_INLINE_BYTES"
+
+DEFAULT_PARSE_WORKERS = 0
+# Pages below this size parse faster inline than the round trip to a worker process costs
+DEFAULT_PARSE_INLINE_BYTES = 50_000
+
+_parse_pool: Optional["ParsePool"] = None
+
+CLEAN_SECONDS = metrics.histogram("asp_clean_seconds",
+                                  "Seconds to clean and validate a page, by mode (inline, pool); pool includes queueing")
+
+
+class PageAnalysis(BaseModel):
+    """
+    Everything the fetch tiers need to know about a page, computed in one pass.
+    """
+    page: ParsedPage
+    is_valid: bool
+    reasons: Dict[str, Any]
+    js_rendered: bool
+    paywalled: bool
+
+
+def analyze_page(html: str, engine: Optional[str] = None) -> PageAnalysis:
+    """
+    Cleans and validates raw HTML and runs the JavaScript-shell and paywall checks.
+
+    This is the CPU-heavy part of fetching; it runs either inline or in a pool worker,
+    so it only takes and returns picklable values.
+
+    Args:
+        html (str): The raw HTML.
+        engine (Optional[str]): The cleaning engine; see parse_html.
+
+    Returns:
+        PageAnalysis: The parsed page, the validation result and the heuristics.
+    """
+    page = parse_html(html, engine)
+    is_valid, reasons = validate_text(page.text, page)
+    reasons.pop("cleaned_text", None) # Already in page.text; don't pickle it twice
+    return PageAnalysis(page=page, is_valid=is_valid, reasons=reasons,
+                        js_rendered=looks_js_rendered(html, page.text), paywalled=looks_paywalled(html))
+
+
+def _init_worker() -> None:
+    # Worker processes don't export telemetry; the parent logs each page's outcome
+    logfire.configure(send_to_logfire=False, console=False)
+
+
+class ParsePool:
+    """
+    Runs analyze_page off the event loop in a pool of worker processes.
+
+    At most `queue_depth` pages are submitted at once; further callers wait on the event
+    loop instead of piling HTML into the pool's queue, and a caller cancelled while
+    waiting (e.g. its fetch was no longer needed) never has its page parsed. Pages
+    smaller than `inline_bytes` are parsed inline, and a crashed pool is replaced while
+    the page that hit it is parsed inline. With `workers=0` everything is parsed inline.
+    """
+    def __init__(self, workers: int = DEFAULT_PARSE_WORKERS, queue_depth: Optional[int] = None,
+                 inline_bytes: int = DEFAULT_PARSE_INLINE_BYTES):
+        """
+        Initializes the pool; worker processes start on the first offloaded page.
+
+        Args:
+            workers (int): Worker processes, or 0 to parse inline.
+            queue_depth (Optional[int]): Maximum pages submitted at once. Defaults to twice the workers.
+            inline_bytes (int): Pages smaller than this are parsed inline.
+        """
+        self.workers = max(0, workers)
+        self.queue_depth = max(1, queue_depth or 2 * self.workers)
+        self.inline_bytes = inline_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.offloaded = 0
+        self.inline = 0
+
+    @classmethod
+    def from_env(cls) -> "ParsePool":
+        """
+        Builds the pool from ASP_PARSE_WORKERS, ASP_PARSE_QUEUE_DEPTH and ASP_PARSE_INLINE_BYTES.
+        """
+        workers = get_int_env(PARSE_WORKERS_ENV_VAR, DEFAULT_PARSE_WORKERS, minimum=0)
+        return cls(
+            workers=workers,
+            queue_depth=get_int_env(PARSE_QUEUE_DEPTH_ENV_VAR, 2 * max(1, workers)),
+            inline_bytes=get_int_env(PARSE_INLINE_BYTES_ENV_VAR, DEFAULT_PARSE_INLINE_BYTES, minimum=0),
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # forkserver/spawn children don't inherit the event loop's threads and sockets
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                 initializer=_init_worker)
+            logfire.info("Started HTML parse pool with {workers} workers.", workers=self.workers,
+                         queue_depth=self.queue_depth)
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; make a new one if the pool outlives a loop
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.queue_depth)
+            self._slots_loop = loop
+        return self._slots
+
+    async def analyze(self, html: str) -> PageAnalysis:
+        """
+        Analyzes a page, in a worker process when the pool is enabled and the page is large enough.
+
+        Args:
+            html (str): The raw HTML.
+
+        Returns:
+            PageAnalysis: The analysis.
+        """
+        engine = os.environ.get(CLEAN_HTML_ENGINE_ENV_VAR, DEFAULT_CLEAN_HTML_ENGINE)
+        started = time.perf_counter()
+        if self.workers == 0 or len(html) < self.inline_bytes:
+            self.inline += 1
+            analysis = analyze_page(html, engine)
+            CLEAN_SECONDS.observe(time.perf_counter() - started, mode="inline")
+            return analysis
+
+        async with self._get_slots():
+            executor = self._get_executor()
+            try:
+                analysis = await asyncio.get_running_loop().run_in_executor(executor, analyze_page, html, engine)
+            except BrokenProcessPool as e:
+                logfire.warn("HTML parse pool crashed: {error}. Restarting it and parsing this page inline.", error=e)
+                if self._executor is executor:
+                    self._executor = None
+                    executor.shutdown(wait=False, cancel_futures=True)
+                self.inline += 1
+                return analyze_page(html, engine)
+        self.offloaded += 1
+        CLEAN_SECONDS.observe(time.perf_counter() - started, mode="pool")
+        return analysis
+
+    def close(self) -> None:
+        """Stops the worker processes, dropping pages that have not started parsing."""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns how many pages were parsed inline and in the pool, for logging."""
+        return {"workers": self.workers, "offloaded": self.offloaded, "inline": self.inline}
+
+
+def get_parse_pool() -> ParsePool:
+    """
+    Returns the process-wide parse pool, creating it from the environment on first use.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ParsePool.from_env()
+    return _parse_pool
+
+
+def close_parse_pool() -> None:
+    """
+    Stops the parse pool's worker processes if they were started. Safe to call more than once.
+    """
+    if _parse_pool is not None:
+        _parse_pool.close()
@@ -1,43 +1,426 @@
 import logfire
-from typing import List, Tuple, Dict
-from bs4 import BeautifulSoup
+import os
+from html.entities import html5 as HTML5_ENTITIES
+from html.parser import HTMLParser
+from typing import Callable, List, Optional, Tuple, Dict
+from pydantic import BaseModel
 import re
 
-def clean_html(html: str) -> str:
+from asp.scraper.metadata import PageMetadataCollector
+
+# Environment variable name for selecting the HTML cleaning engine
+CLEAN_HTML_ENGINE_ENV_VAR = "ASP_CLEAN_HTML_ENGINE"
+DEFAULT_CLEAN_HTML_ENGINE = "stream"
+
+# Tags whose whole subtree is dropped, and tags whose text is extracted
+UNWANTED_TAGS = ['script', 'style', 'nav', 'footer', 'header', 'aside', 'form', 'iframe', 'img', 'audio', 'video']
+RELEVANT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li']
+
+# Elements with no closing tag, as treated by BeautifulSoup's html.parser tree builder
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta',
+    'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+    'nextid', 'spacer',
+])
+# Elements whose strings BeautifulSoup stores as special string types that get_text() skips
+EXCLUDED_STRING_CONTAINERS = frozenset(['template', 'rt', 'rp', 'script', 'style'])
+
+class ParsedPage(BaseModel):
     """
-    Cleans HTML content by stripping unwanted tags and extracting relevant content.
+    The result of one cleaning pass: the cleaned text, structural signals about the original
+    DOM (used by validate_text) and the page metadata, all without parsing the HTML again.
+    """
+    text: str
+    html_length: int
+    h1_count: int = 0
+    p_count: int = 0
+    lang: Optional[str] = None
+    title: Optional[str] = None
+    canonical_url: Optional[str] = None
+    published_at: Optional[str] = None
+    author: Optional[str] = None
+
+    @property
+    def text_html_ratio(self) -> float:
+        """Length of the cleaned text relative to the raw HTML."""
+        return len(self.text) / self.html_length if self.html_length else 0.0
+
+def _clean_html_bs4(html: str) -> ParsedPage:
+    """
+    Cleans HTML with a full BeautifulSoup tree.
 
     Args:
         html (str): The raw HTML content.
 
     Returns:
-        str: The cleaned text content.
+        ParsedPage: The text of each outermost relevant element joined in document order,
+                    with the structural signals of the page.
     """
-    logfire.info("Cleaning HTML content.")
+    from bs4 import BeautifulSoup # Only the non-default "bs4" engine needs it; keeps startup light
     soup = BeautifulSoup(html, 'html.parser')
+    html_element = soup.find('html')
+    lang = html_element.get('lang') if html_element else None
+
+    # Collect metadata before scripts are stripped (JSON-LD lives in <script> tags)
+    metadata = PageMetadataCollector()
+    seen_title = False
+    for element in soup.find_all(['meta', 'link', 'title', 'script']):
+        if element.name in ('meta', 'link'):
+            attrs = [(key, " ".join(value) if isinstance(value, list) else value) for key, value in element.attrs.items()]
+            metadata.add_tag(element.name, attrs)
+        elif element.name == 'title':
+            if not seen_title:
+                seen_title = True
+                metadata.add_title(element.get_text())
+        elif (element.get('type') or '').strip().lower() == 'application/ld+json':
+            metadata.add_json_ld(element.get_text())
 
     # Strip unwanted tags
-    unwanted_tags = ['script', 'style', 'nav', 'footer', 'header', 'aside', 'form', 'iframe', 'img', 'audio', 'video']
-    for tag in unwanted_tags:
+    for tag in UNWANTED_TAGS:
         for element in soup.find_all(tag):
             element.decompose()
 
-    # Extract content from relevant tags
-    relevant_tags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li']
+    # Extract content from relevant tags. Nested relevant tags (e.g. <li> inside <ul>) are
+    # skipped because their text is already part of the enclosing element's text.
     text_parts = []
-    for element in soup.find_all(relevant_tags):
+    for element in soup.find_all(RELEVANT_TAGS):
+        if element.find_parent(RELEVANT_TAGS) is not None:
+            continue
         text_parts.append(element.get_text(separator='\n', strip=True))
 
-    cleaned_text = "\n\n".join(text_parts)
-    logfire.info("HTML cleaning completed. Extracted {length} characters.", length=len(cleaned_text))
-    return cleaned_text
+    return ParsedPage(
+        text="\n\n".join(text_parts),
+        html_length=len(html),
+        h1_count=len(soup.find_all('h1')),
+        p_count=len(soup.find_all('p')),
+        lang=lang or None,
+        **metadata.result(),
+    )
+
+class _StreamingCleaner(HTMLParser):
+    """
+    Single-pass, SAX-style equivalent of _clean_html_bs4.
+
+    Mirrors how BeautifulSoup's html.parser builder nests elements (end tags pop back to the
+    most recent open element of the same name, unmatched end tags are ignored, void elements
+    close immediately) without building a tree. Text is collected only for outermost relevant
+    elements that are not inside an unwanted element, and structural signals are counted on
+    the way.
+    """
+    def __init__(self):
+        # Entities are resolved by hand, exactly as BeautifulSoup does
+        super().__init__(convert_charrefs=False)
+        self.text_parts: List[str] = []
+        self._stack: List[str] = []
+        self._open_counts: Dict[str, int] = {}
+        self._unwanted_depth = 0
+        self._excluded_depth = 0
+        self._relevant_depth = 0
+        self._part_strings: Optional[List[str]] = None
+        self._pending_data: List[str] = []
+        self._already_closed_void: List[str] = []
+        self.h1_count = 0
+        self.p_count = 0
+        self.lang: Optional[str] = None
+        self._seen_html_tag = False
+        self.metadata = PageMetadataCollector()
+        self._seen_title = False
+        # Raw text captured for the first <title> or a JSON-LD script, closed when that element pops
+        self._capture: Optional[List[str]] = None
+        self._capture_kind: Optional[str] = None
+        self._capture_depth = 0
+
+    # Text handling: consecutive data events form one string, as in BeautifulSoup
+    def handle_data(self, data: str):
+        self._pending_data.append(data)
+
+    def handle_charref(self, name: str):
+        try:
+            code_point = int(name[1:], 16) if name[:1] in ('x', 'X') else int(name)
+        except ValueError:
+            code_point = None
+        data = None
+        if code_point is not None and code_point < 256:
+            try:
+                data = bytes([code_point]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data and code_point is not None:
+            try:
+                data = chr(code_point)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name: str):
+        character = HTML5_ENTITIES.get(name + ';')
+        self.handle_data(character if character is not None else f"&{name}")
+
+    def _flush_data(self, is_cdata: bool = False):
+        if not self._pending_data:
+            return
+        text = "".join(self._pending_data)
+        self._pending_data = []
+        # CDATA keeps its own string type, so it stays visible even inside excluded containers
+        visible = self._excluded_depth == 0 or is_cdata
+        if self._capture is not None and (visible or self._capture_kind == 'json_ld'):
+            self._capture.append(text)
+        if self._part_strings is not None and self._unwanted_depth == 0 and visible:
+            text = text.strip()
+            if text:
+                self._part_strings.append(text)
+
+    def handle_comment(self, data: str):
+        self._flush_data()
+
+    def handle_decl(self, decl: str):
+        self._flush_data()
+
+    def handle_pi(self, data: str):
+        self._flush_data()
+
+    def unknown_decl(self, data: str):
+        self._flush_data()
+        # CDATA sections are kept as text by get_text()
+        if data.upper().startswith('CDATA['):
+            self.handle_data(data[len('CDATA['):])
+            self._flush_data(is_cdata=True)
+
+    # Element handling, following BeautifulSoupHTMLParser's start/end tag bookkeeping
+    def handle_starttag(self, tag: str, attrs, handle_empty_element: bool = True):
+        self._flush_data()
+        if tag == 'html' and not self._seen_html_tag:
+            self._seen_html_tag = True
+            self.lang = dict(attrs).get('lang') or None
+        if tag in ('meta', 'link'):
+            self.metadata.add_tag(tag, attrs)
+        # Structural signals only count elements that survive unwanted-tag removal
+        if self._unwanted_depth == 0:
+            if tag == 'h1':
+                self.h1_count += 1
+            elif tag == 'p':
+                self.p_count += 1
+        self._stack.append(tag)
+        self._open_counts[tag] = self._open_counts.get(tag, 0) + 1
+        if tag in UNWANTED_TAGS:
+            self._unwanted_depth += 1
+        if tag in EXCLUDED_STRING_CONTAINERS:
+            self._excluded_depth += 1
+        if tag in RELEVANT_TAGS:
+            if self._relevant_depth == 0 and self._unwanted_depth == 0:
+                self._part_strings = []
+            self._relevant_depth += 1
+        if self._capture is None:
+            if tag == 'title' and not self._seen_title:
+                self._seen_title = True
+                self._start_capture('title')
+            elif tag == 'script' and (dict(attrs).get('type') or '').strip().lower() == 'application/ld+json':
+                self._start_capture('json_ld')
+        if tag in VOID_TAGS and handle_empty_element:
+            # Void elements close immediately; a later explicit end tag for them is ignored
+            self.handle_endtag(tag, check_already_closed=False)
+            self._already_closed_void.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_endtag(self, tag: str, check_already_closed: bool = True):
+        if check_already_closed and tag in self._already_closed_void:
+            self._already_closed_void.remove(tag)
+            return
+        self._flush_data()
+        if not self._open_counts.get(tag):
+            return
+        while self._stack:
+            popped = self._pop()
+            if popped == tag:
+                break
+
+    def _start_capture(self, kind: str):
+        self._capture = []
+        self._capture_kind = kind
+        self._capture_depth = len(self._stack)
+
+    def _pop(self) -> str:
+        self._flush_data()
+        if self._capture is not None and len(self._stack) == self._capture_depth:
+            captured = "".join(self._capture)
+            if self._capture_kind == 'title':
+                self.metadata.add_title(captured)
+            else:
+                self.metadata.add_json_ld(captured)
+            self._capture = None
+        tag = self._stack.pop()
+        self._open_counts[tag] -= 1
+        if tag in UNWANTED_TAGS:
+            self._unwanted_depth -= 1
+        if tag in EXCLUDED_STRING_CONTAINERS:
+            self._excluded_depth -= 1
+        if tag in RELEVANT_TAGS:
+            self._relevant_depth -= 1
+            if self._relevant_depth == 0 and self._part_strings is not None:
+                self.text_parts.append("\n".join(self._part_strings))
+                self._part_strings = None
+        return tag
+
+    def close(self):
+        super().close()
+        self._flush_data()
+        # Elements still open at the end of the document are closed implicitly
+        while self._stack:
+            self._pop()
+
+def _clean_html_stream(html: str) -> ParsedPage:
+    """
+    Cleans HTML in a single streaming pass, without building a tree.
+
+    Args:
+        html (str): The raw HTML content.
+
+    Returns:
+        ParsedPage: The text of each outermost relevant element joined in document order,
+                    with the structural signals of the page.
+    """
+    cleaner = _StreamingCleaner()
+    cleaner.feed(html)
+    cleaner.close()
+    return ParsedPage(
+        text="\n\n".join(cleaner.text_parts),
+        html_length=len(html),
+        h1_count=cleaner.h1_count,
+        p_count=cleaner.p_count,
+        lang=cleaner.lang,
+        **cleaner.metadata.result(),
+    )
+
+# Available HTML cleaning engines; both produce identical output
+CLEAN_HTML_ENGINES: Dict[str, Callable[[str], ParsedPage]] = {
+    "bs4": _clean_html_bs4,
+    "stream": _clean_html_stream,
+}
+
+def parse_html(html: str, engine: Optional[str] = None) -> ParsedPage:
+    """
+    Cleans HTML content and collects structural signals in the same pass.
+
+    Args:
+        html (str): The raw HTML content.
+        engine (Optional[str]): "stream" (single pass, default) or "bs4" (BeautifulSoup tree).
+                                Defaults to the ASP_CLEAN_HTML_ENGINE environment variable.
+
+    Returns:
+        ParsedPage: The cleaned text and the page's structural signals.
+    """
+    engine = engine or os.environ.get(CLEAN_HTML_ENGINE_ENV_VAR, DEFAULT_CLEAN_HTML_ENGINE)
+    parse = CLEAN_HTML_ENGINES.get(engine)
+    if parse is None:
+        raise ValueError(f"Unknown HTML cleaning engine: {engine}. Expected one of {sorted(CLEAN_HTML_ENGINES)}.")
+
+    logfire.info("Cleaning HTML content.", engine=engine)
+    page = parse(html)
+    logfire.info("HTML cleaning completed. Extracted {length} characters.", length=len(page.text),
+                 h1_count=page.h1_count, p_count=page.p_count, lang=page.lang)
+    return page
+
+def clean_html(html: str, engine: Optional[str] = None) -> str:
+    """
+    Cleans HTML content by stripping unwanted tags and extracting relevant content.
+
+    Args:
+        html (str): The raw HTML content.
+        engine (Optional[str]): The cleaning engine; see parse_html.
+
+    Returns:
+        str: The cleaned text content.
+    """
+    return parse_html(html, engine).text
 
-def validate_text(text: str) -> Tuple[bool, Dict]:
+# Markers of client-side rendered pages whose static HTML is only an application shell
+JS_APP_ROOT_PATTERN = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>', re.IGNORECASE)
+JS_REQUIRED_PATTERN = re.compile(
+    r'<noscript[^>]*>[^<]*(?:enable|requires?|turn on)[^<]*javascript', re.IGNORECASE)
+
+def looks_js_rendered(html: str, text: str) -> bool:
+    """
+    Heuristically detects pages whose content is rendered by JavaScript.
+
+    Used by the static fetch tier to decide whether a plain HTTP response can be trusted
+    or the page needs the headless browser.
+
+    Args:
+        html (str): The raw HTML as served, without JavaScript execution.
+        text (str): The text extracted from it by clean_html.
+
+    Returns:
+        bool: True if the static HTML looks like an application shell.
+    """
+    if JS_APP_ROOT_PATTERN.search(html):
+        return True
+    # Many server-rendered sites carry a "please enable JavaScript" banner; only trust it when text is thin
+    if JS_REQUIRED_PATTERN.search(html) and len(text) < 2000:
+        return True
+    # Lots of markup but almost no extractable text usually means the content arrives via scripts
+    return len(html) > 50_000 and len(text) < 0.01 * len(html)
+
+# Markers of metered or subscriber-only content: schema.org's isAccessibleForFree flag and
+# the class names / prompts of common paywall vendors
+PAYWALL_PATTERN = re.compile(
+    r'"isAccessibleForFree"\s*:\s*"?false'
+    r'|class=["\'][^"\']*\b(?:paywall|piano-offer|tp-modal|meteredContent|subscriber-only)\b'
+    r'|(?:subscribe|sign in|log in) to (?:continue|keep) reading',
+    re.IGNORECASE)
+
+def looks_paywalled(html: str) -> bool:
+    """
+    Heuristically detects pages whose article body is behind a paywall.
+
+    Args:
+        html (str): The raw HTML.
+
+    Returns:
+        bool: True if the page carries a paywall marker.
+    """
+    return PAYWALL_PATTERN.search(html) is not None
+
+# Validation thresholds
+MIN_TEXT_LENGTH = 500
+MIN_H1_COUNT = 1
+MIN_P_COUNT = 3
+# The original plan asked for a 0.7 text/HTML ratio, which real pages (scripts, styles and
+# markup included) never reach; articles typically sit between 0.01 and 0.3, while shells,
+# link farms and consent walls fall well below 0.005.
+MIN_TEXT_HTML_RATIO = 0.005
+# Fraction of words that must be common English function words when no lang attribute is set
+MIN_ENGLISH_STOPWORD_RATIO = 0.12
+LANGUAGE_SAMPLE_WORDS = 2000
+
+ENGLISH_STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could do for from had has
+have he her his how i if in into is it its just more most my no not of on one or our out over she
+so some than that the their them then there these they this to up was we were what when which who
+will with would you your
+""".split())
+WORD_PATTERN = re.compile(r"[a-z']+")
+
+def _english_stopword_ratio(text: str) -> float:
+    """Returns the fraction of (sampled) words in `text` that are common English function words."""
+    words = WORD_PATTERN.findall(text[:LANGUAGE_SAMPLE_WORDS * 8].lower())[:LANGUAGE_SAMPLE_WORDS]
+    if not words:
+        return 0.0
+    return sum(1 for word in words if word in ENGLISH_STOPWORDS) / len(words)
+
+def validate_text(text: str, page: Optional[ParsedPage] = None) -> Tuple[bool, Dict]:
     """
     Validates the cleaned text content based on defined criteria.
 
+    Structural checks (heading/paragraph counts, text/HTML ratio, declared language) use the
+    signals collected by parse_html during cleaning; they are skipped when `page` is None.
+
     Args:
         text (str): The cleaned text content.
+        page (Optional[ParsedPage]): The parse result the text came from.
 
     Returns:
         Tuple[bool, Dict]: A tuple containing a boolean indicating validity and a dictionary of validation reasons/results.
@@ -47,32 +430,43 @@ def validate_text(text: str) -> Tuple[bool, Dict]:
     is_valid = True
 
     # Check length >= 500 chars
-    if len(text) < 500:
+    if len(text) < MIN_TEXT_LENGTH:
         is_valid = False
-        reasons["length"] = f"Text length ({len(text)}) is less than 500 characters."
+        reasons["length"] = f"Text length ({len(text)}) is less than {MIN_TEXT_LENGTH} characters."
 
-    # Ensure >=1 <h1> or >=3 <p> tags (This check requires access to the original HTML structure,
-    # which is not available in the cleaned text. A better approach is to check for
-    # presence of significant text blocks or headings in the cleaned text.)
-    # Placeholder check based on text content
-    if not re.search(r'#+\s', text) and len(re.findall(r'\n\n', text)) < 2: # Basic check for headings or paragraphs
-         # This is a simplified check. A more robust check would involve analyzing the structure before cleaning.
-         pass # Skipping this check for now as it's difficult with just cleaned text
+    if page is not None:
+        # Ensure >=1 <h1> or >=3 <p> tags
+        if page.h1_count < MIN_H1_COUNT and page.p_count < MIN_P_COUNT:
+            is_valid = False
+            reasons["structure"] = (f"Page has {page.h1_count} <h1> and {page.p_count} <p> tags "
+                                    f"(need >= {MIN_H1_COUNT} <h1> or >= {MIN_P_COUNT} <p>).")
 
-    # Verify text/HTML ratio >= 0.7 (This check requires original HTML and cleaned text length)
-    # Skipping this check for now as original HTML is not passed to this function
+        # Verify the text/HTML ratio
+        if page.text_html_ratio < MIN_TEXT_HTML_RATIO:
+            is_valid = False
+            reasons["text_html_ratio"] = (f"Text/HTML ratio ({page.text_html_ratio:.4f}) is less than "
+                                          f"{MIN_TEXT_HTML_RATIO}.")
 
-    # Confirm language is English (Requires a language detection library)
-    # Skipping this check for now as it requires an external dependency
+    # Confirm language is English: trust the declared lang attribute, otherwise sample the text
+    declared_lang = page.lang.strip().lower() if page is not None and page.lang else None
+    if declared_lang:
+        if not declared_lang.startswith("en"):
+            is_valid = False
+            reasons["language"] = f"Page language is declared as '{page.lang}', not English."
+    elif text:
+        stopword_ratio = _english_stopword_ratio(text)
+        if stopword_ratio < MIN_ENGLISH_STOPWORD_RATIO:
+            is_valid = False
+            reasons["language"] = (f"Text does not look English (stopword ratio {stopword_ratio:.2f} "
+                                   f"< {MIN_ENGLISH_STOPWORD_RATIO}).")
 
     if not is_valid:
         logfire.warn("Text validation failed. Reasons: {reasons}", reasons=reasons)
     else:
         logfire.info("Text validation successful.")
 
-    # Returning cleaned text and a placeholder title for now.
-    # The actual title extraction should happen before cleaning or during scraping.
+    # Return the cleaned text and the title extracted during cleaning
     reasons["cleaned_text"] = text
-    reasons["title"] = "Extracted Article Title Placeholder" # Placeholder
+    reasons["title"] = page.title if page is not None and page.title else "Untitled article"
 
-    return is_valid, reasons
\ No newline at end of file
+    return is_valid, reasons
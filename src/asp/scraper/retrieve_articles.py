@@ -1,8 +1,21 @@
+import asyncio
+import time
+from contextlib import nullcontext
+import httpx
 import logfire
-from typing import List, Dict, Tuple
+from typing import AsyncIterator, List, Dict, Tuple, Optional, Set
+from urllib.parse import urljoin
 from pydantic import BaseModel
-from crawl4ai import AsyncWebCrawler
-from asp.scraper.parser import clean_html, validate_text # Import the functions
+from asp.scraper.browser_pool import BrowserPool, get_browser_pool
+from asp.scraper.parse_pool import PageAnalysis, get_parse_pool
+from asp.scraper.page_cache import get_page_cache, normalize_url
+from asp.scraper.dedup import NearDuplicateFilter, DEFAULT_SIMILARITY_THRESHOLD
+from asp.scraper.domain_stats import get_domain_stats, OUTCOME_VALID, OUTCOME_INVALID, OUTCOME_PAYWALLED, OUTCOME_FAILED
+from asp.utils.env import get_bool_env
+from asp.utils.http_client import get_http_client
+from asp.utils.metrics import metrics
+from asp.utils.rate_limit import get_rate_limiter
+from asp.utils.retry import RetryPolicy, RetryableError, RETRYABLE_STATUS_CODES, parse_retry_after, retry_async
 
 # Define Article structure
 class Article(BaseModel):
@@ -12,66 +25,427 @@ class Article(BaseModel):
     title: str
     url: str
     content: str
+    canonical_url: Optional[str] = None
+    published_at: Optional[str] = None
+    author: Optional[str] = None
 
-async def fetch_valid_articles(urls: List[str], max_count: int = 3) -> List[Article]:
+    @property
+    def identity_urls(self) -> Set[str]:
+        """Normalized final and canonical URLs; articles sharing any of them are the same article."""
+        return {normalize_url(url) for url in (self.url, self.canonical_url) if url}
+
+# Environment variable name to turn the static (plain HTTP) fetch tier on or off
+STATIC_FETCH_ENV_VAR = "ASP_STATIC_FETCH"
+STATIC_FETCH_TIMEOUT = 15.0 # Seconds for the plain HTTP attempt before escalating to the browser
+
+# One retry for rate-limited or crashed browser crawls; the per-URL timeout bounds the total
+CRAWL_RETRY_POLICY = RetryPolicy(max_attempts=2, base_delay=2.0, max_delay=10.0)
+
+class FetchTierStats:
+    """
+    Counts how each URL was served: page cache, static HTTP fetch or headless browser,
+    and how many fetch attempts it took per article kept (the measure URL ranking improves).
+    """
+    def __init__(self):
+        self.attempts = 0
+        self.cache_hits = 0
+        self.static_attempts = 0
+        self.static_hits = 0
+        self.browser_fetches = 0
+        self.browser_failures = 0
+        self.valid_articles = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Returns the counters and per-tier hit rates as a plain dictionary for logging."""
+        return {
+            "attempts": self.attempts,
+            "cache_hits": self.cache_hits,
+            "static_attempts": self.static_attempts,
+            "static_hits": self.static_hits,
+            "static_hit_rate": round(self.static_hits / self.static_attempts, 3) if self.static_attempts else 0.0,
+            "browser_fetches": self.browser_fetches,
+            "browser_failures": self.browser_failures,
+            "browser_share": round(self.browser_fetches / self.attempts, 3) if self.attempts else 0.0,
+            "valid_articles": self.valid_articles,
+            "attempts_per_valid_article": round(self.attempts / self.valid_articles, 2) if self.valid_articles else None,
+        }
+
+# Process-wide tier counters, logged at the end of every fetch loop and run
+fetch_tier_stats = FetchTierStats()
+
+PAGES_BY_TIER = metrics.counter("asp_pages_fetched_total", "Pages served by each fetch tier (cache, static, browser)")
+CRAWL_FAILURES = metrics.counter("asp_crawl_failures_total", "URLs that could not be fetched, by reason")
+
+async def _build_article(html_content: str, fetched_url: str, quiet: bool = False) -> Tuple[Optional[Article], PageAnalysis]:
+    """
+    Cleans and validates raw HTML, in the parse pool when one is configured.
+
+    Args:
+        html_content (str): The raw HTML.
+        fetched_url (str): The final URL of the page.
+        quiet (bool): Log rejections at debug level (used by the static tier, which escalates instead).
+
+    Returns:
+        Tuple[Optional[Article], PageAnalysis]: The Article (or None if invalid) and the page analysis.
+    """
+    # Clean the HTML content and validate it against the page's structure, off the event loop if configured
+    analysis = await get_parse_pool().analyze(html_content)
+    page = analysis.page
+
+    if analysis.is_valid:
+        # Assuming validate_text returns cleaned text and title in validation_results
+        article_title = analysis.reasons.get('title', 'No Title') # Get title from validation results
+        # Canonical links may be relative to the page URL
+        canonical_url = urljoin(fetched_url, page.canonical_url) if page.canonical_url else None
+        article = Article(title=article_title, url=fetched_url, content=page.text,
+                          canonical_url=canonical_url, published_at=page.published_at, author=page.author)
+        return article, analysis
+
+    log = logfire.debug if quiet else logfire.info
+    log("Article from URL {url} is invalid. Reasons: {reasons}", url=fetched_url, reasons=analysis.reasons)
+    return None, analysis
+
+async def _fetch_static(url: str) -> Optional[Tuple[str, str, Dict[str, str]]]:
+    """
+    Fetches a page with a plain HTTP GET on the shared pooled client.
+
+    Args:
+        url (str): The URL to fetch.
+
+    Returns:
+        Optional[Tuple[str, str, Dict[str, str]]]: (html, final_url, headers), or None if the
+                                                   request failed or did not return HTML.
+    """
+    try:
+        response = await get_http_client().get(url, timeout=STATIC_FETCH_TIMEOUT)
+    except httpx.HTTPError as e:
+        logfire.debug("Static fetch failed for URL {url}: {error}", url=url, error=e)
+        return None
+    if response.status_code != 200 or "html" not in response.headers.get("content-type", "html"):
+        logfire.debug("Static fetch for URL {url} returned status {status} ({content_type}).", url=url,
+                      status=response.status_code, content_type=response.headers.get("content-type"))
+        return None
+    return response.text, str(response.url), dict(response.headers)
+
+async def _crawl_page(crawler: BrowserPool, url: str):
+    """
+    Crawls a URL with the browser, raising RetryableError for rate-limited or transient
+    server responses so the caller's retry policy can back off and try again.
+    """
+    await get_rate_limiter().acquire_domain(url)
+    result = await crawler.arun(url=url)
+    status_code = getattr(result, "status_code", None)
+    if not result.success and status_code in RETRYABLE_STATUS_CODES:
+        raise RetryableError(f"Crawl returned status {status_code}: {result.error_message}", status_code=status_code,
+                             retry_after=parse_retry_after(getattr(result, "response_headers", None)))
+    return result
+
+async def _fetch_article_tiered(crawler: BrowserPool, url: str) -> Tuple[Optional[Article], Optional[str]]:
+    """
+    Fetches a URL through the cheapest tier that yields a valid article.
+
+    1. Page cache: fresh entries are used directly, stale ones are revalidated. A cached page
+       that no longer validates is escalated to the browser tier unless the browser fetched it.
+       A page that changed comes back in full from the revalidation and goes through the
+       static tier's checks without a second GET.
+    2. Static: a plain GET on the pooled HTTP client, accepted only if the page validates
+       and does not look JavaScript-rendered.
+    3. Browser: crawl4ai's headless browser, for everything else.
+
+    Args:
+        crawler (BrowserPool): The shared browser pool used for the browser tier.
+        url (str): The URL to fetch.
+
+    Returns:
+        Tuple[Optional[Article], Optional[str]]: The validated Article (or None if the page failed
+                                                 or was invalid) and the fetch outcome for the domain
+                                                 stats (None when served from the cache).
+    """
+    fetch_tier_stats.attempts += 1
+    page_cache = get_page_cache()
+    static_fetch = get_bool_env(STATIC_FETCH_ENV_VAR, True)
+    changed_page = None
+    if page_cache:
+        cached_page = await page_cache.get(url)
+        if cached_page and not page_cache.is_fresh(cached_page):
+            # Revalidation is a request to the site, so it counts against the domain's rate
+            await get_rate_limiter().acquire_domain(url)
+            revalidated = await page_cache.revalidate(cached_page, client=get_http_client())
+            if revalidated is not None and revalidated is not cached_page:
+                # The site sent the changed page in full; it is checked like a static fetch below
+                changed_page, cached_page = revalidated, None
+            else:
+                cached_page = revalidated
+        if cached_page:
+            logfire.info("Using cached page for URL: {url}", url=url)
+            fetch_tier_stats.cache_hits += 1
+            PAGES_BY_TIER.inc(tier="cache")
+            article, _ = await _build_article(cached_page.html, cached_page.final_url)
+            if article or cached_page.rendered:
+                # A page the browser already rendered would fail validation the same way again
+                return article, None
+            logfire.debug("Cached page for URL {url} failed validation. Escalating to the browser crawler.", url=url)
+            # The plain GET already produced this HTML, so go straight to the browser
+            static_fetch = False
+
+    if static_fetch or changed_page:
+        fetch_tier_stats.static_attempts += 1
+        if changed_page:
+            # The conditional GET was the plain GET, so the page is not fetched again
+            static_page = changed_page.html, changed_page.final_url, None
+        else:
+            await get_rate_limiter().acquire_domain(url)
+            static_page = await _fetch_static(url)
+        if static_page:
+            html_content, fetched_url, headers = static_page
+            article, analysis = await _build_article(html_content, fetched_url, quiet=True)
+            if article and not analysis.js_rendered:
+                fetch_tier_stats.static_hits += 1
+                PAGES_BY_TIER.inc(tier="static")
+                logfire.info("Served URL {url} from the static fetch tier.", url=url)
+                # Only accepted static pages are cached; one that stops validating is escalated on its next hit
+                if changed_page:
+                    await page_cache.store(changed_page)
+                elif page_cache:
+                    await page_cache.put(url, fetched_url, html_content, headers)
+                return article, OUTCOME_VALID
+        logfire.debug("Escalating URL {url} to the browser crawler.", url=url)
+
+    # Fetch HTML using crawl4ai
+    fetch_tier_stats.browser_fetches += 1
+    try:
+        result = await retry_async(_crawl_page, crawler, url, policy=CRAWL_RETRY_POLICY)
+    except RetryableError as e:
+        fetch_tier_stats.browser_failures += 1
+        CRAWL_FAILURES.inc(reason="browser_error")
+        logfire.warn("Crawl failed for URL {url} after retries. Error: {error}", url=url, error=e)
+        return None, OUTCOME_FAILED
+    html_content = result.html # Access raw HTML from the result object
+    fetched_url = result.url # Access the final URL from the result object
+
+    if not result.success:
+        fetch_tier_stats.browser_failures += 1
+        CRAWL_FAILURES.inc(reason="browser_failed")
+        logfire.warn("Crawl failed for URL {url}. Error: {error}", url=url, error=result.error_message)
+        return None, OUTCOME_FAILED
+
+    if not html_content:
+        fetch_tier_stats.browser_failures += 1
+        CRAWL_FAILURES.inc(reason="empty_page")
+        logfire.warn("No HTML content fetched for URL: {url}", url=url)
+        return None, OUTCOME_FAILED
+
+    PAGES_BY_TIER.inc(tier="browser")
+    # Every successful browser crawl is cached, including invalid pages, so retries skip them
+    if page_cache:
+        await page_cache.put(url, fetched_url, html_content, getattr(result, "response_headers", None), rendered=True)
+
+    article, analysis = await _build_article(html_content, fetched_url)
+    if article:
+        return article, OUTCOME_VALID
+    return None, OUTCOME_PAYWALLED if analysis.paywalled else OUTCOME_INVALID
+
+async def _fetch_article(crawler: BrowserPool, url: str, index: int, total: int,
+                         url_timeout: Optional[float] = None,
+                         semaphore: Optional[asyncio.Semaphore] = None) -> Optional[Article]:
+    """
+    Fetches, cleans and validates a single URL, recording the outcome and latency in the
+    per-domain stats used to rank future search results.
+
+    Args:
+        crawler (BrowserPool): The shared browser pool used to fetch the page.
+        url (str): The URL to fetch.
+        index (int): The zero-based rank of the URL, used for logging.
+        total (int): The total number of candidate URLs, used for logging.
+        url_timeout (Optional[float]): Maximum seconds to wait for all tiers, or None for no limit.
+        semaphore (Optional[asyncio.Semaphore]): A crawl slot held only while this URL is fetched.
+
+    Returns:
+        Optional[Article]: The validated Article, or None if the page failed or was invalid.
+    """
+    # Waiting for a slot does not count against the URL's timeout or its domain latency
+    async with semaphore or nullcontext():
+        logfire.info("Attempting to fetch article from URL {index}/{total}: {url}",
+                     index=index + 1, total=total, url=url)
+        started = time.monotonic()
+        outcome = None
+        try:
+            with logfire.span("Fetching URL {index}/{total}: {url}", index=index + 1, total=total, url=url):
+                article, outcome = await asyncio.wait_for(_fetch_article_tiered(crawler, url), timeout=url_timeout)
+            if article:
+                logfire.info("Successfully fetched and validated article from URL: {url}", url=article.url)
+            return article
+
+        except asyncio.TimeoutError:
+            logfire.warn("Timed out after {timeout}s fetching URL: {url}", timeout=url_timeout, url=url)
+            CRAWL_FAILURES.inc(reason="timeout")
+            outcome = OUTCOME_FAILED
+            return None
+        except Exception as e:
+            logfire.error("Error fetching or processing article from URL {url}: {error}",
+                          url=url, error=e, exc_info=True)
+            CRAWL_FAILURES.inc(reason="error")
+            outcome = OUTCOME_FAILED
+            return None
+        finally:
+            # Cancelled fetches (enough articles already found) say nothing about the domain
+            domain_stats = get_domain_stats()
+            if outcome and domain_stats:
+                await domain_stats.record(url, outcome, time.monotonic() - started)
+
+async def fetch_valid_articles(urls: List[str], max_count: int = 3, concurrency: int = 1,
+                               url_timeout: Optional[float] = None,
+                               total_timeout: Optional[float] = None,
+                               near_duplicate_threshold: Optional[float] = DEFAULT_SIMILARITY_THRESHOLD,
+                               semaphore: Optional[asyncio.Semaphore] = None) -> List[Article]:
     """
     Fetches and validates articles from a list of URLs.
 
+    Collects everything iter_valid_articles yields; see it for the fetch behaviour.
+
     Args:
-        urls (List[str]): A list of URLs to fetch articles from.
+        urls (List[str]): A list of URLs to fetch articles from, best-ranked first.
         max_count (int): The maximum number of valid articles to fetch.
+        concurrency (int): The maximum number of crawls in flight at once.
+        url_timeout (Optional[float]): Maximum seconds for a single URL, or None for no limit.
+        total_timeout (Optional[float]): Maximum seconds for the whole fetch, or None for no limit.
+        near_duplicate_threshold (Optional[float]): Estimated content similarity at which an article
+                                                    counts as a duplicate, or None to disable the check.
+        semaphore (Optional[asyncio.Semaphore]): Caps crawls in flight across callers; a slot is
+                                                  held per URL fetch, never while an article waits
+                                                  to be consumed.
 
     Returns:
-        List[Article]: A list of valid Article objects.
-    """
-    logfire.info("Starting article fetching loop.", max_count=max_count)
-    valid_articles: List[Article] = []
-    async with AsyncWebCrawler() as crawler:
-        for i, url in enumerate(urls):
-            if len(valid_articles) >= max_count:
-                logfire.info("Reached maximum number of valid articles ({max_count}). Stopping fetch loop.", max_count=max_count)
-                break
+        List[Article]: A list of valid Article objects, in rank order.
+    """
+    return [article async for article in iter_valid_articles(
+        urls, max_count=max_count, concurrency=concurrency, url_timeout=url_timeout,
+        total_timeout=total_timeout, near_duplicate_threshold=near_duplicate_threshold, semaphore=semaphore)]
+
+async def iter_valid_articles(urls: List[str], max_count: int = 3, concurrency: int = 1,
+                              url_timeout: Optional[float] = None,
+                              total_timeout: Optional[float] = None,
+                              near_duplicate_threshold: Optional[float] = DEFAULT_SIMILARITY_THRESHOLD,
+                              semaphore: Optional[asyncio.Semaphore] = None) -> AsyncIterator[Article]:
+    """
+    Fetches and validates articles from a list of URLs, yielding each one as soon as it is kept.
+
+    Up to `concurrency` URLs are crawled at once, taken from the ranked list in order.
+    Finished results are committed strictly in rank order, so the articles yielded are
+    always the highest-ranked valid ones. Articles whose final or canonical URL matches an
+    already kept article, or whose content is a near-duplicate of one (mirrors, syndicated
+    copies), are skipped, and the next ranked URL takes their place. As soon as
+    `max_count` articles are committed, the remaining in-flight crawls are cancelled. With
+    `concurrency=1` this is the original one-URL-at-a-time loop.
+
+    Crawls already in flight keep running while the consumer handles a yielded article,
+    but new URLs are only started when the consumer asks for the next one, so a slow
+    consumer holds back the crawler. Closing the generator early cancels the open crawls.
+
+    Args:
+        urls (List[str]): A list of URLs to fetch articles from, best-ranked first.
+        max_count (int): The maximum number of valid articles to fetch.
+        concurrency (int): The maximum number of crawls in flight at once.
+        url_timeout (Optional[float]): Maximum seconds for a single URL, or None for no limit.
+        total_timeout (Optional[float]): Maximum seconds for the whole fetch, or None for no limit.
+        near_duplicate_threshold (Optional[float]): Estimated content similarity at which an article
+                                                    counts as a duplicate, or None to disable the check.
+        semaphore (Optional[asyncio.Semaphore]): Caps crawls in flight across callers; a slot is
+                                                  held per URL fetch, never while an article waits
+                                                  to be consumed.
+
+    Yields:
+        Article: Each valid Article, in rank order.
+    """
+    logfire.info("Starting article fetching loop.", max_count=max_count, concurrency=concurrency,
+                 url_timeout=url_timeout, total_timeout=total_timeout)
+    kept = 0
+    seen_urls: Set[str] = set()
+    near_duplicates = NearDuplicateFilter(near_duplicate_threshold) if near_duplicate_threshold else None
+    concurrency = max(1, concurrency)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + total_timeout if total_timeout else None
 
-            logfire.info("Attempting to fetch article from URL {index}/{total}: {url}",
-                         index=i + 1, total=len(urls), url=url)
-            try:
-                # Fetch HTML using crawl4ai
-                result = await crawler.arun(url=url)
-                html_content = result.html # Access raw HTML from the result object
-                fetched_url = result.url # Access the final URL from the result object
+    # Results waiting to be committed, keyed by rank; None marks a failed/invalid URL
+    finished: Dict[int, Optional[Article]] = {}
+    in_flight: Dict[asyncio.Task, int] = {}
+    next_to_start = 0
+    next_to_commit = 0
 
-                if not result.success:
-                    logfire.warn("Crawl failed for URL {url}. Error: {error}", url=url, error=result.error_message)
-                    continue
+    def commit(article: Optional[Article]) -> bool:
+        """Keeps a valid article unless it duplicates (by URL or by content) one already kept."""
+        if article is None:
+            return False
+        if article.identity_urls & seen_urls:
+            logfire.info("Skipping duplicate article {url} (canonical: {canonical_url}).",
+                         url=article.url, canonical_url=article.canonical_url)
+            return False
+        if near_duplicates:
+            match = near_duplicates.check_and_add(article.url, article.content)
+            if match:
+                logfire.info("Skipping near-duplicate article {url} of {original_url} (similarity {similarity:.2f}).",
+                             url=article.url, original_url=match[0], similarity=match[1])
+                return False
+        seen_urls.update(article.identity_urls)
+        fetch_tier_stats.valid_articles += 1
+        return True
 
-                if not html_content:
-                    logfire.warn("No HTML content fetched for URL: {url}", url=url)
-                    continue
+    # Browsers are shared by every topic and stay warm between fetch loops (see asp.scraper.browser_pool)
+    crawler = get_browser_pool()
+    try:
+        while kept < max_count:
+            # Only speculate further down the list while the pending results can't already fill the quota
+            pending_valid = sum(1 for article in finished.values() if article is not None)
+            while (next_to_start < len(urls) and len(in_flight) < concurrency
+                   and kept + pending_valid < max_count):
+                task = asyncio.create_task(
+                    _fetch_article(crawler, urls[next_to_start], next_to_start, len(urls), url_timeout, semaphore))
+                in_flight[task] = next_to_start
+                next_to_start += 1
 
-                # Clean the HTML content
-                cleaned_text = clean_html(html_content)
+            if not in_flight:
+                break
+
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                logfire.warn("Total fetch deadline of {total_timeout}s reached. Stopping fetch loop.",
+                             total_timeout=total_timeout)
+                # Unfinished URLs are given up on; keep the best-ranked results that did finish
+                for index in sorted(finished):
+                    if kept >= max_count:
+                        break
+                    article = finished[index]
+                    if commit(article):
+                        kept += 1
+                        yield article
+                break
 
-                # Validate the cleaned text
-                is_valid, validation_results = validate_text(cleaned_text)
+            done, _ = await asyncio.wait(in_flight, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                finished[in_flight.pop(task)] = task.result()
 
-                if is_valid:
-                    # Assuming validate_text returns cleaned text and title in validation_results
-                    article_title = validation_results.get('title', 'No Title') # Get title from validation results
-                    valid_articles.append(Article(title=article_title, url=fetched_url, content=cleaned_text))
-                    logfire.info("Successfully fetched and validated article from URL: {url}", url=fetched_url)
-                else:
-                    logfire.info("Article from URL {url} is invalid. Reasons: {reasons}",
-                                 url=fetched_url, reasons=validation_results)
+            # Commit finished results in rank order, handing each kept article on straight away
+            while next_to_commit in finished and kept < max_count:
+                article = finished.pop(next_to_commit)
+                next_to_commit += 1
+                if commit(article):
+                    kept += 1
+                    yield article
 
-            except Exception as e:
-                logfire.error("Error fetching or processing article from URL {url}: {error}",
-                              url=url, error=e, exc_info=True)
+        if kept >= max_count:
+            logfire.info("Reached maximum number of valid articles ({max_count}). Stopping fetch loop.", max_count=max_count)
+    finally:
+        # Cancel crawls that are no longer needed (or were interrupted by the deadline or the consumer)
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            logfire.info("Cancelling {count} in-flight crawls.", count=len(in_flight))
+            await asyncio.gather(*in_flight, return_exceptions=True)
 
-    logfire.info("Finished article fetching loop. Total valid articles fetched: {count}", count=len(valid_articles))
+    logfire.info("Finished article fetching loop. Total valid articles fetched: {count}", count=kept,
+                 tier_stats=fetch_tier_stats.as_dict())
 
     # Log warning if successful count < max_count
-    if len(valid_articles) < max_count:
+    if kept < max_count:
         logfire.warn("Fewer than requested valid articles fetched. Fetched {fetched_count} out of {max_count}.",
-                     fetched_count=len(valid_articles), max_count=max_count)
-
-    return valid_articles
\ No newline at end of file
+                     fetched_count=kept, max_count=max_count)
@@ -1,18 +1,38 @@
+import asyncio
 import os
 import httpx
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import logfire
 
+from asp.scraper.domain_stats import get_domain_stats
+from asp.search.ranking import rank_search_results
+from asp.search.search_cache import SearchCache, get_search_cache, search_cache_key
+from asp.utils.http_client import get_http_client
+from asp.utils.rate_limit import get_rate_limiter
+from asp.utils.retry import RetryPolicy, parse_retry_after, retry_async
+
 # Environment variable name for the Brave Search API key
 BRAVE_API_KEY_ENV_VAR = "BRAVE_API_KEY"
 BRAVE_SEARCH_API_URL = "https://api.search.brave.com/res/v1/web/search"
+# Overrides the endpoint above, e.g. to point the pipeline at a local stand-in for benchmarks
+BRAVE_SEARCH_API_URL_ENV_VAR = "BRAVE_SEARCH_API_URL"
+
+# Brave rate-limits per second; retry 429s and transient errors within a one-minute budget
+BRAVE_RETRY_POLICY = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=15.0, deadline=60.0)
+
+# Searches currently running, keyed by cache key, so identical concurrent queries share one API call
+_in_flight_searches: Dict[str, asyncio.Task] = {}
 
-async def perform_brave_search(topic: str) -> List[Dict[str, Any]]:
+async def perform_brave_search(topic: str, use_cache: bool = True) -> List[Dict[str, Any]]:
     """
     Performs a web search for a given topic using the Brave Search API.
 
+    Results are cached on disk by normalized query (see asp.search.search_cache), and
+    concurrent searches for the same normalized query share a single API call.
+
     Args:
         topic (str): The topic to search for.
+        use_cache (bool): Set to False to bypass the search cache for this call.
 
     Returns:
         List[Dict[str, Any]]: A list of dictionaries, each representing a search result.
@@ -25,57 +45,123 @@ async def perform_brave_search(topic: str) -> List[Dict[str, Any]]:
         logfire.error("Brave Search API key not found in environment variables.")
         raise ValueError(f"{BRAVE_API_KEY_ENV_VAR} environment variable not set.")
 
+    params = {
+        "q": f"{topic} blog article", # Added keywords to query
+        "count": 10 # Request 10 results
+    }
+    key = search_cache_key(params["q"], {"count": params["count"]})
+
+    cache = get_search_cache() if use_cache else None
+    if cache:
+        cached_results = await cache.get(key)
+        if cached_results is not None:
+            logfire.info("Using cached search results for topic {topic}. Found {count} results.",
+                         topic=topic, count=len(cached_results))
+            return cached_results
+
+    search = _in_flight_searches.get(key)
+    if search is None:
+        search = asyncio.create_task(_brave_search(topic, params, brave_api_key, cache, key))
+        _in_flight_searches[key] = search
+        search.add_done_callback(lambda _: _in_flight_searches.pop(key, None))
+    else:
+        logfire.info("Joining the in-flight search for topic {topic}.", topic=topic)
+    # Shielded so one cancelled caller does not cancel the search for the others
+    return list(await asyncio.shield(search))
+
+async def _brave_search(topic: str, params: Dict[str, Any], brave_api_key: str,
+                       cache: Optional[SearchCache], key: str) -> List[Dict[str, Any]]:
+    """
+    Calls the Brave Search API on the shared HTTP client and caches non-empty results.
+    """
     headers = {
         "Accept": "application/json",
         "Accept-Encoding": "gzip",
         "X-Subscription-Token": brave_api_key,
     }
 
-    params = {
-        "q": f"{topic} blog article", # Added keywords to query
-        "count": 10 # Request 10 results
-    }
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(BRAVE_SEARCH_API_URL, headers=headers, params=params)
-            response.raise_for_status() # Raise an exception for bad status codes
-
-            search_results = response.json()
-
-            if search_results and 'web' in search_results and 'results' in search_results['web']:
-                results_list = search_results['web']['results']
-                logfire.info("Brave Search API call successful. Found {count} results.", count=len(results_list))
-                return results_list
-            else:
-                logfire.warn("Brave Search API returned no results or unexpected format for topic {topic}.", topic=topic)
-                return []
-
-        except httpx.HTTPStatusError as e:
-            logfire.error("HTTP error during Brave Search API call for topic {topic}: {error}",
-                          topic=topic, error=e, exc_info=True)
-            raise # Re-raise the exception
-        except httpx.RequestError as e:
-            logfire.error("Request error during Brave Search API call for topic {topic}: {error}",
-                          topic=topic, error=e, exc_info=True)
-            raise # Re-raise the exception
-        except Exception as e:
-            logfire.error("An unexpected error occurred during Brave Search API call for topic {topic}: {error}",
-                          topic=topic, error=e, exc_info=True)
-            raise # Re-raise the exception
-
-def score_and_rank_urls(search_results: List[Dict[str, Any]]) -> List[str]:
+    rate_limiter = get_rate_limiter()
+    client = get_http_client()
+    api_url = os.getenv(BRAVE_SEARCH_API_URL_ENV_VAR) or BRAVE_SEARCH_API_URL
+
+    async def brave_search_request() -> httpx.Response:
+        await rate_limiter.acquire_brave()
+        response = await client.get(api_url, headers=headers, params=params)
+        if response.status_code == 429 and rate_limiter.brave:
+            # Hold back every topic's searches, not just this one's retry
+            rate_limiter.brave.pause(parse_retry_after(response.headers) or 1.0)
+        response.raise_for_status() # Raise an exception for bad status codes
+        return response
+
+    try:
+        # 429s and 5xx are retried with backoff, honoring Retry-After; other 4xx fail immediately
+        response = await retry_async(brave_search_request, policy=BRAVE_RETRY_POLICY)
+
+        search_results = response.json()
+
+        if search_results and 'web' in search_results and 'results' in search_results['web']:
+            results_list = search_results['web']['results']
+            logfire.info("Brave Search API call successful. Found {count} results.", count=len(results_list))
+            # Empty result sets are not cached; they are more likely transient than real
+            if cache and results_list:
+                await cache.set(key, results_list)
+            return results_list
+        else:
+            logfire.warn("Brave Search API returned no results or unexpected format for topic {topic}.", topic=topic)
+            return []
+
+    except httpx.HTTPStatusError as e:
+        logfire.error("HTTP error during Brave Search API call for topic {topic}: {error}",
+                      topic=topic, error=e, exc_info=True)
+        raise # Re-raise the exception
+    except httpx.RequestError as e:
+        logfire.error("Request error during Brave Search API call for topic {topic}: {error}",
+                      topic=topic, error=e, exc_info=True)
+        raise # Re-raise the exception
+    except Exception as e:
+        logfire.error("An unexpected error occurred during Brave Search API call for topic {topic}: {error}",
+                      topic=topic, error=e, exc_info=True)
+        raise # Re-raise the exception
+
+async def score_and_rank_urls(search_results: List[Dict[str, Any]], topic: Optional[str] = None) -> List[str]:
     """
-    Scores and ranks search result URLs based on content and structure.
+    Scores and ranks search result URLs.
+
+    With a topic, results are ranked by the relevance engine in asp.search.ranking (BM25
+    topic overlap, learned per-domain quality and domain diversity). Without one, the
+    original keyword scoring on 'blog', 'article' and 'daily' is used.
 
     Args:
         search_results (List[Dict[str, Any]]): A list of dictionaries, each representing a search result.
                                                 Expected keys: 'url', 'title', 'description'.
+        topic (Optional[str]): The topic that was searched.
 
     Returns:
         List[str]: A list of the top 10 ranked URLs.
     """
     logfire.info("Scoring and ranking search results from Brave Search.")
+    if topic:
+        domain_stats = get_domain_stats()
+        domain_priors = (await domain_stats.qualities([result['url'] for result in search_results if result.get('url')])
+                         if domain_stats else None)
+        top_10_urls = rank_search_results(topic, search_results, domain_priors, max_urls=10)
+        total_count = sum(1 for result in search_results if result.get('url'))
+    else:
+        top_10_urls, total_count = _score_by_keywords(search_results)
+
+    logfire.info("Scored and ranked {total_count} potential URLs. Returning top {top_count}.",
+                 total_count=total_count, top_count=len(top_10_urls))
+
+    # Log if fewer than 3 valid URLs found
+    if len(top_10_urls) < 3:
+        logfire.warn("Fewer than 3 potential URLs found after scoring and ranking. Found {count}.", count=len(top_10_urls))
+
+    return top_10_urls
+
+def _score_by_keywords(search_results: List[Dict[str, Any]]) -> Tuple[List[str], int]:
+    """
+    The original topic-agnostic scoring. Returns the top 10 URLs and the number of results scored.
+    """
     scored_urls = []
 
     for result in search_results:
@@ -91,26 +177,17 @@ def score_and_rank_urls(search_results: List[Dict[str, Any]]) -> List[str]:
                 score += 2
             if 'daily' in content_to_score:
                 score += 1
-            # Add more scoring criteria based on relevance to the topic if needed
 
             scored_urls.append((url, score))
 
     # Sort URLs by score in descending order and get the top 10
     scored_urls.sort(key=lambda item: item[1], reverse=True)
-    top_10_urls = [url for url, score in scored_urls[:10]]
-
-    logfire.info("Scored and ranked {total_count} potential URLs. Returning top {top_count}.",
-                 total_count=len(scored_urls), top_count=len(top_10_urls))
 
     # Log top 3 examples with scores
     for i, (url, score) in enumerate(scored_urls[:3]):
         logfire.debug("Top URL {index}: {url} (Score: {score})", index=i+1, url=url, score=score)
 
-    # Log if fewer than 3 valid URLs found
-    if len(top_10_urls) < 3:
-        logfire.warn("Fewer than 3 potential URLs found after scoring and ranking. Found {count}.", count=len(top_10_urls))
-
-    return top_10_urls
+    return [url for url, score in scored_urls[:10]], len(scored_urls)
 
 # The extract_urls_from_html function is no longer needed
 # def extract_urls_from_html(html: str) -> List[str]:
@@ -0,0 +1,140 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import logfire
+
+from asp.utils.rate_limit import domain_of
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score weights: topic relevance dominates, the domain prior and format hints break ties
+RELEVANCE_WEIGHT = 1.0
+DOMAIN_PRIOR_WEIGHT = 0.5
+FORMAT_HINT_WEIGHT = 0.1
+# Score subtracted per result already taken from the same domain
+DOMAIN_REPEAT_PENALTY = 0.35
+
+# Words that suggest a readable article rather than a listing, store or forum page
+FORMAT_HINT_TERMS = ("blog", "article", "daily", "guide", "news", "post")
+
+# Query words that carry no topic information
+QUERY_STOPWORDS = frozenset("""
+a an and are as at be by for from how in is it of on or that the this to what when where which who why
+with vs blog article
+""".split())
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+# Brave highlights matches in descriptions with <strong> tags
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases `text`, drops HTML tags and splits it into alphanumeric terms."""
+    return TERM_PATTERN.findall(TAG_PATTERN.sub(" ", text).lower())
+
+
+def _url_terms(url: str) -> List[str]:
+    # Hyphenated slugs and path segments often carry the article title
+    return tokenize(url.split("?", 1)[0].replace("-", " ").replace("_", " "))
+
+
+def bm25_scores(query_terms: List[str], documents: List[List[str]],
+                k1: float = BM25_K1, b: float = BM25_B) -> List[float]:
+    """
+    Scores each document against the query with Okapi BM25.
+
+    Document frequencies come from the documents themselves (the search results for one
+    topic), so terms that every result shares carry little weight.
+
+    Args:
+        query_terms (List[str]): The query terms (duplicates are ignored).
+        documents (List[List[str]]): The tokenized documents.
+        k1 (float): Term-frequency saturation.
+        b (float): Length normalization.
+
+    Returns:
+        List[float]: One score per document.
+    """
+    if not documents:
+        return []
+    average_length = sum(len(document) for document in documents) / len(documents) or 1.0
+    term_set = set(query_terms)
+    document_frequency = {term: sum(1 for document in documents if term in document) for term in term_set}
+    scores = []
+    for document in documents:
+        counts = Counter(document)
+        length_norm = k1 * (1 - b + b * len(document) / average_length)
+        score = 0.0
+        for term in term_set:
+            frequency = counts.get(term, 0)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + length_norm)
+        scores.append(score)
+    return scores
+
+
+def rank_search_results(topic: str, search_results: List[Dict[str, Any]],
+                        domain_priors: Optional[Dict[str, float]] = None,
+                        max_urls: int = 10) -> List[str]:
+    """
+    Ranks search results by topic relevance, domain quality and domain diversity.
+
+    Each result gets:
+    - BM25 relevance of its title, description and URL slug to the topic, scaled to [0, 1];
+    - the learned quality prior of its domain (0.5 for unseen domains), centred on zero;
+    - a small bonus for article-like format words.
+    Results are then picked greedily, with each pick from an already used domain costing
+    DOMAIN_REPEAT_PENALTY, so a single site cannot fill the candidate list.
+
+    Args:
+        topic (str): The topic that was searched.
+        search_results (List[Dict[str, Any]]): Results with 'url', 'title' and 'description'.
+        domain_priors (Optional[Dict[str, float]]): Domain quality prior per URL (see
+            DomainStatsStore.qualities), or None.
+        max_urls (int): The maximum number of URLs returned.
+
+    Returns:
+        List[str]: The ranked URLs, best first.
+    """
+    results = [result for result in search_results if result.get('url')]
+    if not results:
+        return []
+
+    query_terms = [term for term in tokenize(topic) if term not in QUERY_STOPWORDS] or tokenize(topic)
+    documents = [tokenize(f"{result.get('title', '')} {result.get('description', '')}") + _url_terms(result['url'])
+                 for result in results]
+    relevance = bm25_scores(query_terms, documents)
+    top_relevance = max(relevance) or 1.0
+
+    candidates = []
+    for position, (result, document, relevance_score) in enumerate(zip(results, documents, relevance)):
+        url = result['url']
+        prior = domain_priors.get(url, 0.5) if domain_priors else 0.5
+        format_hints = sum(1 for term in FORMAT_HINT_TERMS if term in document)
+        score = (RELEVANCE_WEIGHT * relevance_score / top_relevance
+                 + DOMAIN_PRIOR_WEIGHT * (prior - 0.5)
+                 + FORMAT_HINT_WEIGHT * min(format_hints, 2))
+        # The search engine's own order breaks ties
+        candidates.append({"url": url, "domain": domain_of(url), "score": score, "position": position,
+                           "relevance": relevance_score, "prior": prior})
+
+    ranked = []
+    domain_counts: Counter = Counter()
+    while candidates and len(ranked) < max_urls:
+        best = max(candidates, key=lambda candidate: (
+            candidate["score"] - DOMAIN_REPEAT_PENALTY * domain_counts[candidate["domain"]], -candidate["position"]))
+        candidates.remove(best)
+        domain_counts[best["domain"]] += 1
+        ranked.append(best)
+
+    for index, candidate in enumerate(ranked[:3]):
+        logfire.debug("Top URL {index}: {url} (score {score:.3f}, relevance {relevance:.2f}, domain prior {prior:.2f})",
+                      index=index + 1, url=candidate["url"], score=candidate["score"],
+                      relevance=candidate["relevance"], prior=candidate["prior"])
+    return [candidate["url"] for candidate in ranked]
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import logfire
+
+from asp.utils.cache import DiskCache, get_cache_dir
+from asp.utils.env import get_bool_env, get_float_env, get_int_env
+
+# Environment variable names for the search result cache
+SEARCH_CACHE_ENABLED_ENV_VAR = "ASP_SEARCH_CACHE"
+SEARCH_CACHE_TTL_ENV_VAR = "ASP_SEARCH_CACHE_TTL"
+SEARCH_CACHE_MAX_MB_ENV_VAR = "ASP_SEARCH_CACHE_MAX_MB"
+DEFAULT_SEARCH_CACHE_TTL = 6 * 60 * 60 # Seconds search results are reused
+DEFAULT_SEARCH_CACHE_MAX_MB = 64
+
+# Punctuation that does not change what a search engine returns
+QUERY_PUNCTUATION_PATTERN = re.compile(r"[\"'`“”‘’.,;:!?()\[\]{}]+")
+
+_search_cache: Optional["SearchCache"] = None
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query so equivalent topic strings share a cache entry.
+
+    Applies Unicode compatibility normalization and case folding, drops quotes and
+    sentence punctuation, and collapses whitespace. Word order is kept, since it can
+    change the results.
+
+    Args:
+        query (str): The raw query.
+
+    Returns:
+        str: The normalized query.
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = QUERY_PUNCTUATION_PATTERN.sub(" ", query)
+    return " ".join(query.split())
+
+
+def search_cache_key(query: str, params: Dict[str, Any]) -> str:
+    """
+    Builds the cache key for a query and its request parameters (result count, etc.).
+
+    Args:
+        query (str): The raw query.
+        params (Dict[str, Any]): Request parameters other than the query.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    material = json.dumps({"q": normalize_query(query), "params": params}, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """
+    On-disk cache of search results keyed by normalized query, with a freshness TTL.
+
+    Results older than `ttl` seconds count as misses and are replaced on the next search.
+    """
+    def __init__(self, path: str, max_bytes: int, ttl: float = DEFAULT_SEARCH_CACHE_TTL):
+        """
+        Initializes the search cache.
+
+        Args:
+            path (str): The SQLite file path.
+            max_bytes (int): The maximum total size of cached results.
+            ttl (float): Seconds cached results are served.
+        """
+        self.ttl = ttl
+        self._cache = DiskCache(path, max_bytes)
+
+    @property
+    def stats(self):
+        """Hit/miss counters of the underlying disk cache."""
+        return self._cache.stats
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the fresh cached results for a key, if any.
+
+        Args:
+            key (str): The key from search_cache_key.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The cached results, or None if missing or expired.
+        """
+        entry = await self._cache.aget_entry(key)
+        if entry is None or time.time() - entry["created_at"] >= self.ttl:
+            self._cache.stats.record_miss()
+            return None
+        try:
+            results = json.loads(entry["value"])
+        except ValueError as e:
+            logfire.warn("Discarding unreadable search cache entry: {error}", error=e)
+            await self._cache.adelete(key)
+            self._cache.stats.record_miss()
+            return None
+        self._cache.stats.record_hit()
+        return results
+
+    async def set(self, key: str, results: List[Dict[str, Any]]) -> None:
+        """
+        Stores the results for a key.
+
+        Args:
+            key (str): The key from search_cache_key.
+            results (List[Dict[str, Any]]): The search results.
+        """
+        await self._cache.aset(key, json.dumps(results))
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """
+    Returns the process-wide search cache, creating it on first use.
+
+    The cache lives in <ASP_CACHE_DIR>/search.sqlite. Set ASP_SEARCH_CACHE=off to disable it,
+    ASP_SEARCH_CACHE_TTL to change how long results are reused (seconds) and
+    ASP_SEARCH_CACHE_MAX_MB to change its size cap.
+
+    Returns:
+        Optional[SearchCache]: The shared search cache, or None when disabled.
+    """
+    global _search_cache
+    if not get_bool_env(SEARCH_CACHE_ENABLED_ENV_VAR, True):
+        return None
+    if _search_cache is None:
+        # A TTL of 0 treats every cached result as expired
+        ttl = get_float_env(SEARCH_CACHE_TTL_ENV_VAR, DEFAULT_SEARCH_CACHE_TTL) or 0.0
+        max_mb = get_int_env(SEARCH_CACHE_MAX_MB_ENV_VAR, DEFAULT_SEARCH_CACHE_MAX_MB)
+        path = os.path.join(get_cache_dir(), "search.sqlite")
+        _search_cache = SearchCache(path, max_mb * 1024 * 1024, ttl=ttl)
+        logfire.info("Search cache initialized.", path=path, ttl=ttl, max_mb=max_mb)
+    return _search_cache
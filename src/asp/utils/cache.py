@@ -0,0 +1,288 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Optional, TypeVar
+
+import logfire
+
+from asp.utils.metrics import metrics
+
+# Environment variable name for the root directory of all on-disk caches
+CACHE_DIR_ENV_VAR = "ASP_CACHE_DIR"
+DEFAULT_CACHE_DIR = ".asp_cache"
+
+# Eviction frees space down to this fraction of the size cap, so the next writes do not evict again
+EVICTION_TARGET = 0.9
+# Least recently used entries fetched per eviction query
+EVICTION_BATCH = 64
+# Buffered access-time updates are written back after this many hits or seconds, whichever comes first
+ACCESS_FLUSH_BATCH = 64
+ACCESS_FLUSH_SECONDS = 30.0
+
+T = TypeVar("T")
+
+CACHE_LOOKUPS = metrics.counter("asp_cache_lookups_total", "Cache lookups by cache (file name) and result (hit, miss)")
+
+
+def get_cache_dir() -> str:
+    """
+    Returns the root directory for on-disk caches, creating it if needed.
+
+    Returns:
+        str: The cache directory (ASP_CACHE_DIR, or .asp_cache in the working directory).
+    """
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR) or os.path.join(os.getcwd(), DEFAULT_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+class CacheStats:
+    """
+    Hit/miss counters for a cache instance. Lookups recorded through record_hit and
+    record_miss are also counted in the asp_cache_lookups_total metric.
+    """
+    def __init__(self, name: str = "cache"):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def record_hit(self) -> None:
+        self.hits += 1
+        CACHE_LOOKUPS.inc(cache=self.name, result="hit")
+
+    def record_miss(self) -> None:
+        self.misses += 1
+        CACHE_LOOKUPS.inc(cache=self.name, result="miss")
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were hits (0.0 when there were no lookups)."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Returns the counters as a plain dictionary for logging."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+
+class DiskCache:
+    """
+    A persistent key/value cache backed by SQLite with size-based LRU eviction.
+
+    Values are text. Reads refresh the entry's access time in batches, and whenever the
+    total stored size exceeds `max_bytes` the least recently used entries are evicted down
+    to EVICTION_TARGET of the cap. The database runs in WAL mode so several pipeline
+    processes can share one cache file.
+
+    The synchronous methods block on SQLite. Async code should go through `run` (or the
+    `aget`/`aget_entry`/`aset`/`adelete` shortcuts), which executes them on the cache's own
+    worker thread instead of the event loop.
+    """
+    def __init__(self, path: str, max_bytes: int):
+        """
+        Opens (or creates) the cache database.
+
+        Args:
+            path (str): The SQLite file path.
+            max_bytes (int): The maximum total size of stored values before eviction.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = CacheStats(os.path.splitext(os.path.basename(path))[0])
+        self._lock = threading.Lock()
+        # One thread per cache: calls run in submission order and never contend on the connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"asp-cache-{self.stats.name}")
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._conn.commit()
+        # Running total of stored bytes, so writes do not have to SUM the table
+        self._total_bytes = self._sum_sizes_locked()
+        # Access times of hits not yet written back, flushed in batches
+        self._pending_touches: Dict[str, float] = {}
+        self._last_touch_flush = time.monotonic()
+
+    async def run(self, function: Callable[..., T], *args) -> T:
+        """
+        Runs a blocking call on this cache's worker thread instead of the event loop.
+
+        Calls on one cache run one at a time in submission order, so a read-modify-write
+        passed as `function` is not interleaved with other calls made through `run`.
+
+        Args:
+            function (Callable[..., T]): The blocking function, usually one of this cache's methods.
+            *args: Arguments for the function.
+
+        Returns:
+            T: The function's result.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(function, *args))
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Async version of `get`."""
+        return await self.run(self.get, key)
+
+    async def aget_entry(self, key: str) -> Optional[Dict]:
+        """Async version of `get_entry`."""
+        return await self.run(self.get_entry, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """Async version of `set`."""
+        await self.run(self.set, key, value)
+
+    async def adelete(self, key: str) -> None:
+        """Async version of `delete`."""
+        await self.run(self.delete, key)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Looks up a value and marks it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[str]: The cached value, or None on a miss.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats.record_miss()
+                return None
+            self._pending_touches[key] = time.time()
+            if (len(self._pending_touches) >= ACCESS_FLUSH_BATCH
+                    or time.monotonic() - self._last_touch_flush >= ACCESS_FLUSH_SECONDS):
+                self._flush_touches_locked()
+                self._conn.commit()
+            self.stats.record_hit()
+            return row[0]
+
+    def get_entry(self, key: str) -> Optional[Dict]:
+        """
+        Looks up a value together with its creation time, without counting a hit or miss.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[Dict]: {'value': str, 'created_at': float}, or None if missing.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {"value": row[0], "created_at": row[1]}
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Stores a value, evicting least recently used entries if the cache is over its size cap.
+
+        Args:
+            key (str): The cache key.
+            value (str): The value to store.
+        """
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logfire.debug("Value for cache key {key} ({size} bytes) exceeds the cache size cap. Not caching.",
+                          key=key, size=size)
+            return
+        now = time.time()
+        with self._lock:
+            previous_size = self._size_of_locked(key)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._pending_touches.pop(key, None)
+            self._total_bytes += size - previous_size
+            self.stats.writes += 1
+            if self._total_bytes > self.max_bytes:
+                # Flush first so eviction sees the latest access times
+                self._flush_touches_locked()
+                self._evict_locked()
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        """
+        Removes an entry if present.
+
+        Args:
+            key (str): The cache key.
+        """
+        with self._lock:
+            self._total_bytes -= self._size_of_locked(key)
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._pending_touches.pop(key, None)
+            self._conn.commit()
+
+    def total_bytes(self) -> int:
+        """Returns the total size of all stored values."""
+        with self._lock:
+            return self._sum_sizes_locked()
+
+    def close(self) -> None:
+        """Writes back pending access times and closes the underlying database connection."""
+        with self._lock:
+            self._flush_touches_locked()
+            self._conn.commit()
+            self._conn.close()
+        self._executor.shutdown(wait=False)
+
+    def _size_of_locked(self, key: str) -> int:
+        row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _sum_sizes_locked(self) -> int:
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return row[0]
+
+    def _flush_touches_locked(self) -> None:
+        if self._pending_touches:
+            self._conn.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?",
+                                   [(accessed_at, key) for key, accessed_at in self._pending_touches.items()])
+            self._pending_touches.clear()
+        self._last_touch_flush = time.monotonic()
+
+    def _evict_locked(self) -> None:
+        # Other processes sharing the file may have written too, so resync the running total once
+        self._total_bytes = self._sum_sizes_locked()
+        excess = self._total_bytes - int(self.max_bytes * EVICTION_TARGET)
+        if self._total_bytes <= self.max_bytes or excess <= 0:
+            return
+        evicted = 0
+        # Walk entries from least to most recently used, a batch at a time, until enough space is freed
+        while excess > 0:
+            batch = []
+            for key, size in self._conn.execute(
+                    "SELECT key, size FROM entries ORDER BY accessed_at ASC LIMIT ?", (EVICTION_BATCH,)):
+                if excess <= 0:
+                    break
+                batch.append((key,))
+                excess -= size
+                self._total_bytes -= size
+            if not batch:
+                break
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", batch)
+            evicted += len(batch)
+        self.stats.evictions += evicted
+        logfire.debug("Evicted {count} entries from cache {path}.", count=evicted, path=self.path)
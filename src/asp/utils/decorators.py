@@ -1,25 +1,31 @@
-import time
-import logfire
+import inspect
 from functools import wraps
+from typing import Optional
 
-def retry(max_attempts: int = 3, delay: float = 1.0):
+from asp.utils.retry import RetryPolicy, retry_async, retry_call
+
+def retry(max_attempts: int = 3, delay: float = 1.0, max_delay: float = 30.0,
+          deadline: Optional[float] = None, policy: Optional[RetryPolicy] = None):
     """
-    A decorator that retries a function call a specified number of times with a delay.
+    A decorator that retries a function call on transient errors with exponential backoff.
+
+    Works on both regular functions and coroutine functions; coroutines wait with
+    asyncio.sleep so a retry never blocks the event loop. Delays grow from `delay` up to
+    `max_delay` with full jitter, a server's Retry-After is honored, fatal errors (bad
+    input, 4xx responses other than 408/425/429) are raised immediately, and no retry
+    is started past `deadline` seconds. Pass `policy` to override all of these.
     """
+    policy = policy or RetryPolicy(max_attempts=max_attempts, base_delay=delay, max_delay=max_delay, deadline=deadline)
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await retry_async(func, *args, policy=policy, **kwargs)
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if attempt < max_attempts:
-                        logfire.warn("Attempt {attempt} failed for {func_name}. Retrying in {delay:.2f} seconds.",
-                                     attempt=attempt, func_name=func.__name__, delay=delay)
-                        time.sleep(delay)
-                    else:
-                        logfire.error("Attempt {attempt} failed for {func_name}. No more retries.",
-                                      attempt=attempt, func_name=func.__name__, error=e, exc_info=True)
-                        raise
+            return retry_call(func, *args, policy=policy, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
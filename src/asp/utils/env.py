@@ -0,0 +1,68 @@
+import os
+from typing import Optional
+
+import logfire
+
+
+def get_int_env(name: str, default: int, minimum: int = 1) -> int:
+    """
+    Reads a positive integer setting from the environment.
+
+    Args:
+        name (str): The environment variable name.
+        default (int): The value to use when the variable is unset or invalid.
+        minimum (int): The smallest accepted value.
+
+    Returns:
+        int: The configured value.
+    """
+    raw_value = os.environ.get(name)
+    if raw_value is None or raw_value.strip() == "":
+        return default
+    try:
+        value = int(raw_value)
+    except ValueError:
+        logfire.warn("Invalid integer for {name}: {value}. Using default {default}.",
+                     name=name, value=raw_value, default=default)
+        return default
+    return max(minimum, value)
+
+
+def get_float_env(name: str, default: Optional[float]) -> Optional[float]:
+    """
+    Reads an optional positive float setting (e.g. a timeout in seconds) from the environment.
+
+    Args:
+        name (str): The environment variable name.
+        default (Optional[float]): The value to use when the variable is unset or invalid.
+
+    Returns:
+        Optional[float]: The configured value, or None when disabled (0 or negative).
+    """
+    raw_value = os.environ.get(name)
+    if raw_value is None or raw_value.strip() == "":
+        return default
+    try:
+        value = float(raw_value)
+    except ValueError:
+        logfire.warn("Invalid number for {name}: {value}. Using default {default}.",
+                     name=name, value=raw_value, default=default)
+        return default
+    return value if value > 0 else None
+
+
+def get_bool_env(name: str, default: bool) -> bool:
+    """
+    Reads a boolean flag (1/true/yes/on) from the environment.
+
+    Args:
+        name (str): The environment variable name.
+        default (bool): The value to use when the variable is unset.
+
+    Returns:
+        bool: The configured flag.
+    """
+    raw_value = os.environ.get(name)
+    if raw_value is None or raw_value.strip() == "":
+        return default
+    return raw_value.strip().lower() in ("1", "true", "yes", "on")
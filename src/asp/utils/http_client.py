@@ -0,0 +1,52 @@
+from typing import Optional
+
+import httpx
+import logfire
+
+# A desktop browser User-Agent; many sites serve bot-blocking pages to the default httpx agent
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+DEFAULT_TIMEOUT = 15.0
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled HTTP client, creating it on first use.
+
+    The client keeps connections alive across requests, follows redirects and sends a
+    browser-like User-Agent. Callers pass per-request headers and timeouts as needed.
+
+    Returns:
+        httpx.AsyncClient: The shared client.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+            headers={
+                "User-Agent": DEFAULT_USER_AGENT,
+                "Accept-Language": "en-US,en;q=0.9",
+            },
+        )
+        logfire.debug("Created shared HTTP client.")
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """
+    Closes the shared HTTP client if it was created. Safe to call more than once.
+    """
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+        logfire.debug("Closed shared HTTP client.")
+    _http_client = None
@@ -1,7 +1,25 @@
+import time
+from contextlib import contextmanager
+
 import logfire
 
-# Initialize Logfire
-logfire.configure()
+from asp.utils.metrics import metrics
+
+_logfire_configured = False
+
+STEP_SECONDS = metrics.histogram("asp_step_seconds", "Duration of each traced pipeline step block")
+STEPS_IN_FLIGHT = metrics.gauge("asp_steps_in_flight", "Traced pipeline step blocks currently running")
+STEP_ERRORS = metrics.counter("asp_step_errors_total", "Traced pipeline step blocks that raised")
+
+def configure_logfire() -> None:
+    """
+    Configures Logfire once per process. The entry point calls this when a run starts
+    instead of configuring at import time, so importing the pipeline stays cheap.
+    """
+    global _logfire_configured
+    if not _logfire_configured:
+        logfire.configure()
+        _logfire_configured = True
 
 # Example of structured logging
 def log_step_start(step_name: str, context: dict = None):
@@ -14,4 +32,27 @@ def log_step_end(step_name: str, status: str, context: dict = None):
 
 def log_step_error(step_name: str, error: Exception, context: dict = None):
     """Logs an error during a pipeline step with exception details and context."""
-    logfire.error("Error during step {step_name}: {error}", step_name=step_name, error=error, exc_info=True, **(context or {}))
\ No newline at end of file
+    logfire.error("Error during step {step_name}: {error}", step_name=step_name, error=error, exc_info=True, **(context or {}))
+
+@contextmanager
+def trace_step(step_name: str, **context):
+    """
+    Runs the block as a pipeline step: a Logfire span (nested under the current topic,
+    article or chunk span), counted in asp_steps_in_flight while it runs and recorded in
+    asp_step_seconds when it ends. Errors are counted in asp_step_errors_total and
+    recorded on the span; logging them is left to the caller's error handling.
+
+    Args:
+        step_name (str): The step name, used as the span name and the metrics' step label.
+        **context: Extra span attributes.
+    """
+    started = time.perf_counter()
+    with logfire.span("Step {step_name}", step_name=step_name, **context) as span, \
+            STEPS_IN_FLIGHT.track(step=step_name):
+        try:
+            yield span
+        except Exception:
+            STEP_ERRORS.inc(step=step_name)
+            raise
+        finally:
+            STEP_SECONDS.observe(time.perf_counter() - started, step=step_name)
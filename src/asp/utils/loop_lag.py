@@ -0,0 +1,69 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import logfire
+
+from asp.utils.stats import percentile
+
+# Seconds between loop-lag probes
+DEFAULT_LOOP_LAG_INTERVAL = 0.05
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a periodic sleep wakes up.
+
+    Anything that blocks the loop (CPU-bound parsing, synchronous I/O) delays every
+    coroutine in the process by the same amount, and shows up here as lag.
+    """
+    def __init__(self, interval: float = DEFAULT_LOOP_LAG_INTERVAL):
+        """
+        Initializes the monitor.
+
+        Args:
+            interval (float): Seconds between probes.
+        """
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self._expected: Optional[float] = None
+
+    def start(self) -> None:
+        """Starts probing on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe())
+
+    async def stop(self) -> None:
+        """Stops probing, counting the lag of a probe that is already overdue."""
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            if self._expected is not None and time.perf_counter() > self._expected:
+                self.samples.append(time.perf_counter() - self._expected)
+            self._expected = None
+
+    async def _probe(self) -> None:
+        while True:
+            self._expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - self._expected))
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the probe count and the p50, p95 and maximum lag in milliseconds."""
+        return {
+            "probes": len(self.samples),
+            "p50_ms": round(percentile(self.samples, 0.5) * 1000, 1),
+            "p95_ms": round(percentile(self.samples, 0.95) * 1000, 1),
+            "max_ms": round(max(self.samples, default=0.0) * 1000, 1),
+        }
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self.start()
+        await asyncio.sleep(0) # Let the first probe start before the caller blocks the loop
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.stop()
+        logfire.debug("Event loop lag: {stats}", stats=self.stats())
@@ -0,0 +1,291 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import logfire
+
+from asp.utils.env import get_int_env
+
+# Environment variable names for the local metrics exporters
+METRICS_PORT_ENV_VAR = "ASP_METRICS_PORT" # 0 disables the HTTP endpoint
+METRICS_FILE_ENV_VAR = "ASP_METRICS_FILE" # Written at the end of a run; .prom for Prometheus text, else JSON
+
+DEFAULT_METRICS_PORT = 0
+# Histogram bucket upper bounds in seconds, from a cache lookup to a slow topic
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """A named metric with one value per label set, mirrored to Logfire's OpenTelemetry metrics."""
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, unit: str, lock: threading.Lock):
+        self.name = name
+        self.description = description
+        self.unit = unit
+        self._lock = lock
+        self.values: Dict[LabelKey, Any] = {}
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self.values.items()]
+
+    def prometheus_lines(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self.values.items()]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. cache hits or failed crawls."""
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, unit: str, lock: threading.Lock):
+        super().__init__(name, description, unit, lock)
+        self._instrument = logfire.metric_counter(name, unit=unit, description=description)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """Adds `amount` to the count for the given labels."""
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self._instrument.add(amount, dict(key))
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. the work currently in flight."""
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, unit: str, lock: threading.Lock):
+        super().__init__(name, description, unit, lock)
+        self._instrument = logfire.metric_up_down_counter(name, unit=unit, description=description)
+
+    def add(self, amount: float, **labels: Any) -> None:
+        """Adds `amount` (which may be negative) to the value for the given labels."""
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self._instrument.add(amount, dict(key))
+
+    @contextmanager
+    def track(self, **labels: Any):
+        """Counts the block as in flight while it runs."""
+        self.add(1, **labels)
+        try:
+            yield
+        finally:
+            self.add(-1, **labels)
+
+
+class Histogram(_Metric):
+    """A distribution of observations, e.g. stage latencies, kept as cumulative buckets."""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, unit: str, lock: threading.Lock,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, description, unit, lock)
+        self.buckets = tuple(sorted(buckets))
+        self._instrument = logfire.metric_histogram(name, unit=unit, description=description)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Records one observation for the given labels."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self.values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+        self._instrument.record(value, dict(key))
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{
+                "labels": dict(key),
+                "count": series["count"],
+                "sum": round(series["sum"], 6),
+                "buckets": {_format_value(bound): count for bound, count in zip(self.buckets, series["counts"])},
+            } for key, series in self.values.items()]
+
+    def prometheus_lines(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in self.values.items():
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters, gauges and histograms with a local Prometheus/JSON exporter.
+
+    Every metric is also recorded through Logfire's metrics API, so it reaches Logfire when
+    that is configured; the local exporters work without it. Metrics are created once by
+    name (modules declare theirs at import) and are safe to update from worker threads.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_type: type, name: str, description: str, unit: str, **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_type(name, description, unit, threading.Lock(), **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_type):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}.")
+            return metric
+
+    def counter(self, name: str, description: str, unit: str = "1") -> Counter:
+        """Returns the counter with this name, creating it on first use."""
+        return self._get_or_create(Counter, name, description, unit)
+
+    def gauge(self, name: str, description: str, unit: str = "1") -> Gauge:
+        """Returns the gauge with this name, creating it on first use."""
+        return self._get_or_create(Gauge, name, description, unit)
+
+    def histogram(self, name: str, description: str, unit: str = "s",
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Returns the histogram with this name, creating it on first use."""
+        return self._get_or_create(Histogram, name, description, unit, buckets=buckets)
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Returns every metric's type, description, unit and samples, for the JSON export."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {"type": metric.kind, "description": metric.description, "unit": metric.unit,
+                              "samples": metric.samples()} for metric in metrics}
+
+    def render_prometheus(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Writes the metrics to a file atomically: Prometheus text for a .prom path (e.g. for
+        node_exporter's textfile collector), JSON otherwise.
+
+        Args:
+            path (str): The file to write.
+        """
+        content = self.render_prometheus() if path.endswith(".prom") \
+            else json.dumps(self.as_dict(), indent=2, sort_keys=True)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temporary_path, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serves /metrics (Prometheus text) and /metrics.json from a background thread.
+
+        Args:
+            port (int): The port to listen on (0 picks a free one).
+            host (str): The interface to listen on.
+
+        Returns:
+            ThreadingHTTPServer: The running server.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass # Scrapes are not worth a log line each
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.render_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.as_dict()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="asp-metrics", daemon=True).start()
+        return server
+
+# Process-wide metrics registry
+metrics = MetricsRegistry()
+
+
+def start_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """
+    Starts the metrics endpoint on ASP_METRICS_PORT if it is set and not already running.
+
+    Returns:
+        Optional[ThreadingHTTPServer]: The server, or None when disabled or the port is taken.
+    """
+    global _metrics_server
+    port = get_int_env(METRICS_PORT_ENV_VAR, DEFAULT_METRICS_PORT, minimum=0)
+    if _metrics_server is None and port:
+        try:
+            _metrics_server = metrics.serve(port)
+        except OSError as e:
+            logfire.warn("Could not serve metrics on port {port}: {error}", port=port, error=e)
+            return None
+        logfire.info("Serving metrics on http://127.0.0.1:{port}/metrics", port=port)
+    return _metrics_server
+
+
+def write_metrics_file() -> Optional[str]:
+    """
+    Writes the metrics to ASP_METRICS_FILE if it is set.
+
+    Returns:
+        Optional[str]: The path written, or None when disabled or the write failed.
+    """
+    path = os.environ.get(METRICS_FILE_ENV_VAR)
+    if not path:
+        return None
+    try:
+        metrics.write(path)
+    except OSError as e:
+        logfire.error("Could not write metrics to {path}: {error}", path=path, error=e)
+        return None
+    logfire.info("Wrote metrics to {path}", path=path)
+    return path
@@ -0,0 +1,234 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import logfire
+
+from asp.nlp.tokens import estimate_tokens
+from asp.utils.env import get_float_env
+
+# Environment variable names for the rate limits (rates <= 0 disable a limit)
+BRAVE_RATE_ENV_VAR = "ASP_BRAVE_RATE" # Requests per second
+BRAVE_BURST_ENV_VAR = "ASP_BRAVE_BURST"
+DOMAIN_RATE_ENV_VAR = "ASP_DOMAIN_RATE" # Requests per second to any one crawled site
+DOMAIN_BURST_ENV_VAR = "ASP_DOMAIN_BURST"
+LLM_RPM_ENV_VAR = "ASP_LLM_RPM" # Requests per minute
+LLM_TPM_ENV_VAR = "ASP_LLM_TPM" # Tokens per minute
+
+# Brave's free plan allows one query per second; raise these for paid plans
+DEFAULT_BRAVE_RATE = 1.0
+DEFAULT_BRAVE_BURST = 1.0
+DEFAULT_DOMAIN_RATE = 1.0
+DEFAULT_DOMAIN_BURST = 2.0
+# OpenRouter limits depend on the account, so the LLM limits are off unless configured
+DEFAULT_LLM_RPM = 0.0
+DEFAULT_LLM_TPM = 0.0
+
+# Completion budget charged per call on top of the estimated prompt tokens
+ESTIMATED_COMPLETION_TOKENS = 256
+
+_rate_limiter: Optional["RateLimiter"] = None
+
+
+class TokenBucket:
+    """
+    An asyncio token bucket: `rate` tokens per second refill up to `capacity`.
+
+    acquire() reserves its tokens immediately and then sleeps until the reservation is
+    covered, so waiters are served in arrival order without a lock and the bucket can be
+    shared across event loops. A cancelled waiter gives its tokens back. pause() holds
+    every caller back for a while, e.g. after the service answered 429 with Retry-After.
+    """
+    def __init__(self, rate: float, capacity: float, name: str = "bucket",
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes a full bucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Maximum tokens held (the allowed burst).
+            name (str): The bucket name, used for logging.
+            clock (Callable[[], float]): Time source in seconds.
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.name = name
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+        self.paused_until = 0.0
+        self.total_wait = 0.0 # Seconds callers spent waiting, for logging
+
+    def _refill(self) -> float:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """
+        Waits until `amount` tokens are available and takes them.
+
+        Args:
+            amount (float): Tokens to take; amounts above the capacity are charged as the capacity.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        now = self._refill()
+        self.tokens -= amount
+        wait = max(-self.tokens / self.rate if self.tokens < 0 else 0.0, self.paused_until - now)
+        waited = 0.0
+        try:
+            while wait > 0:
+                await asyncio.sleep(wait)
+                waited += wait
+                wait = self.paused_until - self.clock()
+        except asyncio.CancelledError:
+            self.tokens += amount
+            raise
+        if waited:
+            self.total_wait += waited
+            logfire.debug("Rate limiter {name} delayed a request by {waited:.2f}s.", name=self.name, waited=waited)
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds back every caller for `seconds`.
+
+        Args:
+            seconds (float): How long to pause.
+        """
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+        logfire.info("Rate limiter {name} paused for {seconds:.1f}s.", name=self.name, seconds=seconds)
+
+
+class LLMRateLimiter:
+    """
+    Limits LLM calls by requests per minute and by tokens per minute.
+
+    Tokens are estimated from the prompt length plus a fixed completion budget, since the
+    actual usage is only known after the call.
+    """
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        """
+        Initializes the limiter.
+
+        Args:
+            requests_per_minute (float): Request limit, or <= 0 for none.
+            tokens_per_minute (float): Token limit, or <= 0 for none.
+        """
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute, "llm_requests") \
+            if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute, "llm_tokens") \
+            if tokens_per_minute > 0 else None
+
+    async def acquire(self, prompt: str) -> None:
+        """
+        Waits until a request with this prompt fits both limits.
+
+        Args:
+            prompt (str): The prompt text (used to estimate its tokens).
+        """
+        if self.requests:
+            await self.requests.acquire()
+        if self.tokens:
+            await self.tokens.acquire(estimate_tokens(prompt) + ESTIMATED_COMPLETION_TOKENS)
+
+    def pause(self, seconds: float) -> None:
+        """Holds back every LLM call for `seconds` (after a 429 from the provider)."""
+        for bucket in (self.requests, self.tokens):
+            if bucket:
+                bucket.pause(seconds)
+
+
+def domain_of(url: str) -> str:
+    """Returns the host a URL's requests are limited under, without a leading 'www.'."""
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class RateLimiter:
+    """
+    Process-wide rate limits for the external services the pipeline calls.
+
+    - `brave`: the Brave Search API quota.
+    - `domain(url)`: a politeness bucket per crawled site, created on first use.
+    - `llm`: OpenRouter requests and tokens per minute.
+
+    Disabled limits (rate <= 0) return immediately.
+    """
+    def __init__(self, brave_rate: float = DEFAULT_BRAVE_RATE, brave_burst: float = DEFAULT_BRAVE_BURST,
+                 domain_rate: float = DEFAULT_DOMAIN_RATE, domain_burst: float = DEFAULT_DOMAIN_BURST,
+                 llm_rpm: float = DEFAULT_LLM_RPM, llm_tpm: float = DEFAULT_LLM_TPM):
+        """
+        Initializes the rate limits.
+
+        Args:
+            brave_rate (float): Brave Search requests per second.
+            brave_burst (float): Brave Search burst size.
+            domain_rate (float): Requests per second to a single site.
+            domain_burst (float): Burst size per site.
+            llm_rpm (float): LLM requests per minute.
+            llm_tpm (float): LLM tokens per minute.
+        """
+        self.brave = TokenBucket(brave_rate, brave_burst, "brave") if brave_rate > 0 else None
+        self.domain_rate = domain_rate
+        self.domain_burst = domain_burst
+        self.llm = LLMRateLimiter(llm_rpm, llm_tpm)
+        self._domains: Dict[str, TokenBucket] = {}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """
+        Builds the rate limits from the ASP_*_RATE, ASP_*_BURST and ASP_LLM_* environment variables.
+        """
+        return cls(
+            brave_rate=get_float_env(BRAVE_RATE_ENV_VAR, DEFAULT_BRAVE_RATE) or 0.0,
+            brave_burst=get_float_env(BRAVE_BURST_ENV_VAR, DEFAULT_BRAVE_BURST) or DEFAULT_BRAVE_BURST,
+            domain_rate=get_float_env(DOMAIN_RATE_ENV_VAR, DEFAULT_DOMAIN_RATE) or 0.0,
+            domain_burst=get_float_env(DOMAIN_BURST_ENV_VAR, DEFAULT_DOMAIN_BURST) or DEFAULT_DOMAIN_BURST,
+            llm_rpm=get_float_env(LLM_RPM_ENV_VAR, DEFAULT_LLM_RPM) or 0.0,
+            llm_tpm=get_float_env(LLM_TPM_ENV_VAR, DEFAULT_LLM_TPM) or 0.0,
+        )
+
+    async def acquire_brave(self) -> None:
+        """Waits for a Brave Search request slot."""
+        if self.brave:
+            await self.brave.acquire()
+
+    async def acquire_domain(self, url: str) -> None:
+        """
+        Waits for a request slot on the URL's site.
+
+        Args:
+            url (str): The URL about to be requested.
+        """
+        if self.domain_rate <= 0:
+            return
+        domain = domain_of(url)
+        bucket = self._domains.get(domain)
+        if bucket is None:
+            bucket = self._domains[domain] = TokenBucket(self.domain_rate, self.domain_burst, domain)
+        await bucket.acquire()
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the seconds callers spent waiting on each limit, for logging."""
+        buckets = [self.brave, self.llm.requests, self.llm.tokens]
+        stats = {bucket.name: round(bucket.total_wait, 2) for bucket in buckets if bucket}
+        stats["domains"] = round(sum(bucket.total_wait for bucket in self._domains.values()), 2)
+        return stats
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide rate limiter, creating it from the environment on first use.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter.from_env()
+        logfire.debug("Created rate limiter.", brave=_rate_limiter.brave is not None,
+                      domain_rate=_rate_limiter.domain_rate)
+    return _rate_limiter
@@ -0,0 +1,247 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Mapping, Optional, TypeVar
+
+import logfire
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, rate limits and transient server errors
+RETRYABLE_STATUS_CODES = frozenset([408, 425, 429, 500, 502, 503, 504])
+
+# Programming and input errors that will fail the same way on every attempt
+FATAL_EXCEPTIONS = (ValueError, TypeError, KeyError, AttributeError, NotImplementedError, PermissionError)
+
+# Upper bound on a server-requested Retry-After, so one header cannot stall a topic indefinitely
+MAX_RETRY_AFTER = 120.0
+
+
+class RetryableError(Exception):
+    """
+    Raised by callers to mark a failure as transient, e.g. a failed crawl result that
+    carries a retryable status code instead of raising.
+    """
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def get_status_code(error: BaseException) -> Optional[int]:
+    """
+    Returns the HTTP status carried by an exception (httpx, openai), if any.
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Classifies an exception as transient (worth retrying) or fatal.
+
+    Errors carrying an HTTP status are retryable only for timeouts, 429 and 5xx. Input and
+    programming errors are fatal. Anything else (connection resets, timeouts, browser
+    crashes) is assumed to be transient.
+
+    Args:
+        error (BaseException): The exception raised by an attempt.
+
+    Returns:
+        bool: True if the call should be retried.
+    """
+    if isinstance(error, RetryableError):
+        return error.status_code is None or error.status_code in RETRYABLE_STATUS_CODES
+    status = get_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return not isinstance(error, FATAL_EXCEPTIONS)
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """
+    Returns the delay in seconds requested by the server through Retry-After (or retry-after-ms).
+
+    Args:
+        error (BaseException): The exception raised by an attempt.
+
+    Returns:
+        Optional[float]: The requested delay, or None if the server did not ask for one.
+    """
+    if isinstance(error, RetryableError) and error.retry_after is not None:
+        return error.retry_after
+    return parse_retry_after(getattr(getattr(error, "response", None), "headers", None))
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Parses Retry-After (seconds or HTTP-date) or retry-after-ms from response headers.
+
+    Args:
+        headers (Optional[Mapping[str, str]]): The response headers (case-insensitive lookups
+                                               are tried in lowercase and title case).
+
+    Returns:
+        Optional[float]: The requested delay in seconds, or None if absent or unparseable.
+    """
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms") or headers.get("Retry-After-Ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, server-directed delays and an overall deadline.
+
+    Attempt n (starting at 1) failing with a retryable error waits a random time between
+    0 and min(max_delay, base_delay * multiplier ** (n - 1)), or the server's Retry-After
+    if it asked for longer. No retry is started that would end past the deadline; for
+    coroutines the deadline also bounds each attempt.
+    """
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 multiplier: float = 2.0, jitter: bool = True, deadline: Optional[float] = None,
+                 retry_on: Callable[[BaseException], bool] = is_retryable_error):
+        """
+        Initializes the policy.
+
+        Args:
+            max_attempts (int): The maximum number of attempts, including the first.
+            base_delay (float): The backoff cap after the first failure, in seconds.
+            max_delay (float): The largest backoff cap, in seconds.
+            multiplier (float): The growth factor of the backoff cap per attempt.
+            jitter (bool): Draw each delay uniformly from [0, cap] instead of sleeping the cap.
+            deadline (Optional[float]): Maximum seconds for the whole call including retries, or None.
+            retry_on (Callable[[BaseException], bool]): Decides whether an error is retryable.
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retry_on = retry_on
+
+    def backoff(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """
+        Returns the delay before the next attempt after `attempt` failed with `error`.
+        """
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        delay = random.uniform(0, cap) if self.jitter else cap
+        retry_after = get_retry_after(error) if error is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, MAX_RETRY_AFTER))
+        return delay
+
+    def next_delay(self, attempt: int, error: BaseException, started: float) -> Optional[float]:
+        """
+        Returns the delay before retrying, or None if the error should be raised.
+
+        Args:
+            attempt (int): The attempt that just failed (1-based).
+            error (BaseException): Its exception.
+            started (float): time.monotonic() when the call started.
+
+        Returns:
+            Optional[float]: Seconds to wait, or None to give up.
+        """
+        if attempt >= self.max_attempts or not self.retry_on(error):
+            return None
+        delay = self.backoff(attempt, error)
+        if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+            return None
+        return delay
+
+    def remaining(self, started: float) -> Optional[float]:
+        """Returns the seconds left before the deadline, or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - (time.monotonic() - started))
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def _log_retry(name: str, attempt: int, policy: RetryPolicy, error: BaseException, delay: Optional[float]) -> None:
+    if delay is None:
+        logfire.error("Attempt {attempt} failed for {func_name}. No more retries.",
+                      attempt=attempt, func_name=name, error=error, retryable=policy.retry_on(error), exc_info=True)
+    else:
+        logfire.warn("Attempt {attempt} failed for {func_name}: {error}. Retrying in {delay:.2f} seconds.",
+                     attempt=attempt, func_name=name, error=error, delay=delay, status=get_status_code(error))
+
+
+async def retry_async(func: Callable[..., Awaitable[T]], *args: Any,
+                      policy: RetryPolicy = DEFAULT_RETRY_POLICY, **kwargs: Any) -> T:
+    """
+    Awaits `func(*args, **kwargs)`, retrying transient failures according to `policy`.
+
+    Each attempt is bounded by the time left before the policy deadline; a timed-out
+    attempt raises asyncio.TimeoutError.
+
+    Args:
+        func (Callable[..., Awaitable[T]]): The coroutine function to call.
+        *args: Positional arguments for `func`.
+        policy (RetryPolicy): The retry policy.
+        **kwargs: Keyword arguments for `func`.
+
+    Returns:
+        T: The result of the first successful attempt.
+    """
+    name = getattr(func, "__name__", repr(func))
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await asyncio.wait_for(func(*args, **kwargs), timeout=policy.remaining(started))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            delay = policy.next_delay(attempt, e, started)
+            _log_retry(name, attempt, policy, e, delay)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+
+
+def retry_call(func: Callable[..., T], *args: Any, policy: RetryPolicy = DEFAULT_RETRY_POLICY, **kwargs: Any) -> T:
+    """
+    Calls `func(*args, **kwargs)`, retrying transient failures according to `policy`.
+
+    The synchronous counterpart of retry_async. A running attempt cannot be interrupted,
+    so the deadline only stops further retries.
+    """
+    name = getattr(func, "__name__", repr(func))
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            delay = policy.next_delay(attempt, e, started)
+            _log_retry(name, attempt, policy, e, delay)
+            if delay is None:
+                raise
+            time.sleep(delay)
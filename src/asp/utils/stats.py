@@ -0,0 +1,21 @@
+from typing import List
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Returns the value at `fraction` (0-1) of the sorted values, interpolating between neighbours.
+
+    Args:
+        values (List[float]): The samples.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The percentile, or 0.0 for no samples.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
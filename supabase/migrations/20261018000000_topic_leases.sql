@@ -0,0 +1,60 @@
+-- Topic leasing for the 'Test-Article to Social' queue.
+--
+-- Lets several pipeline workers share the queue: a worker claims topics by writing its id
+-- and a lease expiry, renews the lease while it works (heartbeat), and any topic whose
+-- lease has expired can be claimed again by another worker. Claims use
+-- FOR UPDATE SKIP LOCKED so concurrent claimers never get the same row.
+
+alter table "Test-Article to Social"
+    add column if not exists "LeaseOwner" text,
+    add column if not exists "LeaseExpiresAt" timestamptz;
+
+create index if not exists "Test-Article to Social_claimable_idx"
+    on "Test-Article to Social" (id)
+    where "Processed" = false;
+
+-- Claims up to max_topics unprocessed topics that are unleased or whose lease has expired.
+create or replace function claim_topics(worker_id text, lease_seconds integer, max_topics integer)
+returns table (id bigint, "Topics" text)
+language sql
+as $$
+    update "Test-Article to Social" as t
+    set "LeaseOwner" = worker_id,
+        "LeaseExpiresAt" = now() + make_interval(secs => lease_seconds)
+    where t.id in (
+        select c.id
+        from "Test-Article to Social" as c
+        where c."Processed" = false
+          and (c."LeaseExpiresAt" is null or c."LeaseExpiresAt" < now())
+        order by c.id
+        limit max_topics
+        for update skip locked
+    )
+    returning t.id, t."Topics";
+$$;
+
+-- Extends the leases this worker still holds; returns the ids that were renewed.
+create or replace function renew_topic_leases(worker_id text, topic_ids bigint[], lease_seconds integer)
+returns table (id bigint)
+language sql
+as $$
+    update "Test-Article to Social" as t
+    set "LeaseExpiresAt" = now() + make_interval(secs => lease_seconds)
+    where t.id = any(topic_ids)
+      and t."LeaseOwner" = worker_id
+      and t."Processed" = false
+    returning t.id;
+$$;
+
+-- Gives up this worker's leases so the topics can be claimed again straight away.
+create or replace function release_topic_leases(worker_id text, topic_ids bigint[])
+returns table (id bigint)
+language sql
+as $$
+    update "Test-Article to Social" as t
+    set "LeaseOwner" = null,
+        "LeaseExpiresAt" = null
+    where t.id = any(topic_ids)
+      and t."LeaseOwner" = worker_id
+    returning t.id;
+$$;
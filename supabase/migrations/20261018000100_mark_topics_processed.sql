@@ -0,0 +1,17 @@
+-- Bulk "mark as processed" for the 'Test-Article to Social' queue.
+--
+-- Writes the summaries of many finished topics in one request. It only updates existing
+-- rows (an upsert could insert, which needs INSERT privilege under RLS) and returns the
+-- ids it actually updated, so the caller can tell which writes landed.
+
+create or replace function mark_topics_processed(topics jsonb)
+returns table (id bigint)
+language sql
+as $$
+    update "Test-Article to Social" as t
+    set "Processed" = true,
+        "Summary" = r."Summary"
+    from jsonb_to_recordset(topics) as r(id bigint, "Summary" text)
+    where t.id = r.id
+    returning t.id;
+$$;
@@ -0,0 +1,25 @@
+-- Makes claim_topics safe to retry.
+--
+-- If a claim commits but its response is lost, the client retries the call. Returning the
+-- topics this worker already holds (on an unexpired lease) first means the retry gets the
+-- same rows back instead of claiming a second set and stranding the first until its lease
+-- expires. Held topics count toward max_topics and have their lease extended.
+
+create or replace function claim_topics(worker_id text, lease_seconds integer, max_topics integer)
+returns table (id bigint, "Topics" text)
+language sql
+as $$
+    update "Test-Article to Social" as t
+    set "LeaseOwner" = worker_id,
+        "LeaseExpiresAt" = now() + make_interval(secs => lease_seconds)
+    where t.id in (
+        select c.id
+        from "Test-Article to Social" as c
+        where c."Processed" = false
+          and (c."LeaseExpiresAt" is null or c."LeaseExpiresAt" < now() or c."LeaseOwner" = worker_id)
+        order by (c."LeaseOwner" is not distinct from worker_id) desc, c.id
+        limit max_topics
+        for update skip locked
+    )
+    returning t.id, t."Topics";
+$$;
@@ -0,0 +1,46 @@
+import asyncio
+import sys
+import types
+
+from asp.scraper.browser_pool import BrowserPool
+
+
+class FakeCrawler:
+    """Stands in for crawl4ai's AsyncWebCrawler and records the pages each browser served."""
+    instances = []
+
+    def __init__(self):
+        self.pages = 0
+        self.closed = False
+        FakeCrawler.instances.append(self)
+
+    async def start(self):
+        pass
+
+    async def arun(self, url):
+        assert not self.closed, "page sent to a closed browser"
+        self.pages += 1
+        await asyncio.sleep(0.01)
+        return types.SimpleNamespace(success=True, url=url)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_pool_of_one_restarts_its_browser_instead_of_postponing_the_recycle(monkeypatch):
+    FakeCrawler.instances = []
+    monkeypatch.setitem(sys.modules, "crawl4ai", types.SimpleNamespace(AsyncWebCrawler=FakeCrawler))
+
+    async def scenario():
+        pool = BrowserPool(size=1, page_concurrency=2, recycle_pages=2, max_rss_mb=0)
+        results = await asyncio.gather(*(pool.arun(f"https://example.com/{i}") for i in range(8)))
+        await pool.close()
+        return pool, results
+
+    pool, results = asyncio.run(scenario())
+    assert all(result.success for result in results)
+    # Pages arriving while the only browser retires wait for its replacement
+    assert [crawler.pages for crawler in FakeCrawler.instances] == [2, 2, 2, 2]
+    assert all(crawler.closed for crawler in FakeCrawler.instances)
+    assert pool.starts == 4
+    assert pool.recycles == 4
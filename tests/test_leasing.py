@@ -0,0 +1,136 @@
+import asyncio
+
+from asp.db.memory_topic_queue import InMemoryTopicQueue
+from asp.pipeline.leasing import TopicLeaseKeeper
+
+
+class FakeClock:
+    """A manually advanced time source for lease expiry."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_concurrent_claims_never_share_a_topic():
+    async def scenario():
+        queue = InMemoryTopicQueue(["a", "b", "c"])
+        first = TopicLeaseKeeper(queue, "worker-1", lease_seconds=60)
+        second = TopicLeaseKeeper(queue, "worker-2", lease_seconds=60)
+        claimed_first, claimed_second = await asyncio.gather(first.claim(2), second.claim(2))
+        await first.close()
+        await second.close()
+        return claimed_first, claimed_second
+
+    claimed_first, claimed_second = asyncio.run(scenario())
+    first_ids = {topic['id'] for topic in claimed_first}
+    second_ids = {topic['id'] for topic in claimed_second}
+    assert not first_ids & second_ids
+    assert first_ids | second_ids == {1, 2, 3}
+
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_cancelled():
+    async def scenario():
+        clock = FakeClock()
+        queue = InMemoryTopicQueue(["a"], clock=clock)
+        first = TopicLeaseKeeper(queue, "worker-1", lease_seconds=10, heartbeat_interval=0.01)
+        second = TopicLeaseKeeper(queue, "worker-2", lease_seconds=10)
+        [topic] = await first.claim(1)
+        work = asyncio.create_task(asyncio.sleep(60))
+        first.attach(topic['id'], work)
+
+        assert await second.claim(1) == []
+        clock.now = 11.0
+        reclaimed = await second.claim(1)
+        # The first worker's next heartbeat finds its lease gone and stops the work
+        await asyncio.sleep(0.05)
+        cancelled = work.cancelled()
+        await first.close()
+        owner = queue.rows[topic['id']]['LeaseOwner']
+        await second.close()
+        return topic, reclaimed, cancelled, owner
+
+    topic, reclaimed, cancelled, owner = asyncio.run(scenario())
+    assert [row['id'] for row in reclaimed] == [topic['id']]
+    assert cancelled
+    # Closing the first worker must not release the lease the second worker now holds
+    assert owner == "worker-2"
+
+
+def test_heartbeat_extends_the_lease():
+    async def scenario():
+        clock = FakeClock()
+        queue = InMemoryTopicQueue(["a"], clock=clock)
+        keeper = TopicLeaseKeeper(queue, "worker-1", lease_seconds=10, heartbeat_interval=0.01)
+        other = TopicLeaseKeeper(queue, "worker-2", lease_seconds=10)
+        [topic] = await keeper.claim(1)
+        clock.now = 8.0
+        await asyncio.sleep(0.05)
+        expires_at = queue.rows[topic['id']]['LeaseExpiresAt']
+        # Past the original expiry, but inside the renewed lease
+        clock.now = 12.0
+        claimed_by_other = await other.claim(1)
+        await keeper.close()
+        await other.close()
+        return expires_at, claimed_by_other
+
+    expires_at, claimed_by_other = asyncio.run(scenario())
+    assert expires_at == 18.0
+    assert claimed_by_other == []
+
+
+def test_failed_topic_is_released_for_other_workers():
+    async def scenario():
+        queue = InMemoryTopicQueue(["a", "b"])
+        first = TopicLeaseKeeper(queue, "worker-1", lease_seconds=60)
+        second = TopicLeaseKeeper(queue, "worker-2", lease_seconds=60)
+        failed, persisted = await first.claim(2)
+        await queue.mark_as_processed(persisted['id'], "summary")
+        await first.finish(failed['id'], persisted=False)
+        await first.finish(persisted['id'], persisted=True)
+        reclaimed = await second.claim(2)
+        await first.close()
+        await second.close()
+        return failed, reclaimed
+
+    failed, reclaimed = asyncio.run(scenario())
+    assert [row['id'] for row in reclaimed] == [failed['id']]
+
+
+def test_persisting_topic_is_not_cancelled_once_its_write_commits():
+    async def scenario():
+        queue = InMemoryTopicQueue(["a"])
+        keeper = TopicLeaseKeeper(queue, "worker-1", lease_seconds=60, heartbeat_interval=0.01)
+        [topic] = await keeper.claim(1)
+        work = asyncio.create_task(asyncio.sleep(60))
+        keeper.attach(topic['id'], work)
+
+        keeper.persisting(topic['id'])
+        await queue.mark_many_as_processed([{'id': topic['id'], 'Summary': "summary"}])
+        # Heartbeats after the write would report the processed row as lost
+        await asyncio.sleep(0.05)
+        cancelled = work.cancelled()
+        work.cancel()
+        await keeper.finish(topic['id'], persisted=True)
+        await keeper.close()
+        return cancelled, queue.rows[topic['id']]
+
+    cancelled, row = asyncio.run(scenario())
+    assert not cancelled
+    assert row['Processed']
+    assert row['LeaseOwner'] == "worker-1"
+
+
+def test_repeated_claim_returns_the_topics_already_held():
+    async def scenario():
+        queue = InMemoryTopicQueue(["a", "b", "c", "d"])
+        # A retried claim after a lost response runs the same call again
+        first_attempt = await queue.claim_topics("worker-1", 2, 60)
+        retried = await queue.claim_topics("worker-1", 2, 60)
+        other = await queue.claim_topics("worker-2", 2, 60)
+        return first_attempt, retried, other
+
+    first_attempt, retried, other = asyncio.run(scenario())
+    assert retried == first_attempt
+    assert {row['id'] for row in other} == {3, 4}